@@ -0,0 +1,197 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# ioctl cloning a file on copy-on-write filesystems (btrfs, xfs), from linux/fs.h
+FICLONE = 0x40049409
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: Path) -> str:
+    with path.open(mode="rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def replace_text(path: Path, text: str) -> None:
+    """Write ``path`` through a temporary file, so a hardlinked view is replaced
+    instead of modified."""
+    temp = path.with_name(f".{path.name}.tmp")
+    temp.write_text(text, encoding="utf-8")
+    os.replace(temp, path)
+
+
+def clone_file(source: Path, destination: Path) -> None:
+    """Reflink ``source`` when the filesystem supports it, copy it otherwise."""
+    with source.open(mode="rb") as src, destination.open(mode="wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            pass
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def replace_file(source: Path, path: Path) -> None:
+    """Copy ``source`` over ``path`` through a temporary file, like ``replace_text``."""
+    temp = path.with_name(f".{path.name}.tmp")
+    clone_file(source, temp)
+    os.replace(temp, path)
+
+
+class ArtifactStore:
+    """Content addressed store of result files.
+
+    Every distinct content is stored once as ``<root>/blobs/<sha256>``, and result
+    folders (``test_results``, ``argus_test_results``) get hardlinks to the blobs,
+    so consumers read them as plain files. Views are replaced atomically and must
+    never be modified in place, rewriting a view means writing a new file and
+    renaming it over the view. ``manifest.json`` maps every view to its blob."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._manifest: Dict[str, str] = {}
+        # (st_dev, st_ino) -> digest of the blobs, a source hardlinked to a blob
+        # (e.g. a view copied to another folder) is not hashed again.
+        self._inodes: Optional[Dict[Tuple[int, int], str]] = None
+        self.linked_bytes = 0
+        self.stored_bytes = 0
+
+    def _blob(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / digest
+
+    def _known_digest(self, path: Path) -> Optional[str]:
+        if self._inodes is None:
+            self._inodes = {}
+            for blob in self.root.glob("blobs/*/*"):
+                stat = blob.stat()
+                self._inodes[(stat.st_dev, stat.st_ino)] = blob.name
+        stat = path.stat()
+        return self._inodes.get((stat.st_dev, stat.st_ino))
+
+    def _temp_path(self) -> Path:
+        (self.root / "tmp").mkdir(parents=True, exist_ok=True)
+        return self.root / "tmp" / uuid.uuid4().hex
+
+    def _link_view(self, blob: Path, view: Path) -> None:
+        view.parent.mkdir(parents=True, exist_ok=True)
+        temp = view.with_name(f".{view.name}.{uuid.uuid4().hex[:8]}")
+        try:
+            os.link(blob, temp)
+        except OSError:
+            # Other filesystem than the store, or no hardlink support.
+            clone_file(blob, temp)
+        os.replace(temp, view)
+
+    def add(self, source: Path, view: Path, copy: bool = False, move: bool = False) -> str:
+        """Store ``source`` and expose it as ``view``, returns the content digest.
+
+        By default the source file itself becomes the blob (when it's on the same
+        filesystem), which is only safe for files nobody will append to. Files
+        still being written (e.g. logs of running nodes) need ``copy``. ``move``
+        removes the source afterwards."""
+        digest = self._known_digest(source)
+        if digest is not None:
+            stored = source
+        elif copy:
+            stored = self._temp_path()
+            clone_file(source, stored)
+            digest = file_digest(stored)
+        else:
+            stored = source
+            digest = file_digest(stored)
+        size = stored.stat().st_size
+        blob = self._blob(digest)
+        if blob.exists():
+            if stored != source:
+                stored.unlink()
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            if stored != source:
+                os.replace(stored, blob)
+            else:
+                try:
+                    os.link(stored, blob)
+                except OSError:
+                    clone_file(stored, blob)
+            blob_stat = blob.stat()
+            self._inodes[(blob_stat.st_dev, blob_stat.st_ino)] = digest
+            self.stored_bytes += size
+        if not (view.exists() and blob.samefile(view)):
+            self._link_view(blob, view)
+        if move and source.resolve() != view.resolve():
+            source.unlink()
+        self.linked_bytes += size
+        self._manifest[os.path.relpath(view, self.root.parent)] = digest
+        return digest
+
+    def stats(self) -> Dict:
+        return dict(
+            linked_bytes=self.linked_bytes,
+            stored_bytes=self.stored_bytes,
+            saved_bytes=self.linked_bytes - self.stored_bytes,
+        )
+
+    @property
+    def _manifest_file(self) -> Path:
+        return self.root / "manifest.json"
+
+    def _load_manifest(self) -> Dict[str, str]:
+        manifest = (
+            json.loads(self._manifest_file.read_text(encoding="utf-8"))
+            if self._manifest_file.exists()
+            else {}
+        )
+        manifest.update(self._manifest)
+        return manifest
+
+    def _write_manifest(self, manifest: Dict[str, str]) -> None:
+        temp = self._temp_path()
+        temp.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+        os.replace(temp, self._manifest_file)
+
+    def save_manifest(self) -> Path:
+        self._write_manifest(self._load_manifest())
+        LOGGER.info("Artifact store %s: %s", self.root, self.stats())
+        return self._manifest_file
+
+    def _is_view_of(self, view: Path, digest: str) -> bool:
+        blob = self._blob(digest)
+        if not view.exists() or not blob.exists():
+            return False
+        if view.samefile(blob):
+            return True
+        # A clone on another filesystem, or a file replaced after it was added.
+        return (
+            view.stat().st_size == blob.stat().st_size and file_digest(view) == digest
+        )
+
+    def prune(self) -> int:
+        """Remove blobs no view of the manifest refers to anymore, returns the number
+        of freed bytes. Views that were removed or replaced leave the manifest."""
+        manifest = {
+            view: digest
+            for view, digest in self._load_manifest().items()
+            if self._is_view_of(self.root.parent / view, digest)
+        }
+        referenced = set(manifest.values())
+        freed = 0
+        for blob in self.root.glob("blobs/*/*"):
+            if blob.name not in referenced:
+                stat = blob.stat()
+                freed += stat.st_size
+                blob.unlink()
+                if self._inodes is not None:
+                    self._inodes.pop((stat.st_dev, stat.st_ino), None)
+        self._manifest = {
+            view: digest for view, digest in self._manifest.items() if view in manifest
+        }
+        self._write_manifest(manifest)
+        return freed
@@ -0,0 +1,191 @@
+import json
+import logging
+import math
+import statistics
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from packaging.version import InvalidVersion, Version
+
+from artifacts import replace_text
+
+LOGGER = logging.getLogger(__name__)
+
+WORKLOAD_SOURCE = Path(__file__).parent / "workload" / "main.rs"
+
+WORKLOAD_MANIFEST = """\
+[package]
+name = "matrix-workload"
+version = "0.1.0"
+edition = "2021"
+publish = false
+
+# Standalone workspace, so cargo doesn't pick up the driver's one.
+[workspace]
+
+[[bin]]
+name = "matrix-workload"
+path = "{source}"
+
+[dependencies]
+scylla = {{ path = "{driver}/scylla" }}
+tokio = {{ version = "1", features = ["full"] }}
+futures = "0.3"
+"""
+
+# Two-sided 95% critical values of Student's t distribution by degrees of freedom.
+T_CRITICAL_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+    8: 2.306, 9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145,
+    15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086, 25: 2.060,
+    30: 2.042,
+}
+
+# Relative change of the mean that is reported, when confidence intervals don't overlap.
+REGRESSION_THRESHOLD = 0.05
+
+
+def write_workload_project(project_dir: Path, driver_dir: Path) -> Path:
+    """Create a cargo project building the workload against the driver tree."""
+    project_dir.mkdir(parents=True, exist_ok=True)
+    manifest = project_dir / "Cargo.toml"
+    manifest.write_text(
+        WORKLOAD_MANIFEST.format(source=WORKLOAD_SOURCE, driver=driver_dir),
+        encoding="utf-8",
+    )
+    return manifest
+
+
+def parse_workload_output(lines: Iterable[str]) -> List[Dict]:
+    samples = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith("{"):
+            samples.append(json.loads(line))
+    return samples
+
+
+def mean_confidence_interval(values: List[float]) -> Dict:
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return dict(mean=mean, ci95=None, samples=len(values))
+    degrees = len(values) - 1
+    t_value = T_CRITICAL_95.get(degrees) or next(
+        (value for df, value in sorted(T_CRITICAL_95.items()) if df >= degrees), 1.96
+    )
+    half_width = t_value * statistics.stdev(values) / math.sqrt(len(values))
+    return dict(mean=mean, ci95=[mean - half_width, mean + half_width], samples=len(values))
+
+
+def aggregate(samples: List[Dict]) -> Dict:
+    """Group workload samples by scenario and concurrency, over all iterations."""
+    groups: Dict[str, List[Dict]] = {}
+    for sample in samples:
+        groups.setdefault(f"{sample['scenario']}@{sample['concurrency']}", []).append(sample)
+
+    result = {}
+    for key, group in sorted(groups.items()):
+        histogram: Dict[int, int] = {}
+        for sample in group:
+            for bound, count in sample["histogram"]:
+                histogram[bound] = histogram.get(bound, 0) + count
+        result[key] = dict(
+            scenario=group[0]["scenario"],
+            concurrency=group[0]["concurrency"],
+            errors=sum(sample["errors"] for sample in group),
+            throughput=mean_confidence_interval(
+                [sample["ops"] / sample["duration_s"] for sample in group]
+            ),
+            latency_us={
+                percentile: mean_confidence_interval(
+                    [sample["latency_us"][percentile] for sample in group]
+                )
+                for percentile in ("p50", "p90", "p99", "p999", "max")
+            },
+            histogram=sorted(histogram.items()),
+        )
+    return result
+
+
+def _change(current: Dict, previous: Dict, higher_is_better: bool) -> Dict:
+    change = (current["mean"] - previous["mean"]) / previous["mean"] if previous["mean"] else 0.0
+    overlap = (
+        current["ci95"] is None
+        or previous["ci95"] is None
+        or not (
+            current["ci95"][1] < previous["ci95"][0]
+            or previous["ci95"][1] < current["ci95"][0]
+        )
+    )
+    worse = change < 0 if higher_is_better else change > 0
+    return dict(
+        change=change,
+        significant=not overlap,
+        regression=worse and not overlap and abs(change) >= REGRESSION_THRESHOLD,
+    )
+
+
+def _version_key(tag: str) -> Optional[Version]:
+    try:
+        return Version(tag.removeprefix("v"))
+    except InvalidVersion:
+        return None
+
+
+def _newest_first(tags: Iterable[str]) -> List[str]:
+    """Tags ordered from the newest version, unparsable ones last."""
+    keys = {tag: _version_key(tag) for tag in tags}
+    known = sorted((tag for tag, key in keys.items() if key is not None), key=keys.get)
+    return known[::-1] + [tag for tag, key in keys.items() if key is None]
+
+
+def compare_versions(results: Dict[str, Optional[Dict]]) -> Dict:
+    """Compare every version with its predecessor, the next older version in
+    ``results``."""
+    versions = _newest_first(version for version, result in results.items() if result)
+    comparison: Dict[str, Dict] = {}
+    for index, version in enumerate(versions):
+        previous = versions[index + 1] if index + 1 < len(versions) else None
+        for key, stats in results[version].items():
+            row = dict(
+                throughput=stats["throughput"],
+                p99_us=stats["latency_us"]["p99"],
+                errors=stats["errors"],
+                baseline=previous,
+            )
+            if previous is not None and key in results[previous]:
+                previous_stats = results[previous][key]
+                row["throughput_change"] = _change(
+                    stats["throughput"], previous_stats["throughput"], higher_is_better=True
+                )
+                row["p99_change"] = _change(
+                    stats["latency_us"]["p99"],
+                    previous_stats["latency_us"]["p99"],
+                    higher_is_better=False,
+                )
+            comparison.setdefault(key, {})[version] = row
+    regressions = [
+        dict(workload=key, version=version)
+        for key, rows in comparison.items()
+        for version, row in rows.items()
+        if row.get("throughput_change", {}).get("regression")
+        or row.get("p99_change", {}).get("regression")
+    ]
+    return dict(versions=versions, workloads=comparison, regressions=regressions)
+
+
+class BenchReport:
+    """Result of the ``bench`` test of one driver version, ``main`` treats it
+    the same way as ProcessJUnit."""
+
+    def __init__(self, samples: List[Dict]):
+        self.samples = samples
+        self.summary = aggregate(samples)
+
+    @property
+    def is_failed(self) -> bool:
+        return not self.samples or any(stats["errors"] for stats in self.summary.values())
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        replace_text(path, json.dumps(dict(summary=self.summary, samples=self.samples)))
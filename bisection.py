@@ -0,0 +1,310 @@
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from artifacts import replace_text
+from common import NEXTEST_NO_TESTS_RUN, NEXTEST_TEST_RUN_FAILED, scylla_uri_env
+from process import command_output, run_command
+from topology import Topology
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TARGET_DIR = Path(os.path.dirname(__file__)) / ".matrix_cache" / "bisect"
+# Test -> cargo arguments of its test binary, kept in the target dir between bisections.
+TARGETS_FILE_NAME = "bisect_targets.json"
+
+GOOD = "good"
+BAD = "bad"
+SKIP = "skip"
+
+FIRST_BAD_PATTERN = re.compile(r"^([0-9a-f]{7,40}) is the first bad commit")
+CANDIDATE_PATTERN = re.compile(r"^([0-9a-f]{40})$")
+# cargo errors of a build whose test binary doesn't exist at the commit.
+MISSING_TARGET_MESSAGES = ("no test target named", "no library targets found")
+
+
+class InvalidRange(ValueError):
+    """The good end of a bisection is not good or the bad end is not bad."""
+
+
+def binary_args(nextest_list: Dict, test_name: str) -> List[str]:
+    """cargo arguments building only the test binary that contains ``test_name``,
+    from ``cargo nextest list --message-format json``."""
+    for suite in nextest_list["rust-suites"].values():
+        if test_name not in suite.get("testcases", {}):
+            continue
+        args = ["--package", suite["package-name"]]
+        if suite["kind"] == "lib":
+            return args + ["--lib"]
+        if suite["kind"] == "test":
+            return args + ["--test", suite["binary-name"]]
+        return args + [f"--{suite['kind']}", suite["binary-name"]]
+    raise ValueError(f"Test '{test_name}' is not found in any test binary")
+
+
+def _bisect_step(outcome: str, **command_kwargs) -> List[str]:
+    output: List[str] = []
+    result = run_command(["git", "bisect", outcome], on_line=output.append, **command_kwargs)
+    # git exits with an error when only skipped commits are left, which is a result.
+    if not any("only 'skip'ped commits left" in line for line in output):
+        result.check()
+    return [line.removeprefix("[stderr] ") for line in output]
+
+
+def bisect_commits(
+    good: str, bad: str, check: Callable[[str], str], **command_kwargs
+) -> Dict:
+    """Drive ``git bisect`` between ``good`` and ``bad``, ``check`` classifies the
+    checked out commit as good, bad or skip.
+
+    Both ends are checked first, ``InvalidRange`` is raised unless ``good`` is good
+    and ``bad`` is bad. Returns the first bad commit, or the candidates when only
+    skipped commits are left, and all tested steps. ``command_kwargs`` are passed
+    to ``run_command`` and must include ``cwd`` of the repository."""
+    steps = []
+
+    def check_step(commit: str) -> str:
+        start = time.monotonic()
+        outcome = check(commit)
+        steps.append(dict(commit=commit, outcome=outcome, duration=time.monotonic() - start))
+        LOGGER.info("Commit %s is %s", commit, outcome)
+        return outcome
+
+    command_output(["git", "bisect", "start", bad, good], **command_kwargs)
+    try:
+        for ref, expected in ((good, GOOD), (bad, BAD)):
+            command_output(["git", "checkout", "-q", ref], **command_kwargs)
+            commit = command_output(["git", "rev-parse", "HEAD"], **command_kwargs)[0]
+            if (outcome := check_step(commit)) != expected:
+                raise InvalidRange(
+                    f"'{ref}' ({commit}) is expected to be {expected}, but it is {outcome}"
+                )
+        output = command_output(["git", "bisect", "next"], **command_kwargs)
+        while True:
+            for line in output:
+                if match := FIRST_BAD_PATTERN.match(line):
+                    return dict(first_bad_commit=match.group(1), steps=steps)
+            if any("only 'skip'ped commits left" in line for line in output):
+                return dict(
+                    first_bad_commit=None,
+                    candidates=[
+                        match.group(1)
+                        for line in output
+                        if (match := CANDIDATE_PATTERN.match(line))
+                    ],
+                    steps=steps,
+                )
+            commit = command_output(["git", "rev-parse", "HEAD"], **command_kwargs)[0]
+            output = _bisect_step(check_step(commit), **command_kwargs)
+    finally:
+        command_output(["git", "bisect", "reset"], **command_kwargs)
+
+
+class Bisection:
+    """Finds the driver commit that broke a single test.
+
+    The cluster is started once for the whole bisection, the cargo target
+    directory stays the same between steps (so only what changed between
+    commits is recompiled), and only the test binary containing the test
+    is built. The binary is looked up (which builds all test binaries) only
+    when it's not known from an earlier bisection or it no longer has the test.
+
+    A test that doesn't finish in ``test_timeout`` counts as failed, hangs are
+    regressions too, such commits are reported in ``timed_out``."""
+
+    def __init__(
+        self,
+        rust_driver_git: str,
+        test_name: str,
+        scylla_version: str,
+        topology: Topology = Topology.uniform(3),
+        cargo_target_dir: Path = DEFAULT_TARGET_DIR,
+        test_timeout: float = 1800,
+    ):
+        self._rust_driver_git = rust_driver_git
+        self._test_name = test_name
+        self._scylla_version = scylla_version
+        self._topology = topology
+        self._cargo_target_dir = cargo_target_dir
+        self._test_timeout = test_timeout
+        self._target_args: Optional[List[str]] = None
+        self._test_env: Dict[str, str] = {}
+        self.timed_out: List[str] = []
+
+    @property
+    def environment(self) -> Dict[str, str]:
+        return {
+            **os.environ,
+            "SCYLLA_VERSION": self._scylla_version,
+            "SCYLLA_TEST_CLUSTER": self._scylla_version,
+            "RUST_BACKTRACE": "full",
+            "CARGO_TARGET_DIR": str(self._cargo_target_dir),
+            **self._test_env,
+        }
+
+    def _command_kwargs(self) -> Dict:
+        return dict(
+            cwd=self._rust_driver_git,
+            env=self.environment,
+            timeout=self._test_timeout,
+            log_file=self._cargo_target_dir / "bisect.log",
+        )
+
+    @property
+    def _targets_file(self) -> Path:
+        return self._cargo_target_dir / TARGETS_FILE_NAME
+
+    def _known_targets(self) -> Dict[str, List[str]]:
+        if not self._targets_file.exists():
+            return {}
+        return json.loads(self._targets_file.read_text(encoding="utf-8"))
+
+    def _target(self, lookup: bool) -> List[str]:
+        targets = self._known_targets()
+        if not lookup and self._test_name in targets:
+            return targets[self._test_name]
+        targets[self._test_name] = self._find_target()
+        replace_text(self._targets_file, json.dumps(targets, indent=1))
+        return targets[self._test_name]
+
+    def _find_target(self) -> List[str]:
+        output = command_output(
+            [
+                "cargo",
+                "nextest",
+                "list",
+                "--all-features",
+                "--message-format",
+                "json",
+                "-E",
+                f"test(={self._test_name})",
+            ],
+            **self._command_kwargs(),
+        )
+        return binary_args(json.loads("\n".join(output)), self._test_name)
+
+    def check(self, commit: str, lookup: bool = False) -> str:
+        # The test binary may be renamed or the test moved between commits, then
+        # it's looked up again, once per commit.
+        if self._target_args is None or lookup:
+            try:
+                self._target_args = self._target(lookup)
+            except Exception:
+                LOGGER.exception("Cannot find test binary of '%s' at %s", self._test_name, commit)
+                return SKIP
+        build_start = time.monotonic()
+        build = run_command(
+            ["cargo", "test", "--no-run", "--all-features", *self._target_args],
+            **self._command_kwargs(),
+        )
+        LOGGER.info("Build of %s took %.1fs", commit, time.monotonic() - build_start)
+        if build.returncode != 0:
+            if not lookup and any(
+                message in line for line in build.tail for message in MISSING_TARGET_MESSAGES
+            ):
+                return self.check(commit, lookup=True)
+            return SKIP
+        test = run_command(
+            [
+                "cargo",
+                "nextest",
+                "run",
+                "--all-features",
+                *self._target_args,
+                "-E",
+                f"test(={self._test_name})",
+            ],
+            echo=True,
+            **self._command_kwargs(),
+        )
+        if test.timed_out:
+            LOGGER.warning("Test timed out at %s, counted as bad", commit)
+            self.timed_out.append(commit)
+            return BAD
+        if test.returncode == 0:
+            return GOOD
+        if test.returncode == NEXTEST_TEST_RUN_FAILED:
+            return BAD
+        if test.returncode == NEXTEST_NO_TESTS_RUN and not lookup:
+            return self.check(commit, lookup=True)
+        return SKIP
+
+    def run(self, good: str, bad: str) -> Dict:
+        from cluster import TestCluster
+
+        start = time.monotonic()
+        self._cargo_target_dir.mkdir(parents=True, exist_ok=True)
+        command_output(["git", "clean", "-d", "-f", "-e", "ccm/"], **self._command_kwargs())
+        command_output(["git", "checkout", "."], **self._command_kwargs())
+        with TestCluster(
+            Path(self._rust_driver_git),
+            self._scylla_version,
+            nodes=self._topology,
+            cluster_name="Bisect",
+        ) as cluster:
+            cluster.start()
+            self._test_env = scylla_uri_env(cluster.nodes_addresses())
+            result = bisect_commits(good, bad, self.check, **self._command_kwargs())
+        if result["first_bad_commit"]:
+            result["subject"] = command_output(
+                ["git", "log", "-1", "--format=%s", result["first_bad_commit"]],
+                **self._command_kwargs(),
+            )[0]
+        result.update(
+            test=self._test_name,
+            good=good,
+            bad=bad,
+            timed_out=self.timed_out,
+            duration=time.monotonic() - start,
+        )
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find the first driver commit between two refs on which a test fails"
+    )
+    parser.add_argument("rust_driver_git", help="folder with git repository of rust-driver")
+    parser.add_argument("test_name", help="full nextest name of the test, e.g. session::test_prepared_statement")
+    parser.add_argument("good", help="ref on which the test passes, e.g. v1.7.0")
+    parser.add_argument("bad", help="ref on which the test fails, e.g. v1.8.0")
+    parser.add_argument(
+        "--scylla-version",
+        help="relocatable scylla version to use",
+        default=os.environ.get("SCYLLA_VERSION", None),
+    )
+    parser.add_argument("--topology", type=Topology.parse, default=Topology.uniform(3))
+    parser.add_argument(
+        "--cargo-target-dir",
+        help="cargo target directory kept warm between steps (and bisections)",
+        type=Path,
+        default=DEFAULT_TARGET_DIR,
+    )
+    parser.add_argument("--test-timeout", type=float, default=1800)
+    parser.add_argument("--output", type=Path, help="write the result to this JSON file")
+    arguments = parser.parse_args()
+
+    bisection_result = Bisection(
+        arguments.rust_driver_git,
+        arguments.test_name,
+        arguments.scylla_version,
+        topology=arguments.topology,
+        cargo_target_dir=arguments.cargo_target_dir.resolve(),
+        test_timeout=arguments.test_timeout,
+    ).run(arguments.good, arguments.bad)
+    for step in bisection_result["steps"]:
+        LOGGER.info("%s %s (%.1fs)", step["commit"], step["outcome"], step["duration"])
+    LOGGER.info(
+        "First bad commit: %s %s, found in %.1fs",
+        bisection_result["first_bad_commit"] or bisection_result.get("candidates"),
+        bisection_result.get("subject", ""),
+        bisection_result["duration"],
+    )
+    if arguments.output:
+        arguments.output.write_text(json.dumps(bisection_result, indent=2))
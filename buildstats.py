@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from packaging.version import InvalidVersion, Version
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_STATS_DIR = Path(
+    os.environ.get(
+        "MATRIX_BUILD_STATS_DIR", Path(os.path.dirname(__file__)) / "build_stats"
+    )
+)
+
+# Relative growth of build wall time or test binaries size that is reported.
+BUILD_REGRESSION_THRESHOLD = 0.2
+
+UNIT_DATA_PATTERN = re.compile(r"const UNIT_DATA = (\[.*?\]);", re.DOTALL)
+
+
+def build_command() -> List[str]:
+    """Builds the same test binaries as ``cargo nextest run --all-features``,
+    so the following nextest run doesn't compile anything."""
+    return [
+        "cargo",
+        "test",
+        "--no-run",
+        "--all-features",
+        "--timings",
+        "--message-format=json-render-diagnostics",
+    ]
+
+
+def parse_crate_timings(timings_html: str) -> Dict[str, float]:
+    """Per-crate compile durations (seconds) from cargo's ``--timings`` report."""
+    match = UNIT_DATA_PATTERN.search(timings_html)
+    if match is None:
+        return {}
+    crates: Dict[str, float] = {}
+    for unit in json.loads(match.group(1)):
+        crates[unit["name"]] = round(crates.get(unit["name"], 0.0) + unit["duration"], 3)
+    return crates
+
+
+def parse_test_binaries(cargo_messages: Iterable[str]) -> Dict[str, int]:
+    """Sizes (bytes) of test executables reported in cargo's JSON messages."""
+    binaries = {}
+    for line in cargo_messages:
+        if not line.startswith("{"):
+            continue
+        message = json.loads(line)
+        if (
+            message.get("reason") == "compiler-artifact"
+            and message.get("profile", {}).get("test")
+            and message.get("executable")
+        ):
+            executable = Path(message["executable"])
+            name = f"{Path(message['manifest_path']).parent.name}/{message['target']['name']}"
+            if executable.exists():
+                binaries[name] = executable.stat().st_size
+    return binaries
+
+
+def build_record(
+    tag: str,
+    toolchain: str,
+    wall_time: float,
+    cargo_messages: Iterable[str],
+    timings_html: Optional[str],
+    clean: bool = False,
+) -> Dict:
+    """``clean`` tells the build started without earlier build output in the target
+    dir, only wall times of clean builds are comparable between tags."""
+    test_binaries = parse_test_binaries(cargo_messages)
+    return dict(
+        tag=tag,
+        toolchain=toolchain,
+        timestamp=time.time(),
+        clean_build=clean,
+        wall_time_s=round(wall_time, 3),
+        crates=parse_crate_timings(timings_html or ""),
+        test_binaries=test_binaries,
+        test_binaries_size=sum(test_binaries.values()),
+    )
+
+
+def append_record(record: Dict, stats_dir: Path = DEFAULT_STATS_DIR) -> Path:
+    stats_dir.mkdir(parents=True, exist_ok=True)
+    path = stats_dir / f"{record['tag']}.jsonl"
+    with path.open(mode="a", encoding="utf-8") as file:
+        file.write(json.dumps(record) + "\n")
+    return path
+
+
+def records(tag: str, stats_dir: Path = DEFAULT_STATS_DIR) -> List[Dict]:
+    path = stats_dir / f"{tag}.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def latest_record(tag: str, stats_dir: Path = DEFAULT_STATS_DIR) -> Optional[Dict]:
+    tag_records = records(tag, stats_dir)
+    return tag_records[-1] if tag_records else None
+
+
+def _version_key(tag: str) -> Optional[Version]:
+    try:
+        return Version(tag.removeprefix("v"))
+    except InvalidVersion:
+        return None
+
+
+def predecessor(tag: str, stats_dir: Path = DEFAULT_STATS_DIR) -> Optional[str]:
+    """Newest recorded tag older than ``tag``."""
+    current = _version_key(tag)
+    if current is None:
+        return None
+    older = [
+        (version, path.stem)
+        for path in stats_dir.glob("*.jsonl")
+        if (version := _version_key(path.stem)) is not None and version < current
+    ]
+    return max(older)[1] if older else None
+
+
+def _comparable(record: Dict, previous: Dict, metric: str) -> bool:
+    if metric == "wall_time_s":
+        # Builds in a shared target dir reuse what the previously built tag left,
+        # their wall time depends on the build order rather than on the tag.
+        return bool(record.get("clean_build") and previous.get("clean_build"))
+    return True
+
+
+def find_regressions(
+    tags: Iterable[str], stats_dir: Path = DEFAULT_STATS_DIR
+) -> List[Dict]:
+    """Tags whose last build was noticeably more expensive than the predecessor's
+    last build with the same toolchain."""
+    regressions = []
+    for tag in tags:
+        record = latest_record(tag, stats_dir)
+        previous_tag = predecessor(tag, stats_dir)
+        if record is None or previous_tag is None:
+            continue
+        same_toolchain = [
+            previous
+            for previous in records(previous_tag, stats_dir)
+            if previous["toolchain"] == record["toolchain"]
+        ]
+        if not same_toolchain:
+            LOGGER.info(
+                "No build of %s with %s to compare %s with",
+                previous_tag,
+                record["toolchain"],
+                tag,
+            )
+            continue
+        for metric in ("wall_time_s", "test_binaries_size"):
+            comparable = [
+                previous
+                for previous in same_toolchain
+                if _comparable(record, previous, metric)
+            ]
+            if not comparable or not comparable[-1][metric]:
+                continue
+            previous = comparable[-1]
+            change = (record[metric] - previous[metric]) / previous[metric]
+            if change >= BUILD_REGRESSION_THRESHOLD:
+                regressions.append(
+                    dict(
+                        tag=tag,
+                        predecessor=previous_tag,
+                        metric=metric,
+                        value=record[metric],
+                        previous_value=previous[metric],
+                        change=change,
+                        toolchain=record["toolchain"],
+                        previous_toolchain=previous["toolchain"],
+                    )
+                )
+    return regressions
@@ -6,9 +6,15 @@ from typing import Dict, Tuple
 
 from ccmlib import scylla_cluster as ccm
 
+from artifacts import ArtifactStore
+from cluster_watchdog import ClusterWatchdog
+from topology import Topology
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RACKDC_FILE_NAME = "cassandra-rackdc.properties"
+
 
 def acquire_ip_prefix() -> Tuple[socket.socket, str]:
     """gets unique ip prefix across whole machine,
@@ -34,6 +40,20 @@ def release_ip_prefix_lock(sock: socket.socket) -> None:
     sock.close()
 
 
+def persist_rack(node, data_center: str, rack: str) -> None:
+    """Write the datacenter and rack of ``node`` to its ``cassandra-rackdc.properties``
+    and save the node config, so they survive ccm reloading the cluster."""
+    if hasattr(node, "rack"):
+        node.rack = rack
+    node.data_center = data_center
+    conf_dir = Path(node.get_conf_dir())
+    conf_dir.mkdir(parents=True, exist_ok=True)
+    (conf_dir / RACKDC_FILE_NAME).write_text(
+        f"dc={data_center}\nrack={rack}\nprefer_local=true\n", encoding="utf-8"
+    )
+    node._update_config()
+
+
 class TestCluster:
     """Responsible for configuring, starting and stopping cluster for tests"""
 
@@ -41,22 +61,56 @@ class TestCluster:
         self,
         driver_directory: Path,
         version: str,
-        nodes: int,
+        nodes: int | Topology,
         log_dest_dir: Path | None = None,
         log_file_prefix: str = "",
+        watchdog: bool = False,
+        watchdog_restart: bool = False,
+        cluster_name: str = "TestCluster",
+        artifacts: ArtifactStore | None = None,
     ) -> None:
         self.cluster_directory = driver_directory / "ccm"
         self.cluster_directory.mkdir(parents=True, exist_ok=True)
         self._log_dest_dir = log_dest_dir
         self._log_file_prefix = log_file_prefix
+        self._artifacts = artifacts
+        self._watchdog: ClusterWatchdog | None = None
+        if watchdog or watchdog_restart:
+            self._watchdog = ClusterWatchdog(
+                nodes=lambda: self._cluster.nodes.values(),
+                log_dest_dir=log_dest_dir,
+                log_file_prefix=log_file_prefix,
+                restart=watchdog_restart,
+                artifacts=artifacts,
+            )
         logger.info("Preparing test cluster binaries and configuration...")
         self._ip_prefix_lock, ip_prefix = acquire_ip_prefix()
         self._cluster: ccm.ScyllaCluster = ccm.ScyllaCluster(
-            self.cluster_directory, "TestCluster", cassandra_version=version
+            self.cluster_directory, cluster_name, cassandra_version=version
         )
         self._cluster.set_ipprefix(ip_prefix)
-        self._cluster.populate(nodes)
-        logger.info("Cluster prepared")
+        self.topology = Topology.uniform(nodes) if isinstance(nodes, int) else nodes
+        dc_node_counts = self.topology.dc_node_counts()
+        self._cluster.populate(
+            dc_node_counts if len(dc_node_counts) > 1 else dc_node_counts[0]
+        )
+        self._apply_topology()
+        logger.info("Cluster prepared: %s", self.topology)
+
+    def _apply_topology(self) -> None:
+        nodes = self.topology.nodes()
+        with_racks = any(rack != "rack1" for _, _, rack in nodes)
+        if with_racks:
+            # Only this snitch reads the rack of a node from its own config.
+            self._cluster.set_configuration_options(
+                {"endpoint_snitch": "GossipingPropertyFileSnitch"}
+            )
+        for name, data_center, rack in nodes:
+            node = self._cluster.nodes[name]
+            if with_racks:
+                persist_rack(node, data_center, rack)
+            if (smp := self.topology.smp_for(name)) is not None:
+                node.set_smp(smp)
 
     def __enter__(self):
         return self
@@ -90,12 +144,25 @@ class TestCluster:
             for node in list(self._cluster.nodes.values())
         ]
         logger.info("test cluster started: %s", nodes)
+        if self._watchdog is not None:
+            self._watchdog.start()
         return (
             f"-rf={nodes_count} -clusterSize={nodes_count} -cluster={self.ip_addresses}"
         )
 
+    def is_healthy(self) -> bool:
+        return all(node.is_live() for node in self._cluster.nodes.values())
+
+    def metadata(self) -> Dict:
+        metadata: Dict = {"topology": self.topology.as_dict()}
+        if self._watchdog is not None:
+            metadata["incidents"] = self._watchdog.incidents
+        return metadata
+
     def remove(self):
         logger.info("Removing test cluster...")
+        if self._watchdog is not None:
+            self._watchdog.stop()
         any_node_down = any(
             not node.is_running() for node in self._cluster.nodes.values()
         )
@@ -115,7 +182,10 @@ class TestCluster:
                     dest,
                 )
                 try:
-                    shutil.copy(str(log_file), str(dest))
+                    if self._artifacts is not None:
+                        self._artifacts.add(log_file, dest, copy=True)
+                    else:
+                        shutil.copy(str(log_file), str(dest))
                 except FileNotFoundError:
                     logger.warning("Log file not found: %s", log_file)
         self._cluster.remove()
@@ -0,0 +1,244 @@
+import logging
+import re
+import shutil
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from artifacts import ArtifactStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ERROR_PATTERNS = (
+    r"Aborting",
+    r"Segmentation fault",
+    r"std::bad_alloc",
+)
+
+
+class _NodeState:
+    def __init__(self) -> None:
+        self.running = True
+        self.log_offset = 0
+        self.cql_failures = 0
+        self.cql_unresponsive = False
+
+
+class ClusterWatchdog:
+    """Background monitor of cluster nodes.
+
+    Polls every node for liveness, CQL port responsiveness and error patterns in
+    its log file. Each incident is recorded in a timeline, the node log is copied
+    aside at the moment it is detected and, optionally, the node is restarted.
+    A node log is copied at most once per check round, further incidents of the
+    node in the same round refer to that copy."""
+
+    def __init__(
+        self,
+        nodes: Callable[[], Iterable],
+        log_dest_dir: Path | None,
+        log_file_prefix: str = "",
+        interval: float = 5.0,
+        restart: bool = False,
+        error_patterns: Iterable[str] = DEFAULT_ERROR_PATTERNS,
+        cql_port: int = 9042,
+        cql_timeout: float = 2.0,
+        cql_failures_threshold: int = 3,
+        artifacts: ArtifactStore | None = None,
+    ) -> None:
+        self._nodes = nodes
+        self._log_dest_dir = log_dest_dir
+        self._log_file_prefix = log_file_prefix
+        # Captured logs go through the artifact store when the run has one.
+        self._artifacts = artifacts
+        self._interval = interval
+        self._restart = restart
+        self._error_pattern = re.compile("|".join(f"(?:{p})" for p in error_patterns))
+        self._cql_port = cql_port
+        self._cql_timeout = cql_timeout
+        self._cql_failures_threshold = cql_failures_threshold
+        self._states: Dict[str, _NodeState] = {}
+        self._incidents: List[Dict] = []
+        # Node name -> log copy taken in the current check round.
+        self._round_log_copies: Dict[str, str | None] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = time.monotonic()
+
+    def start(self) -> None:
+        self._started_at = time.monotonic()
+        self._skip_existing_logs()
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="cluster-watchdog", daemon=True
+        )
+        self._thread.start()
+        logger.info("Cluster watchdog started (interval %ss)", self._interval)
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        logger.info(
+            "Cluster watchdog stopped, %d incident(s) recorded", len(self._incidents)
+        )
+
+    @property
+    def incidents(self) -> List[Dict]:
+        with self._lock:
+            return list(self._incidents)
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Cluster watchdog check failed")
+            self._stop_event.wait(self._interval)
+
+    def _skip_existing_logs(self) -> None:
+        """Scan logs of the nodes already running from their current end, errors
+        logged before the monitoring began are not incidents of this run. Nodes
+        appearing later are scanned from the start of their log."""
+        for node in list(self._nodes()):
+            state = self._states.setdefault(node.name, _NodeState())
+            try:
+                state.log_offset = Path(node.logfilename()).stat().st_size
+            except FileNotFoundError:
+                pass
+
+    def check(self) -> None:
+        """Run a single round of checks over all nodes."""
+        self._round_log_copies = {}
+        for node in list(self._nodes()):
+            state = self._states.setdefault(node.name, _NodeState())
+            self._check_log(node, state)
+            self._check_liveness(node, state)
+
+    def _check_liveness(self, node, state: _NodeState) -> None:
+        running = node.is_running()
+        if state.running and not running:
+            state.running = False
+            self._record(node, "node_down", "node process is not running")
+            if self._restart:
+                self._restart_node(node, state)
+            return
+        state.running = running
+        if not running:
+            return
+
+        if self._cql_responds(node):
+            if state.cql_unresponsive:
+                self._record(node, "cql_recovered", "CQL port responds again")
+            state.cql_failures = 0
+            state.cql_unresponsive = False
+            return
+
+        state.cql_failures += 1
+        if (
+            state.cql_failures >= self._cql_failures_threshold
+            and not state.cql_unresponsive
+        ):
+            state.cql_unresponsive = True
+            self._record(
+                node,
+                "cql_unresponsive",
+                f"CQL port did not respond {state.cql_failures} times in a row",
+            )
+            if self._restart:
+                self._restart_node(node, state)
+
+    def _cql_responds(self, node) -> bool:
+        try:
+            with socket.create_connection(
+                (node.address(), self._cql_port), timeout=self._cql_timeout
+            ):
+                return True
+        except OSError:
+            return False
+
+    def _check_log(self, node, state: _NodeState) -> None:
+        log_file = Path(node.logfilename())
+        try:
+            size = log_file.stat().st_size
+        except FileNotFoundError:
+            return
+        if size < state.log_offset:
+            # Log was rotated or truncated - start from the beginning.
+            state.log_offset = 0
+        if size == state.log_offset:
+            return
+        with log_file.open(mode="rb") as file:
+            file.seek(state.log_offset)
+            chunk = file.read(size - state.log_offset)
+        # Only consume complete lines, the rest is read on the next round.
+        complete = chunk.rfind(b"\n") + 1
+        state.log_offset += complete
+        for line in chunk[:complete].decode(errors="replace").splitlines():
+            if self._error_pattern.search(line):
+                self._record(node, "log_error", line.strip())
+
+    def _restart_node(self, node, state: _NodeState) -> None:
+        logger.warning("Cluster watchdog restarts %s", node.name)
+        start = time.monotonic()
+        try:
+            if node.is_running():
+                node.stop(gently=False)
+            node.start(wait_for_binary_proto=True)
+        except Exception as exc:
+            self._record(node, "restart_failed", str(exc))
+            return
+        state.running = True
+        state.cql_failures = 0
+        state.cql_unresponsive = False
+        self._record(
+            node,
+            "restarted",
+            f"node restarted in {time.monotonic() - start:.1f}s",
+            capture_log=False,
+        )
+
+    def _record(self, node, kind: str, detail: str, capture_log: bool = True) -> None:
+        with self._lock:
+            index = len(self._incidents) + 1
+        incident = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "elapsed": round(time.monotonic() - self._started_at, 3),
+            "node": node.name,
+            "kind": kind,
+            "detail": detail,
+        }
+        if capture_log:
+            incident["log_copy"] = self._capture_log(node, index, kind)
+        logger.warning("Cluster watchdog incident: %s", incident)
+        with self._lock:
+            self._incidents.append(incident)
+
+    def _capture_log(self, node, index: int, kind: str) -> str | None:
+        if node.name not in self._round_log_copies:
+            self._round_log_copies[node.name] = self._copy_log(node, index, kind)
+        return self._round_log_copies[node.name]
+
+    def _copy_log(self, node, index: int, kind: str) -> str | None:
+        if self._log_dest_dir is None:
+            return None
+        self._log_dest_dir.mkdir(parents=True, exist_ok=True)
+        dest = (
+            self._log_dest_dir
+            / f"{self._log_file_prefix}_{node.name}_incident{index}_{kind}.log"
+        )
+        try:
+            if self._artifacts is not None:
+                self._artifacts.add(Path(node.logfilename()), dest, copy=True)
+            else:
+                shutil.copy(str(node.logfilename()), str(dest))
+        except FileNotFoundError:
+            logger.warning("Log file not found: %s", node.logfilename())
+            return None
+        return str(dest)
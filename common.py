@@ -1,16 +1,50 @@
 import logging
 import subprocess
+from datetime import timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 # CCM_CLUSTER_IP_PREFIX = "127.0.1"
 # CCM_CLUSTER_NODES = 3
 
+# Default timeouts (in seconds) of the commands run in each phase.
+PHASE_TIMEOUTS = {
+    "git": 10 * 60,
+    "patch": 5 * 60,
+    "test": 6 * 60 * 60,
+    "build": 2 * 60 * 60,
+    "bench": 2 * 60 * 60,
+    "profile": 60 * 60,
+    "rerun": 60 * 60,
+}
+
+# cargo-nextest exit code when some tests failed.
+NEXTEST_TEST_RUN_FAILED = 100
+# cargo-nextest exit code when the filters matched no test.
+NEXTEST_NO_TESTS_RUN = 4
+
+
+def scylla_uri_env_name(node: str) -> str:
+    """node1 -> SCYLLA_URI, nodeN -> SCYLLA_URI<N> (e.g. node11 -> SCYLLA_URI11)"""
+    node_index = node.removeprefix("node")
+    if not node_index.isdigit():
+        raise ValueError(f"Unexpected node name: {node}")
+    return "SCYLLA_URI" if node_index == "1" else f"SCYLLA_URI{node_index}"
+
+
+def scylla_uri_env(nodes_ips: dict[str, str]) -> dict[str, str]:
+    return {scylla_uri_env_name(node): f"{ip}:9042" for node, ip in nodes_ips.items()}
+
 
 def scylla_uri_per_node(nodes_ips: dict[str, str]) -> str:
-    uri_per_node: list[str] = []
-    for node, ip in nodes_ips.items():
-        node_index = node.replace("node", "").replace("1", "")
-        uri_per_node.append(f"SCYLLA_URI{node_index}={ip}:9042")
-        # uri_per_node = "SCYLLA_URI=127.0.1.1:9042 " + " ".join([f"SCYLLA_URI{i+1}=127.0.1.{i+1}:9042" for i in range(1, nodes)])
-    return " ".join(uri_per_node)
+    return " ".join(
+        f"{scylla_uri_env_name(node)}={ip}:9042" for node, ip in nodes_ips.items()
+    )
+
+
+def format_test_result(summary: dict[str, Any]) -> dict[str, Any]:
+    """Add human readable duration of the whole suite to ProcessJUnit summary."""
+    summary["time"] = str(timedelta(seconds=summary["testsuite_summary"]["time"]))[
+        :-3
+    ]
+    return summary
@@ -0,0 +1,290 @@
+import argparse
+import json
+import logging
+import os
+import re
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/rust-driver-matrix.sock"
+
+
+class WarmClusterPool:
+    """Keeps started clusters around between jobs, keyed by Scylla version.
+
+    A cluster is reused as long as all of its nodes are alive, otherwise it's
+    recreated. When more than ``max_size`` versions are requested, the least
+    recently used cluster is removed."""
+
+    def __init__(self, driver_directory: Path, max_size: int = 2, watchdog: bool = False):
+        self._driver_directory = driver_directory
+        self._max_size = max_size
+        self._watchdog = watchdog
+        self._clusters: "OrderedDict[str, object]" = OrderedDict()
+
+    def acquire(self, scylla_version: str):
+        from cluster import TestCluster
+
+        cluster = self._clusters.pop(scylla_version, None)
+        if cluster is not None and not cluster.is_healthy():
+            LOGGER.warning("Warm cluster for '%s' is unhealthy, recreating", scylla_version)
+            cluster.__exit__(None, None, None)
+            cluster = None
+        if cluster is None:
+            while len(self._clusters) >= self._max_size:
+                evicted_version, evicted = self._clusters.popitem(last=False)
+                LOGGER.info("Evicting warm cluster for '%s'", evicted_version)
+                evicted.__exit__(None, None, None)
+            LOGGER.info("Starting warm cluster for '%s'", scylla_version)
+            cluster = TestCluster(
+                self._driver_directory,
+                scylla_version,
+                nodes=3,
+                log_dest_dir=Path(os.path.dirname(__file__)) / "test_results",
+                log_file_prefix="daemon",
+                watchdog=self._watchdog,
+                cluster_name="Warm_" + re.sub(r"[^A-Za-z0-9_]", "_", scylla_version),
+            )
+            cluster.start()
+        self._clusters[scylla_version] = cluster
+        return cluster
+
+    def close(self):
+        while self._clusters:
+            _, cluster = self._clusters.popitem()
+            cluster.__exit__(None, None, None)
+
+
+class _EmitHandler(logging.Handler):
+    def __init__(self, emit: Callable[[Dict], None]):
+        super().__init__(level=logging.INFO)
+        self._emit = emit
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._emit({"event": "log", "message": self.format(record)})
+        except OSError:
+            # The client went away, the job keeps running anyway.
+            pass
+
+
+class MatrixDaemon:
+    """Runs matrix jobs on warm clusters and per-tag cargo target directories."""
+
+    def __init__(
+        self,
+        rust_driver_git: str,
+        cache_dir: Path,
+        test_threads: Optional[int] = None,
+        max_clusters: int = 2,
+        watchdog: bool = False,
+    ):
+        self._rust_driver_git = rust_driver_git
+        self._cache_dir = cache_dir
+        self._test_threads = test_threads
+        self._pool = WarmClusterPool(
+            Path(rust_driver_git), max_size=max_clusters, watchdog=watchdog
+        )
+        # There is a single driver working tree, so jobs have to be serialized.
+        self._lock = threading.Lock()
+
+    def target_dir(self, driver_ref: str) -> Path:
+        return self._cache_dir / "target" / re.sub(r"[^A-Za-z0-9_.-]", "_", driver_ref)
+
+    def run_job(self, job: Dict, emit: Callable[[Dict], None]) -> int:
+        from run import Run
+
+        driver_ref = job["driver_ref"]
+        scylla_version = job["scylla_version"]
+        handler = _EmitHandler(emit)
+        root_logger = logging.getLogger()
+        with self._lock:
+            root_logger.addHandler(handler)
+            try:
+                emit({"event": "started", "job": job})
+                cluster = self._pool.acquire(scylla_version)
+                runner = Run(
+                    rust_driver_git=self._rust_driver_git,
+                    tag=driver_ref,
+                    test="rust",
+                    scylla_version=scylla_version,
+                    test_threads=job.get("test_threads", self._test_threads),
+                    test_filter=job.get("test_filter"),
+                    cargo_target_dir=self.target_dir(driver_ref),
+                    cluster=cluster,
+                )
+                report = runner.call_test_func()
+                if not report:
+                    raise RuntimeError(f"No result for driver version {driver_ref}")
+                emit(
+                    {
+                        "event": "result",
+                        "summary": report.summary,
+                        "junit": report.tests_result_xml.read_text(encoding="utf-8"),
+                    }
+                )
+                status = 1 if report.is_failed else 0
+            except Exception:
+                LOGGER.exception("Job %s failed", job)
+                emit({"event": "error", "reason": traceback.format_exc()})
+                status = 1
+            finally:
+                root_logger.removeHandler(handler)
+                # Run.run changes the working directory to the driver repository.
+                os.chdir(os.path.dirname(os.path.abspath(__file__)))
+            emit({"event": "done", "status": status})
+            return status
+
+    def close(self):
+        self._pool.close()
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    server: "MatrixServer"
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        connected = True
+
+        def emit(event: Dict) -> None:
+            nonlocal connected
+            if not connected:
+                return
+            try:
+                self.wfile.write(json.dumps(event).encode() + b"\n")
+                self.wfile.flush()
+            except OSError:
+                # The client went away, the job keeps running anyway.
+                connected = False
+                LOGGER.warning("Client of job %s disconnected", job)
+
+        job = None
+        try:
+            job = json.loads(line)
+            if not {"driver_ref", "scylla_version"} <= job.keys():
+                raise ValueError("job requires 'driver_ref' and 'scylla_version'")
+        except ValueError as exc:
+            emit({"event": "error", "reason": f"Invalid job request: {exc}"})
+            emit({"event": "done", "status": 1})
+            return
+        self.server.daemon.run_job(job, emit)
+
+
+class MatrixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Every client is served in its own thread, so a long job doesn't block
+    accepting the others, which wait for the daemon to run their jobs."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, daemon: MatrixDaemon):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.daemon = daemon
+        super().__init__(socket_path, _JobHandler)
+
+
+def submit_job(socket_path: str, job: Dict) -> Iterator[Dict]:
+    """Send a job to a running daemon and yield its events as they arrive."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(job).encode() + b"\n")
+        with sock.makefile("rb") as stream:
+            for line in stream:
+                yield json.loads(line)
+
+
+def serve(arguments: argparse.Namespace):
+    matrix_daemon = MatrixDaemon(
+        rust_driver_git=arguments.rust_driver_git,
+        cache_dir=Path(arguments.cache_dir),
+        test_threads=arguments.test_threads,
+        max_clusters=arguments.max_clusters,
+        watchdog=arguments.watchdog,
+    )
+    with MatrixServer(arguments.socket, matrix_daemon) as server:
+        LOGGER.info("Matrix daemon listening on %s", arguments.socket)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            matrix_daemon.close()
+            os.unlink(arguments.socket)
+
+
+def submit(arguments: argparse.Namespace):
+    job = {
+        "driver_ref": arguments.driver_ref,
+        "scylla_version": arguments.scylla_version,
+    }
+    if arguments.test_filter:
+        job["test_filter"] = arguments.test_filter
+    status = 1
+    for event in submit_job(arguments.socket, job):
+        if event["event"] == "log":
+            print(event["message"], flush=True)
+        elif event["event"] == "result":
+            print(json.dumps(event["summary"], indent=2), flush=True)
+            if arguments.junit_output:
+                Path(arguments.junit_output).write_text(event["junit"], encoding="utf-8")
+        elif event["event"] == "error":
+            print(event["reason"], file=sys.stderr, flush=True)
+        elif event["event"] == "done":
+            status = event["status"]
+    quit(status)
+
+
+def get_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Long-running matrix service keeping warm clusters and build caches"
+    )
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET, help="Unix socket the daemon listens on"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="start the daemon")
+    serve_parser.add_argument(
+        "rust_driver_git", help="folder with git repository of rust-driver"
+    )
+    serve_parser.add_argument(
+        "--cache-dir",
+        default=str(Path(os.path.dirname(__file__)) / ".matrix_cache"),
+        help="where per-tag cargo target directories are kept",
+    )
+    serve_parser.add_argument("--test-threads", type=int, default=None)
+    serve_parser.add_argument(
+        "--max-clusters",
+        type=int,
+        default=2,
+        help="how many warm clusters (one per Scylla version) to keep",
+    )
+    serve_parser.add_argument("--watchdog", action="store_true")
+
+    submit_parser = subparsers.add_parser("submit", help="submit a job to the daemon")
+    submit_parser.add_argument("driver_ref", help="driver tag or ref to test")
+    submit_parser.add_argument("--scylla-version", required=True)
+    submit_parser.add_argument("--test-filter", help="nextest filter expression")
+    submit_parser.add_argument(
+        "--junit-output", help="where to write the processed junit file"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    if args.command == "serve":
+        serve(args)
+    else:
+        submit(args)
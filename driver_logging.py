@@ -0,0 +1,118 @@
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+
+import yaml
+
+from ignore_rules import VERSIONS_DIR
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE_NAME = "logging.yaml"
+
+DEFAULT_CONFIG = {
+    # RUST_LOG of the test suite run.
+    "level": "info",
+    # Failing tests are run again with this RUST_LOG and the output is merged
+    # into their junit testcase.
+    "failure_level": "trace",
+    "rerun_failed": True,
+    # More failures than this usually mean a broken cluster, not worth a rerun.
+    "max_reruns": 20,
+}
+
+# Options of the test command that select tests, replaced by the rerun filter.
+SELECTION_OPTIONS = ("-E", "--filter-expr", "--partition")
+
+
+def load_config(driver_version: str, versions_dir: Path = VERSIONS_DIR) -> Dict:
+    """Logging settings of a driver version: ``versions/logging.yaml`` overridden by
+    ``versions/scylla/<tag>/logging.yaml``."""
+    config = dict(DEFAULT_CONFIG)
+    for config_file in (
+        versions_dir / CONFIG_FILE_NAME,
+        versions_dir / "scylla" / driver_version / CONFIG_FILE_NAME,
+    ):
+        if config_file.is_file():
+            config.update(yaml.safe_load(config_file.read_text(encoding="utf-8")) or {})
+    return config
+
+
+def failed_tests(junit_file: Path, ignore_set=None) -> List[Tuple[str, str]]:
+    """(binary id, test name) of the failed testcases, except known failures."""
+    failed = []
+    for testcase in ElementTree.parse(junit_file).getroot().iter("testcase"):
+        if testcase.find("failure") is None and testcase.find("error") is None:
+            continue
+        name = testcase.attrib["name"]
+        if ignore_set is not None and ignore_set.match(name) is not None:
+            continue
+        failed.append((testcase.attrib.get("classname", ""), name))
+    return failed
+
+
+def rerun_filter(tests: Sequence[Tuple[str, str]]) -> str:
+    return " | ".join(
+        f"(binary_id({binary_id}) & test(={name}))" if binary_id else f"test(={name})"
+        for binary_id, name in tests
+    )
+
+
+def rerun_command(test_command: List[str], tests: Sequence[Tuple[str, str]]) -> List[str]:
+    """``test_command`` running exactly ``tests``, its own filters and partition are
+    dropped (nextest ORs several ``-E`` filters and partitions the filtered set)."""
+    command = []
+    skip_value = False
+    for arg in test_command:
+        if skip_value:
+            skip_value = False
+        elif arg in SELECTION_OPTIONS:
+            skip_value = True
+        elif not arg.startswith(tuple(f"{option}=" for option in SELECTION_OPTIONS)):
+            command.append(arg)
+    return command + ["-E", rerun_filter(tests)]
+
+
+def _output(testcase: ElementTree.Element) -> str:
+    return "\n".join(
+        element.text or ""
+        for element in (testcase.find("system-out"), testcase.find("system-err"))
+        if element is not None
+    )
+
+
+def merge_rerun(junit_file: Path, rerun_junit_file: Path, level: str) -> Dict[str, str]:
+    """Append the output of every rerun testcase to the same failed testcase of
+    ``junit_file``. Results of the first run are kept, the rerun outcome is added
+    as the ``rerun`` attribute of the testcase. Returns test -> rerun outcome."""
+    reruns: Dict[Tuple[Optional[str], str], ElementTree.Element] = {
+        (testcase.attrib.get("classname"), testcase.attrib["name"]): testcase
+        for testcase in ElementTree.parse(rerun_junit_file).getroot().iter("testcase")
+    }
+    tree = ElementTree.parse(junit_file)
+    outcomes = {}
+    for testcase in tree.getroot().iter("testcase"):
+        key = (testcase.attrib.get("classname"), testcase.attrib["name"])
+        if key not in reruns:
+            continue
+        rerun = reruns[key]
+        outcome = (
+            "failed"
+            if rerun.find("failure") is not None or rerun.find("error") is not None
+            else "passed"
+        )
+        testcase.attrib["rerun"] = outcome
+        outcomes[testcase.attrib["name"]] = outcome
+        system_out = testcase.find("system-out")
+        if system_out is None:
+            system_out = ElementTree.SubElement(testcase, "system-out")
+        system_out.text = (
+            f"{system_out.text or ''}\n"
+            f"--- rerun with RUST_LOG={level}: {outcome} ---\n"
+            f"{_output(rerun)}"
+        )
+    temp = junit_file.with_name(f".{junit_file.name}.tmp")
+    tree.write(temp, encoding="utf-8", xml_declaration=True)
+    temp.replace(junit_file)
+    return outcomes
@@ -0,0 +1,168 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.version import Version
+
+from ignore_rules import VERSIONS_DIR
+from patched_refs import patch_files, patched_ref
+from process import ProcessError, command_output, run_commands_concurrently
+
+LOGGER = logging.getLogger(__name__)
+
+TAG_PATTERN = re.compile(r"^v(\d+)\.(\d+)\.(\d+)$")
+LATEST_RULE = re.compile(r"^latest(?::(\d+|all))?$")
+
+# Tags whose patched refs are created at the same time.
+PREPARE_WORKERS = 4
+
+
+class DriverTag:
+    def __init__(self, name: str, commit: str):
+        self.name = name
+        self.commit = commit
+        self.version = Version(name.removeprefix("v"))
+
+    @property
+    def release_line(self) -> Tuple[int, ...]:
+        """Versions sharing the release line differ only by patch releases. Before
+        1.0 the second number is the major version and the third the minor one, so
+        every 0.x.y release is a line of its own."""
+        major, minor, patch = self.version.release
+        if major == 0:
+            return (major, minor, patch)
+        return (major, minor)
+
+    def __repr__(self) -> str:
+        return f"DriverTag({self.name!r})"
+
+
+def list_tags(**command_kwargs) -> List[DriverTag]:
+    """Release tags (``vX.Y.Z``) of the driver repository, read by a single
+    ``git for-each-ref`` call. Other tags are skipped. ``command_kwargs`` are passed
+    to ``run_command`` and must include ``cwd`` of the repository."""
+    tags = []
+    for line in command_output(
+        [
+            "git",
+            "for-each-ref",
+            "--format=%(refname:short) %(*objectname) %(objectname)",
+            "refs/tags",
+        ],
+        **command_kwargs,
+    ):
+        name, *objects = line.split()
+        if not TAG_PATTERN.match(name):
+            LOGGER.debug("Skipping tag '%s', it is not a release tag", name)
+            continue
+        # Annotated tags point to the tag object, %(*objectname) is its commit.
+        tags.append(DriverTag(name, objects[0]))
+    return tags
+
+
+def select_tags(tags: List[DriverTag], spec: str) -> List[str]:
+    """Names of the tags selected by ``spec``, newest first.
+
+    ``spec`` is a ``;`` separated list of:
+
+    * version ranges, e.g. ``>=1.4,<2`` - only versions in all the ranges are selected,
+    * ``latest:N`` - only the newest patch release of the N newest minor versions,
+      ``latest:all`` (or ``latest``) - the newest patch release of every minor version.
+
+    Without a ``latest`` rule every tag in the ranges is selected."""
+    selected = sorted(tags, key=lambda tag: tag.version, reverse=True)
+    latest = None
+    for term in (term.strip() for term in spec.split(";")):
+        if not term:
+            continue
+        if match := LATEST_RULE.match(term):
+            latest = match.group(1) or "all"
+            continue
+        try:
+            specifier = SpecifierSet(term)
+        except InvalidSpecifier as error:
+            raise ValueError(f"Invalid version selection '{term}' in '{spec}'") from error
+        selected = [tag for tag in selected if tag.version in specifier]
+
+    if latest is not None:
+        newest_of_line: Dict[Tuple[int, ...], DriverTag] = {}
+        for tag in selected:
+            newest_of_line.setdefault(tag.release_line, tag)
+        selected = list(newest_of_line.values())
+        if latest != "all":
+            selected = selected[: int(latest)]
+    return [tag.name for tag in selected]
+
+
+def _missing_refs(refs: List[str], **command_kwargs) -> List[str]:
+    results = run_commands_concurrently(
+        dict(
+            args=["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+            **command_kwargs,
+        )
+        for ref in refs
+    )
+    return [ref for ref, result in zip(refs, results) if result.returncode != 0]
+
+
+def _fetch_command(tag: str, remote: str, **command_kwargs) -> Dict:
+    return dict(
+        args=[
+            "git",
+            "fetch",
+            "--no-tags",
+            # Parallel fetches would all write FETCH_HEAD.
+            "--no-write-fetch-head",
+            remote,
+            f"refs/tags/{tag}:refs/tags/{tag}",
+        ],
+        **command_kwargs,
+    )
+
+
+def _prepare_tag(tag: str, **command_kwargs) -> str:
+    driver_version = tag.split("-", maxsplit=1)[0]
+    return patched_ref(
+        tag, patch_files(VERSIONS_DIR / "scylla" / driver_version), **command_kwargs
+    )
+
+
+def prepare_tags(
+    tags: List[str],
+    remote: str = "origin",
+    workers: int = PREPARE_WORKERS,
+    **command_kwargs,
+) -> Dict[str, str]:
+    """Fetch the selected tags missing locally and create the patched refs of all
+    of them in parallel, so that every version is ready to be checked out before
+    the first one runs. Returns tag -> ref to check out.
+
+    Tags that cannot be fetched or patched are left out (and logged), the run of
+    such a version fails and reports it as before."""
+    missing = _missing_refs(tags, **command_kwargs)
+    fetches = run_commands_concurrently(
+        _fetch_command(tag, remote, **command_kwargs) for tag in missing
+    )
+    unavailable = set()
+    for tag, fetch in zip(missing, fetches):
+        if fetch.returncode == 0:
+            LOGGER.info("Fetched tag %s from %s", tag, remote)
+        else:
+            LOGGER.warning("Cannot fetch tag %s from %s: %s", tag, remote, fetch.tail)
+            unavailable.add(tag)
+
+    refs = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        preparations = {
+            tag: executor.submit(_prepare_tag, tag, **command_kwargs)
+            for tag in tags
+            if tag not in unavailable
+        }
+        for tag, preparation in preparations.items():
+            try:
+                refs[tag] = preparation.result()
+            except ProcessError:
+                LOGGER.warning("Cannot prepare %s for checkout", tag, exc_info=True)
+    return refs
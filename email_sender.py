@@ -8,18 +8,28 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from datetime import datetime
 from pathlib import Path
+from typing import Tuple
 from subprocess import check_output
 
-import jinja2
-import boto3
+from artifacts import replace_text
 
 KEYSTORE_S3_BUCKET = "scylla-qa-keystore"
 
 LOGGER = logging.getLogger(__name__)
 
 
+def split_smtp_server(smtp_server: str) -> Tuple[str, int]:
+    """(host, port) of a "host:port" SMTP server address."""
+    host, _, port = smtp_server.rpartition(":")
+    if not host or not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"SMTP server must be given as host:port, got '{smtp_server}'")
+    return host, int(port)
+
+
 class KeyStore:
     def __init__(self):
+        import boto3
+
         self.s3 = boto3.resource("s3")
 
     def get_file_contents(self, file_name):
@@ -61,14 +71,20 @@ class Email:
     _attachments_size_limit = 10485760  # 10Mb = 20 * 1024 * 1024
     _body_size_limit = 26214400  # 25Mb = 20 * 1024 * 1024
 
-    def __init__(self):
+    def __init__(self, smtp_server: str | None = None):
+        """``smtp_server`` ("host:port") is a relay accepting mail without
+        authentication, e.g. a local stand-in; the keystore credentials are used
+        for the default server."""
         self.sender = "qa@scylladb.com"
         self._password = ""
         self._user = ""
         self._server_host = "smtp.gmail.com"
-        self._server_port = "587"
+        self._server_port = 587
         self._conn = None
-        self._retrieve_credentials()
+        if smtp_server:
+            self._server_host, self._server_port = split_smtp_server(smtp_server)
+        else:
+            self._retrieve_credentials()
         self._connect()
 
     def _retrieve_credentials(self):
@@ -80,8 +96,9 @@ class Email:
     def _connect(self):
         self.conn = smtplib.SMTP(host=self._server_host, port=self._server_port)
         self.conn.ehlo()
-        self.conn.starttls()
-        self.conn.login(user=self._user, password=self._password)
+        if self._user:
+            self.conn.starttls()
+            self.conn.login(user=self._user, password=self._password)
 
     def prepare_email(self, subject, content, recipients, html=True, files=()):  # pylint: disable=too-many-arguments
         msg = MIMEMultipart()
@@ -131,7 +148,9 @@ class Email:
         self.conn.quit()
 
 
-def send_mail(recipients, report):
+def render_report(report) -> str:
+    import jinja2
+
     loader = jinja2.FileSystemLoader(
         os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_templates")
     )
@@ -139,23 +158,31 @@ def send_mail(recipients, report):
         loader=loader, autoescape=True, extensions=["jinja2.ext.loopcontrols"]
     )
     template = env.get_template("report.html")
-    html = template.render(report)
+    return template.render(report)
+
+
+def send_mail(recipients, report, smtp_server=None):
+    html = render_report(report)
     email_in_file = (
         Path(os.path.dirname(__file__)) / "test_results" / "test_results_email.html"
     )
-    with email_in_file.open(mode="w", encoding="utf-8") as file:
-        file.write(html)
+    replace_text(email_in_file, html)
     LOGGER.info(
         "Results has been rendered to html and save into an email %s", email_in_file
     )
 
-    email_client = Email()
+    email_client = Email(smtp_server)
     LOGGER.info("Sending email to '%s'", recipients)
     subject = f"{report['status']}: {report['job_name']} {report['build_id']} - {datetime.now()}"
 
     email_client.send(subject=subject, content=html, recipients=recipients)
 
 
+def send_notification(recipients, subject, content, smtp_server=None):
+    LOGGER.info("Sending notification '%s' to '%s'", subject, recipients)
+    Email(smtp_server).send(subject=subject, content=content, recipients=recipients, html=False)
+
+
 def get_scylla_build_info():
     for build_info in Path(os.getenv("WORKSPACE", ".")).glob("**/00-Build.txt"):
         return dict(
@@ -180,7 +207,7 @@ def get_driver_origin_remote(rust_driver_path):
 
 
 def create_report(results, **kwargs):
-    build_info = get_scylla_build_info()
+    build_info = get_scylla_build_info() or {}
     scylla_version = (
         f"{build_info.get('scylla-version')}-{build_info.get('scylla-release')}"
     )
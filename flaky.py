@@ -0,0 +1,343 @@
+import argparse
+import json
+import logging
+import math
+import re
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from xml.etree import ElementTree
+
+from ignore_rules import VERSIONS_DIR, load_rules
+
+LOGGER = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = ".flaky_index.json"
+RESULT_FILE_PATTERN = re.compile(r"^rust_results_(?P<tag>.+)\.xml$")
+
+# Fewer runs than this are not enough evidence to suggest any ignore.yaml change.
+MIN_RUNS = 5
+# Each side of a change point needs at least this many runs.
+MIN_SEGMENT = 3
+# Twice the log-likelihood ratio of a single change point, chi-square with 1
+# degree of freedom at 99% - scanning all split points inflates false positives.
+CHANGE_POINT_THRESHOLD = 6.63
+# Failure rate since the last change point above which a test is broken, not flaky.
+BROKEN_RATE = 0.8
+
+STABLE = "stable"
+FLAKY = "flaky"
+NEWLY_BROKEN = "newly_broken"
+
+FAILED_TAGS = ("failure", "error", "ignored_on_failure")
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def parse_run(xml_file: Path) -> Dict:
+    """Outcomes of all testcases of one processed junit file.
+
+    Failures marked as ``ignored_on_failure`` count as failures, the history is
+    about the test, not about the ignore list."""
+    tag = RESULT_FILE_PATTERN.match(xml_file.name).group("tag")
+    metadata_file = xml_file.with_name(f"metadata_{xml_file.stem}.json")
+    metadata = (
+        json.loads(metadata_file.read_text(encoding="utf-8"))
+        if metadata_file.exists()
+        else {}
+    )
+    timestamp = None
+    passed: List[str] = []
+    failed: List[str] = []
+    for event, element in ElementTree.iterparse(xml_file, events=("start", "end")):
+        if event == "start":
+            if timestamp is None and element.tag in ("testsuites", "testsuite"):
+                timestamp = _parse_timestamp(element.attrib.get("timestamp"))
+            continue
+        if element.tag != "testcase":
+            continue
+        children = {child.tag for child in element}
+        if children.intersection(FAILED_TAGS):
+            failed.append(element.attrib["name"])
+        elif "skipped" not in children:
+            passed.append(element.attrib["name"])
+        element.clear()
+    return dict(
+        tag=tag,
+        scylla_version=metadata.get("scylla_version", "unknown"),
+        timestamp=timestamp if timestamp is not None else xml_file.stat().st_mtime,
+        passed=passed,
+        failed=failed,
+    )
+
+
+def load_history(history_dir: Path) -> List[Dict]:
+    """All runs archived under ``history_dir``, oldest first.
+
+    Parsed runs are cached in an index file next to them, keyed by path, size
+    and mtime, so only new junit files are parsed at report time."""
+    index_file = history_dir / INDEX_FILE_NAME
+    index = (
+        json.loads(index_file.read_text(encoding="utf-8"))
+        if index_file.exists()
+        else {}
+    )
+    runs = []
+    updated = {}
+    for xml_file in history_dir.rglob("rust_results_*.xml"):
+        if not RESULT_FILE_PATTERN.match(xml_file.name):
+            continue
+        stat = xml_file.stat()
+        key = str(xml_file.relative_to(history_dir))
+        entry = index.get(key)
+        if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            try:
+                entry = dict(mtime_ns=stat.st_mtime_ns, size=stat.st_size, run=parse_run(xml_file))
+            except ElementTree.ParseError:
+                LOGGER.warning("Skipping unreadable junit file %s", xml_file)
+                continue
+        updated[key] = entry
+        runs.append(dict(entry["run"], path=key))
+    if updated != index:
+        index_file.write_text(json.dumps(updated), encoding="utf-8")
+    LOGGER.info("Loaded %d runs from %s", len(runs), history_dir)
+    return sorted(runs, key=lambda run: (run["timestamp"], run["path"]))
+
+
+def archive_run(results_dir: Path, history_dir: Path, file_names: Iterable[str]) -> Path:
+    """Copy the processed junit and metadata files of the current run into the history.
+
+    ``file_names`` are the files this run produced, ``results_dir`` is reused between
+    runs and files left by earlier ones (other versions, the previous result of a
+    version that crashed this time) must not be archived again."""
+    destination = history_dir / datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    destination.mkdir(parents=True)
+    for file_name in file_names:
+        file_path = results_dir / file_name
+        if file_path.exists():
+            shutil.copy2(file_path, destination / file_name)
+        else:
+            LOGGER.warning("Result file %s of the run is missing, not archived", file_path)
+    return destination
+
+
+def _log_likelihood(failures: int, runs: int) -> float:
+    if failures in (0, runs):
+        return 0.0
+    rate = failures / runs
+    return failures * math.log(rate) + (runs - failures) * math.log(1 - rate)
+
+
+def change_point(outcomes: List[bool]) -> Optional[int]:
+    """Index of the most likely single change of the failure rate, if significant.
+
+    Bernoulli likelihood ratio test over all split points, using prefix sums."""
+    runs = len(outcomes)
+    if runs < 2 * MIN_SEGMENT:
+        return None
+    prefix = [0]
+    for failed in outcomes:
+        prefix.append(prefix[-1] + failed)
+    total = _log_likelihood(prefix[-1], runs)
+    best, best_index = 0.0, None
+    for index in range(MIN_SEGMENT, runs - MIN_SEGMENT + 1):
+        before = prefix[index]
+        after = prefix[-1] - before
+        ratio = _log_likelihood(before, index) + _log_likelihood(after, runs - index) - total
+        if ratio > best:
+            best, best_index = ratio, index
+    return best_index if 2 * best >= CHANGE_POINT_THRESHOLD else None
+
+
+def _run_info(run: Dict) -> Dict:
+    return dict(
+        path=run["path"],
+        scylla_version=run["scylla_version"],
+        time=datetime.fromtimestamp(run["timestamp"], timezone.utc).isoformat(),
+    )
+
+
+def classify(runs: List[Dict]) -> Dict:
+    """Classify one test of one driver tag, ``runs`` are (run, failed) pairs oldest first."""
+    outcomes = [failed for _, failed in runs]
+    split = change_point(outcomes)
+    recent = runs[split or 0 :]
+    recent_failures = sum(failed for _, failed in recent)
+    recent_rate = recent_failures / len(recent)
+    if recent_failures == 0:
+        status = STABLE
+    elif recent_rate >= BROKEN_RATE:
+        status = NEWLY_BROKEN
+    else:
+        status = FLAKY
+
+    per_scylla: Dict[str, List[int]] = {}
+    for run, failed in recent:
+        counts = per_scylla.setdefault(run["scylla_version"], [0, 0])
+        counts[0] += failed
+        counts[1] += 1
+    failed_runs = [run for run, failed in runs if failed]
+    evidence = dict(
+        runs=len(runs),
+        failures=len(failed_runs),
+        failure_rate=round(len(failed_runs) / len(runs), 3),
+        recent_runs=len(recent),
+        recent_failure_rate=round(recent_rate, 3),
+        scylla_versions={
+            version: dict(failures=failures, runs=total)
+            for version, (failures, total) in sorted(per_scylla.items())
+        },
+        last_failure=_run_info(failed_runs[-1]) if failed_runs else None,
+    )
+    if split is not None:
+        before = outcomes[:split]
+        evidence["change_point"] = dict(
+            since=_run_info(runs[split][0]),
+            failure_rate_before=round(sum(before) / len(before), 3),
+            failure_rate_after=round(recent_rate, 3),
+        )
+    return dict(status=status, evidence=evidence)
+
+
+def analyze(
+    runs: List[Dict],
+    tags: Optional[Iterable[str]] = None,
+    versions_dir: Path = VERSIONS_DIR,
+) -> Dict:
+    """Classify every test that failed at least once and suggest ignore.yaml changes.
+
+    Tests are analysed per driver tag, as ignore lists are per tag. Tests that never
+    failed are only counted, which keeps the analysis linear in the number of failures."""
+    rules = load_rules(versions_dir)
+    by_tag: Dict[str, List[Dict]] = {}
+    for run in runs:
+        by_tag.setdefault(run["tag"], []).append(run)
+    selected = list(tags) if tags is not None else sorted(by_tag)
+
+    report: Dict[str, Dict] = {}
+    for tag in selected:
+        tag_runs = by_tag.get(tag, [])
+        passed_sets = [set(run["passed"]) for run in tag_runs]
+        failed_sets = [set(run["failed"]) for run in tag_runs]
+        ever_failed = set().union(*failed_sets)
+
+        tests = {}
+        for test in sorted(ever_failed):
+            history = [
+                (run, test in failed)
+                for run, passed, failed in zip(tag_runs, passed_sets, failed_sets)
+                if test in failed or test in passed
+            ]
+            tests[test] = classify(history)
+
+        additions = []
+        for test, result in tests.items():
+            if result["status"] == STABLE or result["evidence"]["recent_runs"] < MIN_RUNS:
+                continue
+            per_scylla = result["evidence"]["scylla_versions"]
+            failing = [version for version, counts in per_scylla.items() if counts["failures"]]
+            if all(rules.index(tag, version).match(test) for version in failing):
+                continue
+            suggestion = dict(test=test, reason=result["status"], evidence=result["evidence"])
+            passing = [
+                version
+                for version, counts in per_scylla.items()
+                if not counts["failures"] and counts["runs"] >= MIN_RUNS
+            ]
+            if passing:
+                # Failures are confined to some Scylla versions, which keep the
+                # test running against the others.
+                suggestion["version_ignore"] = "|".join(
+                    re.escape(version.removeprefix("release:")) for version in failing
+                )
+            additions.append(suggestion)
+
+        removals = []
+        for rule in rules.rules:
+            if not rule.applies_to_driver(tag):
+                continue
+            pattern = re.compile(rule.regex)
+            history = []
+            for run, passed, failed in zip(tag_runs, passed_sets, failed_sets):
+                if not rule.applies_to(tag, run["scylla_version"]):
+                    continue
+                if any(pattern.match(test) for test in failed):
+                    history.append((run, True))
+                elif any(pattern.match(test) for test in passed):
+                    history.append((run, False))
+            if len(history) < MIN_RUNS or any(failed for _, failed in history[-MIN_RUNS:]):
+                continue
+            removal = dict(
+                test=rule.pattern,
+                rule=rule.as_dict(),
+                evidence=dict(
+                    consecutive_passes=next(
+                        (index for index, (_, failed) in enumerate(reversed(history)) if failed),
+                        len(history),
+                    ),
+                    runs=len(history),
+                    last_run=_run_info(history[-1][0]),
+                ),
+            )
+            if rule.scylla_regex is not None:
+                removal["version_ignore"] = rule.scylla_regex
+            removals.append(removal)
+
+        report[tag] = dict(
+            runs=len(tag_runs),
+            stable_tests=len(set().union(*passed_sets) - ever_failed) if passed_sets else 0,
+            tests=tests,
+            suggestions=dict(add=additions, remove=removals),
+        )
+    return report
+
+
+def summary(report: Dict) -> List[Dict]:
+    """Flat list of suggested ignore.yaml changes, for the email report."""
+    rows = []
+    for tag, tag_report in report.items():
+        for action in ("add", "remove"):
+            for suggestion in tag_report["suggestions"][action]:
+                evidence = suggestion["evidence"]
+                rows.append(
+                    dict(
+                        tag=tag,
+                        action=action,
+                        test=suggestion["test"],
+                        reason=suggestion.get("reason", "passing"),
+                        version_ignore=suggestion.get("version_ignore"),
+                        evidence=(
+                            f"{evidence['failures']}/{evidence['runs']} runs failed"
+                            if action == "add"
+                            else f"{evidence['consecutive_passes']} consecutive passes"
+                        ),
+                    )
+                )
+    return rows
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Find flaky and newly broken tests in archived matrix results"
+    )
+    parser.add_argument("history_dir", type=Path, help="folder with archived processed junit files")
+    parser.add_argument("--versions", nargs="*", help="driver tags to analyse, default - all")
+    parser.add_argument("--output", type=Path, help="write the full report to this JSON file")
+    arguments = parser.parse_args()
+
+    flaky_report = analyze(load_history(arguments.history_dir), arguments.versions)
+    if arguments.output:
+        arguments.output.write_text(json.dumps(flaky_report, indent=2))
+    print(json.dumps(summary(flaky_report), indent=2))
@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from artifacts import replace_text
+
+LOGGER = logging.getLogger(__name__)
+
+# CQL port and Scylla shard-aware port.
+CQL_PORTS = (9042, 19042)
+
+METRICS = ("rss_bytes", "threads", "open_fds", "sockets", "minor_faults_per_s")
+
+
+def _read_status(pid: int) -> Dict[str, str]:
+    status = {}
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        key, _, value = line.partition(":")
+        status[key] = value.strip()
+    return status
+
+
+def _minor_faults(pid: int) -> int:
+    stat = Path(f"/proc/{pid}/stat").read_text()
+    # Command name may contain spaces, fields are counted from the closing paren.
+    fields = stat[stat.rindex(")") + 2 :].split()
+    return int(fields[7])
+
+
+def _decode_address(hex_address: str) -> tuple[str, int]:
+    address, port = hex_address.split(":")
+    if len(address) == 8:
+        ip = socket.inet_ntop(socket.AF_INET, bytes.fromhex(address)[::-1])
+    else:
+        # /proc shows IPv6 addresses as four little endian 32 bit words.
+        raw = b"".join(
+            bytes.fromhex(address[index : index + 8])[::-1] for index in range(0, 32, 8)
+        )
+        ip = socket.inet_ntop(socket.AF_INET6, raw)
+        ip = ip.removeprefix("::ffff:")
+    return ip, int(port, 16)
+
+
+def _socket_inodes(pid: int) -> tuple[int, set[str]]:
+    fd_dir = Path(f"/proc/{pid}/fd")
+    fds = 0
+    inodes = set()
+    for fd in fd_dir.iterdir():
+        fds += 1
+        try:
+            target = os.readlink(fd)
+        except OSError:
+            continue
+        if target.startswith("socket:["):
+            inodes.add(target[len("socket:[") : -1])
+    return fds, inodes
+
+
+def sockets_per_node(pid: int, inodes: set[str], ports: Iterable[int] = CQL_PORTS) -> Dict[str, int]:
+    """Count the process' TCP connections per remote address, for the given remote ports."""
+    ports = set(ports)
+    result: Dict[str, int] = {}
+    for table in ("tcp", "tcp6"):
+        path = Path(f"/proc/{pid}/net/{table}")
+        if not path.exists():
+            continue
+        for line in path.read_text().splitlines()[1:]:
+            fields = line.split()
+            if fields[9] not in inodes:
+                continue
+            ip, port = _decode_address(fields[2])
+            if port in ports:
+                result[ip] = result.get(ip, 0) + 1
+    return result
+
+
+def sample_process(pid: int, previous: Optional[Dict] = None) -> Dict:
+    now = time.monotonic()
+    status = _read_status(pid)
+    faults = _minor_faults(pid)
+    fds, inodes = _socket_inodes(pid)
+    per_node = sockets_per_node(pid, inodes)
+    sample = dict(
+        time=now,
+        rss_bytes=int(status["VmRSS"].split()[0]) * 1024,
+        threads=int(status["Threads"]),
+        open_fds=fds,
+        sockets=sum(per_node.values()),
+        sockets_per_node=per_node,
+        minor_faults=faults,
+        minor_faults_per_s=0.0,
+    )
+    if previous is not None and now > previous["time"]:
+        sample["minor_faults_per_s"] = (faults - previous["minor_faults"]) / (
+            now - previous["time"]
+        )
+    return sample
+
+
+class ProcessSampler:
+    """Samples resource usage of a process in a background thread.
+
+    Minor page faults per second are used as the allocation rate, as it is
+    the only allocator-agnostic signal available through /proc."""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        self.pid = pid
+        self._interval = interval
+        self.samples: List[Dict] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._loop, name=f"sampler-{pid}", daemon=True
+        )
+
+    def start(self) -> "ProcessSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> List[Dict]:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _loop(self) -> None:
+        start = time.monotonic()
+        previous = None
+        while not self._stop.is_set():
+            try:
+                sample = sample_process(self.pid, previous)
+            except (FileNotFoundError, ProcessLookupError, KeyError, ValueError):
+                # Gone, or a zombie whose status has no memory fields anymore.
+                break
+            previous = sample
+            recorded = {key: value for key, value in sample.items() if key != "time"}
+            recorded["elapsed"] = round(sample["time"] - start, 3)
+            self.samples.append(recorded)
+            self._stop.wait(self._interval)
+
+
+def summarize(samples: List[Dict]) -> Dict:
+    """Peak and steady state (median of the second half of the run) of every metric."""
+    if not samples:
+        return {}
+    steady = samples[len(samples) // 2 :]
+    summary = {
+        metric: dict(
+            peak=max(sample[metric] for sample in samples),
+            steady=statistics.median(sample[metric] for sample in steady),
+        )
+        for metric in METRICS
+    }
+    nodes = sorted({node for sample in samples for node in sample["sockets_per_node"]})
+    summary["sockets_per_node"] = {
+        node: dict(
+            peak=max(sample["sockets_per_node"].get(node, 0) for sample in samples),
+            steady=statistics.median(
+                sample["sockets_per_node"].get(node, 0) for sample in steady
+            ),
+        )
+        for node in nodes
+    }
+    return summary
+
+
+def compare_versions(results: Dict[str, Optional[Dict]]) -> Dict:
+    """Side by side table: metric -> version -> peak/steady."""
+    return {
+        metric: {
+            version: summary[metric]
+            for version, summary in results.items()
+            if summary and metric in summary
+        }
+        for metric in METRICS
+    }
+
+
+class FootprintReport:
+    """Result of the ``profile`` test of one driver version, ``main`` treats it
+    the same way as ProcessJUnit."""
+
+    def __init__(self, samples: List[Dict], workload_failed: bool = False):
+        self.samples = samples
+        self.summary = summarize(samples)
+        self._workload_failed = workload_failed
+
+    @property
+    def is_failed(self) -> bool:
+        return self._workload_failed or not self.samples
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        replace_text(path, json.dumps(dict(summary=self.summary, samples=self.samples)))
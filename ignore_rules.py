@@ -0,0 +1,294 @@
+import fnmatch
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.version import InvalidVersion, Version
+
+LOGGER = logging.getLogger(__name__)
+
+VERSIONS_DIR = Path(os.path.dirname(__file__)) / "versions"
+# Rules of this file apply to all driver tags, unless limited with ``driver``.
+SHARED_RULES_FILE = "ignore.yaml"
+
+EXACT = "exact"
+GLOB = "glob"
+REGEX = "regex"
+
+
+def _parse_version(version: str) -> Optional[Version]:
+    try:
+        return Version(version.removeprefix("release:").removeprefix("v"))
+    except InvalidVersion:
+        return None
+
+
+class IgnoreRule:
+    """A single ignore rule: which tests (exact name, glob or regex) are ignored
+    for which driver tags and Scylla versions."""
+
+    def __init__(
+        self,
+        rule_id: str,
+        pattern: str,
+        kind: str = EXACT,
+        tag: Optional[str] = None,
+        driver: Optional[str] = None,
+        scylla: Optional[str] = None,
+        scylla_regex: Optional[str] = None,
+        reason: Optional[str] = None,
+    ):
+        if kind not in (EXACT, GLOB, REGEX):
+            raise ValueError(f"Unknown kind '{kind}' of ignore rule {rule_id}")
+        try:
+            self.driver = SpecifierSet(driver) if driver else None
+            self.scylla = SpecifierSet(scylla) if scylla else None
+        except InvalidSpecifier as error:
+            raise ValueError(f"Invalid version range in ignore rule {rule_id}: {error}")
+        self.rule_id = rule_id
+        self.pattern = pattern
+        self.kind = kind
+        self.tag = tag
+        self.scylla_regex = scylla_regex
+        self.reason = reason
+        # Validates the pattern early, with the rule id in the error.
+        try:
+            re.compile(self.regex)
+        except re.error as error:
+            raise ValueError(f"Invalid pattern in ignore rule {rule_id}: {error}")
+
+    @property
+    def regex(self) -> str:
+        if self.kind == GLOB:
+            return fnmatch.translate(self.pattern)
+        if self.kind == REGEX:
+            return f"(?:{self.pattern})\\Z"
+        return re.escape(self.pattern) + "\\Z"
+
+    def applies_to_driver(self, driver_version: str) -> bool:
+        if self.tag is not None:
+            return driver_version == self.tag
+        if self.driver is not None:
+            version = _parse_version(driver_version)
+            return version is not None and version in self.driver
+        return True
+
+    def applies_to(self, driver_version: str, scylla_version: str) -> bool:
+        if not self.applies_to_driver(driver_version):
+            return False
+        effective_version = scylla_version.removeprefix("release:")
+        if self.scylla_regex is not None and not re.match(
+            self.scylla_regex, effective_version
+        ):
+            return False
+        if self.scylla is not None:
+            version = _parse_version(effective_version)
+            if version is None or version not in self.scylla:
+                return False
+        return True
+
+    def as_dict(self) -> Dict:
+        result = dict(id=self.rule_id, kind=self.kind, pattern=self.pattern)
+        if self.tag is not None:
+            result["tag"] = self.tag
+        if self.driver is not None:
+            result["driver"] = str(self.driver)
+        if self.scylla is not None:
+            result["scylla"] = str(self.scylla)
+        if self.scylla_regex is not None:
+            result["scylla_regex"] = self.scylla_regex
+        if self.reason:
+            result["reason"] = self.reason
+        return result
+
+    def __repr__(self) -> str:
+        return f"IgnoreRule({self.as_dict()})"
+
+
+class IgnoreIndex:
+    """Rules applicable to one (driver tag, Scylla version) pair.
+
+    Exact names are looked up in a dict, glob and regex rules are compiled into a
+    single alternation, whose matching group tells which rule matched. Regex rules
+    with capturing groups are matched one by one, their group names or
+    backreferences would clash with the other alternatives."""
+
+    def __init__(self, rules: List[IgnoreRule]):
+        self.rules = rules
+        self._exact: Dict[str, IgnoreRule] = {}
+        # (kind, pattern) -> all rules sharing it, only the first one is matched.
+        self._equivalent: Dict[Tuple[str, str], List[IgnoreRule]] = {}
+        self._separate: List[Tuple[re.Pattern, IgnoreRule]] = []
+        patterns: List[IgnoreRule] = []
+        for rule in rules:
+            equivalent = self._equivalent.setdefault((rule.kind, rule.pattern), [])
+            equivalent.append(rule)
+            if len(equivalent) > 1:
+                continue
+            if rule.kind == EXACT:
+                self._exact[rule.pattern] = rule
+                continue
+            compiled = re.compile(rule.regex)
+            if compiled.groups:
+                self._separate.append((compiled, rule))
+            else:
+                patterns.append(rule)
+        self._groups = {f"r{index}": rule for index, rule in enumerate(patterns)}
+        self._pattern = (
+            re.compile(
+                "|".join(
+                    f"(?P<{group}>{rule.regex})" for group, rule in self._groups.items()
+                )
+            )
+            if patterns
+            else None
+        )
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> "IgnoreIndex":
+        return cls(
+            [IgnoreRule(rule_id="ignore_set", pattern=name) for name in names]
+        )
+
+    def match(self, test_name: str) -> Optional[IgnoreRule]:
+        rule = self._exact.get(test_name)
+        if rule is not None:
+            return rule
+        if self._pattern is not None:
+            match = self._pattern.match(test_name)
+            if match and match.lastgroup:
+                return self._groups[match.lastgroup]
+        for compiled, rule in self._separate:
+            if compiled.match(test_name):
+                return rule
+        return None
+
+    def equivalent(self, rule: IgnoreRule) -> List[IgnoreRule]:
+        """Rules with the same kind and pattern as ``rule``, which match whenever
+        it does."""
+        return self._equivalent.get((rule.kind, rule.pattern), [rule])
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+
+def _tag_rules(tag: str, content: Dict, source: str) -> List[IgnoreRule]:
+    tests = content.get("tests") or {}
+    rules = [
+        IgnoreRule(f"{source}:ignore[{index}]", name, tag=tag)
+        for index, name in enumerate(tests.get("ignore") or [])
+    ]
+    for scylla_regex, names in (tests.get("version_ignore") or {}).items():
+        rules.extend(
+            IgnoreRule(
+                f"{source}:version_ignore[{scylla_regex}][{index}]",
+                name,
+                tag=tag,
+                scylla_regex=scylla_regex,
+            )
+            for index, name in enumerate(names)
+        )
+    for index, rule in enumerate(tests.get("rules") or []):
+        rule_id = f"{source}:rules[{index}]"
+        if "driver" in rule:
+            rules.append(_rule_from_dict(rule_id, rule, driver=rule["driver"]))
+        elif rule.get("inherit"):
+            # Inherited rules apply to the tag defining them and all newer ones.
+            rules.append(_rule_from_dict(rule_id, rule, driver=f">={tag.removeprefix('v')}"))
+        else:
+            rules.append(_rule_from_dict(rule_id, rule, tag=tag))
+    return rules
+
+
+def _rule_from_dict(
+    rule_id: str, rule: Dict, driver: Optional[str] = None, tag: Optional[str] = None
+) -> IgnoreRule:
+    for kind in (EXACT, GLOB, REGEX):
+        if kind in rule:
+            pattern = rule[kind]
+            break
+    else:
+        raise ValueError(f"Ignore rule {rule_id} has none of: exact, glob, regex")
+    return IgnoreRule(
+        rule_id,
+        pattern,
+        kind=kind,
+        tag=tag,
+        driver=driver,
+        scylla=rule.get("scylla"),
+        scylla_regex=rule.get("scylla_regex"),
+        reason=rule.get("reason"),
+    )
+
+
+class IgnoreRules:
+    """All ignore rules of the ``versions`` tree, loaded and validated once.
+
+    ``versions/scylla/<tag>/ignore.yaml`` files keep their ``ignore`` (exact names)
+    and ``version_ignore`` (Scylla version regex -> exact names) lists, scoped to
+    the tag. Additionally, ``rules`` entries may use ``glob``/``regex`` patterns,
+    ``driver``/``scylla`` version ranges (e.g. ``>=1.2,<1.5``) and ``inherit: true``
+    to also apply to all newer tags. ``versions/ignore.yaml`` holds ``rules``
+    shared by all tags."""
+
+    def __init__(self, rules: List[IgnoreRule]):
+        self.rules = rules
+        self._indexes: Dict[Tuple[str, str], IgnoreIndex] = {}
+
+    @classmethod
+    def load(cls, versions_dir: Path = VERSIONS_DIR) -> "IgnoreRules":
+        rules: List[IgnoreRule] = []
+        shared_file = versions_dir / SHARED_RULES_FILE
+        if shared_file.exists():
+            content = yaml.safe_load(shared_file.read_text(encoding="utf-8")) or {}
+            rules.extend(
+                _rule_from_dict(
+                    f"{SHARED_RULES_FILE}:rules[{index}]", rule, driver=rule.get("driver")
+                )
+                for index, rule in enumerate(content.get("rules") or [])
+            )
+        for ignore_file in sorted((versions_dir / "scylla").glob("*/ignore.yaml")):
+            content = yaml.safe_load(ignore_file.read_text(encoding="utf-8")) or {}
+            rules.extend(
+                _tag_rules(
+                    ignore_file.parent.name,
+                    content,
+                    str(ignore_file.relative_to(versions_dir)),
+                )
+            )
+        LOGGER.info("Loaded %d ignore rules from %s", len(rules), versions_dir)
+        return cls(rules)
+
+    def index(self, driver_version: str, scylla_version: str) -> IgnoreIndex:
+        key = (driver_version, scylla_version)
+        if key not in self._indexes:
+            self._indexes[key] = IgnoreIndex(
+                [
+                    rule
+                    for rule in self.rules
+                    if rule.applies_to(driver_version, scylla_version)
+                ]
+            )
+        return self._indexes[key]
+
+
+_loaded: Dict[Path, Tuple[Tuple, IgnoreRules]] = {}
+
+
+def load_rules(versions_dir: Path = VERSIONS_DIR) -> IgnoreRules:
+    """Rules of ``versions_dir``, reloaded only when some ignore file changed."""
+    files = sorted(versions_dir.glob("scylla/*/ignore.yaml")) + [
+        versions_dir / SHARED_RULES_FILE
+    ]
+    signature = tuple(
+        (str(path), path.stat().st_mtime_ns) for path in files if path.exists()
+    )
+    cached = _loaded.get(versions_dir)
+    if cached is None or cached[0] != signature:
+        cached = (signature, IgnoreRules.load(versions_dir))
+        _loaded[versions_dir] = cached
+    return cached[1]
@@ -0,0 +1,475 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from itertools import product
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from artifacts import ArtifactStore
+from common import format_test_result
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    driver_version TEXT NOT NULL,
+    scylla_version TEXT NOT NULL,
+    test TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    shards INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    UNIQUE (driver_version, scylla_version, test, shard, shards)
+)
+"""
+
+# Lock files of shared queues older than this are left by a dead process, a
+# queue operation holds the lock for milliseconds.
+STALE_LOCK_SECONDS = 120
+# Filesystems where SQLite's WAL (shared memory) and POSIX locks can't be trusted.
+NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "9p", "ceph", "glusterfs", "fuse.sshfs")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def expand_matrix(
+    driver_versions: Iterable[str],
+    scylla_versions: Iterable[str],
+    tests: Iterable[str],
+    shards: int = 1,
+) -> List[Dict]:
+    return [
+        dict(
+            driver_version=driver_version,
+            scylla_version=scylla_version,
+            test=test,
+            shard=shard,
+            shards=shards,
+        )
+        for driver_version, scylla_version, test, shard in product(
+            driver_versions, scylla_versions, tests, range(1, shards + 1)
+        )
+    ]
+
+
+def filesystem_type(path: Path) -> Optional[str]:
+    """Type of the filesystem ``path`` is on, from the longest matching mount point."""
+    try:
+        mounts = Path("/proc/mounts").read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    path = str(path.resolve())
+    found = ("", None)
+    for mount in mounts:
+        _, mount_point, fs_type, *_ = mount.split()
+        if (
+            path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        ) and len(mount_point) > len(found[0]):
+            found = (mount_point, fs_type)
+    return found[1]
+
+
+@contextmanager
+def _lock_file(path: Path):
+    """Exclusive lock between machines, held while ``path`` exists. Creating a file
+    with O_EXCL is atomic on NFSv3+ unlike POSIX locks."""
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                age = time.time() - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age > STALE_LOCK_SECONDS:
+                LOGGER.warning("Removing stale queue lock %s (%.0fs old)", path, age)
+                path.unlink(missing_ok=True)
+                continue
+            time.sleep(0.05)
+    try:
+        os.write(fd, f"{socket.gethostname()} {os.getpid()}\n".encode())
+        os.close(fd)
+        yield
+    finally:
+        path.unlink(missing_ok=True)
+
+
+class JobQueue:
+    """Durable queue of matrix cells backed by a SQLite file.
+
+    Workers claim jobs with a time limited lease, which they keep renewing while
+    the job runs. A job whose lease expired (e.g. the worker died) is handed out
+    again, up to ``max_attempts`` times.
+
+    By default the queue is for workers of one machine (WAL journal). A ``shared``
+    queue is for several machines sharing the queue folder over a network
+    filesystem: it uses the rollback journal, and every operation opens the
+    database only while holding a lock file next to it, so neither SQLite's
+    POSIX locks nor cached pages of other machines are relied on."""
+
+    def __init__(self, path: Path, max_attempts: int = 3, shared: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_attempts = max_attempts
+        self._shared = shared
+        self._lock_path = self.path.with_name(f"{self.path.name}.lock")
+        fs_type = filesystem_type(self.path.parent)
+        if not shared and fs_type in NETWORK_FILESYSTEMS:
+            raise ValueError(
+                f"{self.path} is on {fs_type}, where SQLite WAL doesn't work, "
+                "use a shared queue (--shared) for workers on several machines"
+            )
+        self._conn = None if shared else self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode={'DELETE' if self._shared else 'WAL'}")
+        conn.execute(SCHEMA)
+        return conn
+
+    @contextmanager
+    def _database(self):
+        if not self._shared:
+            yield self._conn
+            return
+        with _lock_file(self._lock_path):
+            conn = self._connect()
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+    @property
+    def artifacts_dir(self) -> Path:
+        return self.path.parent / "artifacts"
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+    def enqueue(self, jobs: Iterable[Dict]) -> None:
+        with self._database() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (driver_version, scylla_version, test, shard, shards) "
+                "VALUES (:driver_version, :scylla_version, :test, :shard, :shards)",
+                list(jobs),
+            )
+
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Dict]:
+        now = time.time()
+        with self._database() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = conn.execute(
+                        "SELECT * FROM jobs WHERE state = ? OR (state = ? AND lease_expires < ?) "
+                        "ORDER BY id LIMIT 1",
+                        (PENDING, RUNNING, now),
+                    ).fetchone()
+                    if row is None or row["attempts"] < self._max_attempts:
+                        break
+                    conn.execute(
+                        "UPDATE jobs SET state = ?, result = ? WHERE id = ?",
+                        (
+                            FAILED,
+                            json.dumps({"exception": ["Lease expired too many times"]}),
+                            row["id"],
+                        ),
+                    )
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, "
+                        "attempts = attempts + 1 WHERE id = ?",
+                        (RUNNING, worker, now + lease_seconds, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return dict(row) if row is not None else None
+
+    def renew(self, job_id: int, worker: str, lease_seconds: float) -> bool:
+        with self._database() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND state = ?",
+                (time.time() + lease_seconds, job_id, worker, RUNNING),
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, job_id: int, worker: str, state: str, result: Dict) -> bool:
+        with self._database() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (state, json.dumps(result), job_id, worker, RUNNING),
+            )
+            return cursor.rowcount == 1
+
+    def is_drained(self) -> bool:
+        with self._database() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)", (PENDING, RUNNING)
+            ).fetchone()
+        return row[0] == 0
+
+    def jobs(self) -> List[Dict]:
+        with self._database() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+
+def merge_shard_summaries(summaries: List[Dict]) -> Dict:
+    """Sum the per-testsuite statistics reported by every shard of one cell. Shards
+    run in parallel, so ``time`` is the longest shard and ``total_time`` the sum."""
+    merged: Dict[str, Dict] = {}
+    for summary in summaries:
+        for suite_name, stats in summary.items():
+            if not isinstance(stats, dict):
+                continue
+            merged_stats = merged.setdefault(suite_name, dict.fromkeys(stats, 0))
+            for key, value in stats.items():
+                if key == "time":
+                    merged_stats["time"] = max(merged_stats.get("time", 0), value)
+                    merged_stats["total_time"] = merged_stats.get("total_time", 0) + value
+                else:
+                    merged_stats[key] = merged_stats.get(key, 0) + value
+    return merged
+
+
+def merge_results(jobs: List[Dict]) -> tuple[Dict, int]:
+    """Build the ``results`` dict used by the email report, and the exit status."""
+    status = 0
+    results: Dict[str, Dict] = {}
+    cells: Dict[tuple[str, str], List[Dict]] = {}
+    failures: Dict[str, List[str]] = {}
+    multiple_scylla_versions = len({job["scylla_version"] for job in jobs}) > 1
+    for job in jobs:
+        version_key = job["driver_version"]
+        if multiple_scylla_versions:
+            version_key = f"{job['driver_version']} (scylla {job['scylla_version']})"
+        result = json.loads(job["result"]) if job["result"] else {}
+        if job["state"] != DONE:
+            status = 1
+            failures.setdefault(version_key, []).extend(
+                result.get("exception", [f"Job {job['id']} is {job['state']}"])
+            )
+            continue
+        if result.get("is_failed"):
+            status = 1
+        cells.setdefault((version_key, job["test"]), []).append(result["summary"])
+
+    for (driver_version, test), summaries in cells.items():
+        results.setdefault(driver_version, {})[test] = format_test_result(
+            merge_shard_summaries(summaries)
+        )
+    for driver_version, failure_reason in failures.items():
+        results[driver_version] = dict(exception=failure_reason)
+    return results, status
+
+
+def run_matrix_job(
+    job: Dict, rust_driver_git: str, work_dir: Path, test_threads: Optional[int]
+) -> Dict:
+    """Run one queued cell through the regular ``Run`` logic."""
+    from run import Run
+
+    runner = Run(
+        rust_driver_git=rust_driver_git,
+        tag=job["driver_version"],
+        test=job["test"],
+        scylla_version=job["scylla_version"],
+        test_threads=test_threads,
+        partition=f"{job['shard']}/{job['shards']}" if job["shards"] > 1 else None,
+        results_dir=work_dir,
+    )
+    try:
+        report = runner.call_test_func()
+        if not report:
+            raise RuntimeError(
+                f"No result for test '{job['test']}' and driver version {job['driver_version']}"
+            )
+    except Exception:
+        runner.create_metadata_for_failure(reason=traceback.format_exc())
+        raise
+    return dict(summary=report.summary, is_failed=report.is_failed)
+
+
+def upload_artifacts(work_dir: Path, destination: Path) -> None:
+    for results_dir_name in ("test_results", "argus_test_results"):
+        source = work_dir / results_dir_name
+        if source.is_dir():
+            shutil.copytree(source, destination / results_dir_name, dirs_exist_ok=True)
+            shutil.rmtree(source)
+    freed = ArtifactStore(work_dir / ".artifacts").prune()
+    LOGGER.info("Freed %d bytes of uploaded artifacts", freed)
+
+
+def work(
+    queue_path: Path,
+    worker: str,
+    execute: Callable[[Dict, Path], Dict],
+    lease_seconds: float = 600,
+    poll_interval: float = 5,
+    exit_when_drained: bool = True,
+    work_dir: Optional[Path] = None,
+    shared: bool = False,
+) -> int:
+    """Claim and execute jobs until the queue is drained. Returns number of executed jobs."""
+    queue = JobQueue(queue_path, shared=shared)
+    work_dir = work_dir or queue.path.parent / "workers" / worker
+    executed = 0
+    try:
+        while True:
+            job = queue.claim(worker, lease_seconds)
+            if job is None:
+                if exit_when_drained and queue.is_drained():
+                    return executed
+                time.sleep(poll_interval)
+                continue
+
+            LOGGER.info("Worker %s runs job %s", worker, job)
+            stop_heartbeat = threading.Event()
+            heartbeat = threading.Thread(
+                target=_heartbeat,
+                args=(queue_path, job["id"], worker, lease_seconds, stop_heartbeat, shared),
+                daemon=True,
+            )
+            heartbeat.start()
+            try:
+                result = execute(job, work_dir)
+                state = DONE
+            except Exception:
+                LOGGER.exception("Job %s failed", job["id"])
+                exc_info = traceback.format_exc()
+                result = dict(exception=[exc_info])
+                state = FAILED
+            finally:
+                stop_heartbeat.set()
+                heartbeat.join()
+            upload_artifacts(work_dir, queue.artifacts_dir / str(job["id"]))
+            if not queue.finish(job["id"], worker, state, result):
+                LOGGER.warning(
+                    "Job %s lease was lost, its result is discarded", job["id"]
+                )
+            executed += 1
+    finally:
+        queue.close()
+
+
+def _heartbeat(
+    queue_path: Path,
+    job_id: int,
+    worker: str,
+    lease_seconds: float,
+    stop: threading.Event,
+    shared: bool,
+) -> None:
+    # SQLite connections can't be shared between threads.
+    queue = JobQueue(queue_path, shared=shared)
+    try:
+        while not stop.wait(lease_seconds / 3):
+            if not queue.renew(job_id, worker, lease_seconds):
+                LOGGER.warning("Failed to renew lease of job %s", job_id)
+    finally:
+        queue.close()
+
+
+def coordinate(arguments: argparse.Namespace) -> int:
+    queue = JobQueue(Path(arguments.queue), shared=arguments.shared)
+    queue.enqueue(
+        expand_matrix(
+            arguments.versions, arguments.scylla_versions, arguments.tests, arguments.shards
+        )
+    )
+    LOGGER.info("Waiting for workers to drain %s", arguments.queue)
+    while not queue.is_drained():
+        time.sleep(arguments.poll_interval)
+    results, status = merge_results(queue.jobs())
+    queue.close()
+    LOGGER.info("Matrix results: %s", json.dumps(results, indent=2))
+
+    if arguments.recipients:
+        from main import send_results_email
+
+        send_results_email(
+            arguments.recipients, results, status, arguments.rust_driver_git
+        )
+    return status
+
+
+def get_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Distribute matrix cells between several workers through a SQLite job queue"
+    )
+    parser.add_argument(
+        "--shared",
+        action="store_true",
+        help="the queue folder is shared by workers on several machines (e.g. over NFS), "
+        "the coordinator and all workers must use it",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = subparsers.add_parser(
+        "coordinator", help="enqueue the matrix and merge the results"
+    )
+    coordinator.add_argument("queue", help="path of the SQLite queue file")
+    coordinator.add_argument("--versions", nargs="+", required=True)
+    coordinator.add_argument("--scylla-versions", nargs="+", required=True)
+    coordinator.add_argument("--tests", nargs="+", default=["rust"])
+    coordinator.add_argument(
+        "--shards", type=int, default=1, help="split every cell into that many nextest partitions"
+    )
+    coordinator.add_argument("--recipients", nargs="+", default=None)
+    coordinator.add_argument(
+        "--rust-driver-git", default=None, help="used to report the driver remote in the email"
+    )
+    coordinator.add_argument("--poll-interval", type=float, default=10)
+
+    worker = subparsers.add_parser("worker", help="execute jobs from the queue")
+    worker.add_argument("queue", help="path of the SQLite queue file")
+    worker.add_argument(
+        "rust_driver_git", help="driver repository owned exclusively by this worker"
+    )
+    worker.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    worker.add_argument("--test-threads", type=int, default=None)
+    worker.add_argument("--lease-seconds", type=float, default=600)
+    worker.add_argument("--poll-interval", type=float, default=10)
+    worker.add_argument(
+        "--keep-running", action="store_true", help="don't exit when the queue is drained"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    if args.command == "coordinator":
+        quit(coordinate(args))
+    work(
+        queue_path=Path(args.queue),
+        worker=args.worker_id,
+        execute=lambda job, work_dir: run_matrix_job(
+            job, args.rust_driver_git, work_dir, args.test_threads
+        ),
+        lease_seconds=args.lease_seconds,
+        poll_interval=args.poll_interval,
+        exit_when_drained=not args.keep_running,
+        shared=args.shared,
+    )
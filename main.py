@@ -1,15 +1,17 @@
 import argparse
+import json
 import logging
 import os
-import re
-import subprocess
 import sys
 import traceback
-from datetime import timedelta
-from typing import List, Set
+from pathlib import Path
+from typing import List
 
-from email_sender import create_report, get_driver_origin_remote, send_mail
-from run import Run
+# Subsystems (ccm, boto3, jinja2, ...) are imported where they are used, so that
+# --help and --plan start instantly.
+from artifacts import replace_text
+from common import PHASE_TIMEOUTS, format_test_result
+from topology import Topology
 
 logging.basicConfig(level=logging.INFO)
 
@@ -18,9 +20,64 @@ class EmptyTestResult(Exception):
     pass
 
 
+def resolve_versions(arguments: argparse.Namespace) -> List[str]:
+    if arguments.select:
+        from driver_tags import list_tags, select_tags
+
+        return select_tags(list_tags(cwd=arguments.rust_driver_git), arguments.select)
+    if arguments.rust_driver_versions_size:
+        return extract_n_latest_repo_tags(
+            repo_directory=arguments.rust_driver_git,
+            latest_tags_size=arguments.rust_driver_versions_size,
+        )
+    return arguments.versions
+
+
+def print_plan(arguments: argparse.Namespace):
+    from plan import build_plan
+
+    execution_plan = build_plan(
+        resolve_versions(arguments),
+        arguments.tests or [],
+        arguments.scylla_version,
+        rust_driver_git=arguments.rust_driver_git,
+        select=arguments.select,
+        topology=str(arguments.topology),
+        test_threads=arguments.test_threads,
+        test_timeout_s=arguments.test_timeout,
+        clean_build=arguments.clean_build,
+        select_against=arguments.select_against,
+        history_dir=str(arguments.history_dir) if arguments.history_dir else None,
+        recipients=arguments.recipients,
+        notify_first_failure=arguments.notify_first_failure,
+        watchdog=arguments.watchdog or arguments.watchdog_restart,
+    )
+    print(json.dumps(execution_plan, indent=2))
+
+
 def main(arguments: argparse.Namespace):
+    from reporting import IncrementalReport
+    from run import Run
+
+    from driver_tags import prepare_tags
+
+    arguments.versions = resolve_versions(arguments)
+    # Every version is fetched and patched up front, checkouts later only switch refs.
+    prepare_tags(arguments.versions, cwd=arguments.rust_driver_git)
     status = 0
     results = dict()
+    partial_runs = dict()
+    # junit and metadata files written by the cells of this run, for the history.
+    run_result_files: List[str] = []
+    test_results_dir = Path(os.path.dirname(__file__)) / "test_results"
+    reporter = IncrementalReport(
+        test_results_dir,
+        cells_total=len(arguments.versions) * len(arguments.tests or []),
+        recipients=arguments.recipients,
+        notify_first_failure=arguments.notify_first_failure,
+        smtp_server=arguments.smtp_server,
+        rust_driver_git=arguments.rust_driver_git,
+    )
     # TODO: move docker configure to rust-driver-matrix-test.jenkinsfile
     # Start docker configure
     # run_command_in_shell(driver_repo_path=arguments.rust_driver_git,
@@ -46,7 +103,17 @@ def main(arguments: argparse.Namespace):
                 test=test,
                 scylla_version=arguments.scylla_version,
                 test_threads=arguments.test_threads,
+                watchdog=arguments.watchdog,
+                watchdog_restart=arguments.watchdog_restart,
+                topology=arguments.topology,
+                timeouts={"test": arguments.test_timeout},
+                bench_iterations=arguments.bench_iterations,
+                bench_ops=arguments.bench_ops,
+                profile_duration=arguments.profile_duration,
+                selection_baseline=arguments.select_against,
+                clean_build=arguments.clean_build,
             )
+            failed = True
             try:
                 report = runner.call_test_func()
 
@@ -64,16 +131,16 @@ def main(arguments: argparse.Namespace):
                         f"{key}: {value}" for key, value in report.summary.items()
                     )
                 )
-                if report.is_failed:
+                failed = report.is_failed
+                if failed:
                     status = 1
-                results[driver_version][test] = report.summary
-                results[driver_version][test]["time"] = str(
-                    timedelta(
-                        seconds=results[driver_version][test]["testsuite_summary"][
-                            "time"
-                        ]
-                    )
-                )[:-3]
+                if runner.selection is not None and runner.selection.partial:
+                    partial_runs[driver_version] = runner.selection.as_dict()
+                if test in ("bench", "profile"):
+                    results[driver_version][test] = report.summary
+                else:
+                    results[driver_version][test] = format_test_result(report.summary)
+                    run_result_files += [runner.result_file_name, runner.metadata_file_name]
             except Exception:
                 logging.exception(f"{driver_version} failed")
                 status = 1
@@ -83,69 +150,121 @@ def main(arguments: argparse.Namespace):
                 )
                 results[driver_version] = dict(exception=failure_reason)
                 runner.create_metadata_for_failure(reason="\n".join(failure_reason))
+            reporter.cell_finished(
+                driver_version, test, failed, results, status, partial_runs=partial_runs
+            )
+
+    extra_report = {}
+    if partial_runs:
+        extra_report["partial_runs"] = partial_runs
+    if "bench" in (arguments.tests or []):
+        from bench import compare_versions
+
+        bench_comparison = compare_versions(
+            {
+                version: result.get("bench")
+                for version, result in results.items()
+                if "exception" not in result
+            }
+        )
+        comparison_file = (
+            Path(os.path.dirname(__file__)) / "test_results" / "bench_comparison.json"
+        )
+        comparison_file.parent.mkdir(parents=True, exist_ok=True)
+        replace_text(comparison_file, json.dumps(bench_comparison, indent=2))
+        logging.info("Benchmark comparison saved to %s", comparison_file)
+        extra_report["bench_comparison"] = bench_comparison
 
+    if "profile" in (arguments.tests or []):
+        from footprint import compare_versions as compare_footprints
+
+        footprint_comparison = compare_footprints(
+            {
+                version: result.get("profile")
+                for version, result in results.items()
+                if "exception" not in result
+            }
+        )
+        comparison_file = (
+            Path(os.path.dirname(__file__))
+            / "test_results"
+            / "footprint_comparison.json"
+        )
+        comparison_file.parent.mkdir(parents=True, exist_ok=True)
+        replace_text(comparison_file, json.dumps(footprint_comparison, indent=2))
+        logging.info("Footprint comparison saved to %s", comparison_file)
+        extra_report["footprint_comparison"] = footprint_comparison
+
+    if "rust" in (arguments.tests or []):
+        from buildstats import find_regressions as find_build_regressions
+
+        build_regressions = find_build_regressions(arguments.versions)
+        for regression in build_regressions:
+            logging.warning("Build cost regression: %s", regression)
+        extra_report["build_regressions"] = build_regressions
+
+    if arguments.history_dir and "rust" in (arguments.tests or []):
+        from flaky import analyze as analyze_history
+        from flaky import archive_run, load_history
+        from flaky import summary as flaky_summary
+
+        archive_run(test_results_dir, arguments.history_dir, run_result_files)
+        flaky_report = analyze_history(
+            load_history(arguments.history_dir), arguments.versions
+        )
+        flaky_report_file = test_results_dir / "flaky_report.json"
+        replace_text(flaky_report_file, json.dumps(flaky_report, indent=2))
+        logging.info("Flaky tests report saved to %s", flaky_report_file)
+        extra_report["ignore_suggestions"] = flaky_summary(flaky_report)
+
+    reporter.finish(results, status, **extra_report)
     if arguments.recipients:
-        email_report = create_report(results=results)
-        email_report["driver_remote"] = get_driver_origin_remote(
-            arguments.rust_driver_git
+        send_results_email(
+            arguments.recipients,
+            results,
+            status,
+            arguments.rust_driver_git,
+            smtp_server=arguments.smtp_server,
+            **extra_report,
         )
-        email_report["status"] = "SUCCESS" if status == 0 else "FAILED"
-        send_mail(arguments.recipients, email_report)
 
     quit(status)
 
 
+def send_results_email(
+    recipients: List[str],
+    results: dict,
+    status: int,
+    rust_driver_git: str | None,
+    smtp_server: str | None = None,
+    **kwargs,
+):
+    from email_sender import create_report, get_driver_origin_remote, send_mail
+
+    email_report = create_report(results=results, **kwargs)
+    if rust_driver_git:
+        email_report["driver_remote"] = get_driver_origin_remote(rust_driver_git)
+    email_report["status"] = "SUCCESS" if status == 0 else "FAILED"
+    send_mail(recipients, email_report, smtp_server=smtp_server)
+
+
 def extract_n_latest_repo_tags(
     repo_directory: str, latest_tags_size: int = 2
 ) -> List[str]:
-    selected_tags: dict[tuple[str, str], str] = {}
-    ignore_tags: Set[tuple[str, str]] = set()
-    result: list[str] = []
-    try:
-        subprocess.check_output(
-            "git checkout .", shell=True, stderr=subprocess.STDOUT, cwd=repo_directory
-        )
-        lines = (
-            subprocess.check_output(
-                "git tag --sort=-creatordate | grep '^v[0-9]*\\.[0-9]*\\.[0-9]*$'",
-                shell=True,
-                stderr=subprocess.STDOUT,
-                cwd=repo_directory,
-            )
-            .decode()
-            .splitlines()
-        )
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(
-            "command '{}' return with error (code {}): {}".format(
-                e.cmd, e.returncode, e.output
-            )
-        )
+    """Newest patch release of the ``latest_tags_size`` newest minor versions."""
+    from driver_tags import list_tags, select_tags
+
+    return select_tags(list_tags(cwd=repo_directory), f"latest:{latest_tags_size}")
+
 
-    for repo_tag in lines:
-        if "." in repo_tag:
-            if not re.match(r"^v[0-9]+\.[0-9]+\.[0-9]+$", repo_tag):
-                raise RuntimeError(f"Encountered unknown tag: {repo_tag}")
-            (first, second, third) = repo_tag[1:].split(".")
-            if first == "0":
-                # Handling this case is a bit pedantic on my side. In Rust, if version starts with '0', then
-                # the second number describes major version and the third number describes minor version.
-                # Patch versions are not present in this case.
-                # We don't really need to handle this, since Rust Driver reached 1.0 already, but lets
-                # do it just to be safe.
-                (major, minor) = ("0." + second, third)
-            else:
-                (major, minor) = (first, second)
-            if (major, minor) not in ignore_tags:
-                ignore_tags.add((major, minor))
-                selected_tags[(major, minor)] = repo_tag
-
-    for minor_version in sorted(selected_tags.keys(), reverse=True):
-        result.append(selected_tags[minor_version])
-        if len(result) == latest_tags_size:
-            break
-
-    return result
+def smtp_server_address(value: str) -> str:
+    from email_sender import split_smtp_server
+
+    try:
+        split_smtp_server(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from error
+    return value
 
 
 def get_arguments() -> argparse.Namespace:
@@ -164,10 +283,12 @@ def get_arguments() -> argparse.Namespace:
     )
     parser.add_argument(
         "--tests",
-        choices=["rust"],
+        choices=["rust", "bench", "profile"],
         nargs="*",
         type=str,
-        help='Tests to run. Currently only "rust" supported.',
+        help='Tests to run: "rust" - the driver test suite, '
+        '"bench" - fixed performance workload compared across driver versions, '
+        '"profile" - memory, thread and connection footprint of a steady session workload.',
     )
     parser.add_argument(
         "--scylla-version",
@@ -184,12 +305,34 @@ def get_arguments() -> argparse.Namespace:
         default=None,
         nargs="?",
     )
+    parser.add_argument(
+        "--select",
+        help="Select the versions to test from the repository tags, ';' separated:\n"
+        "version ranges, e.g. '>=1.4,<2'\n"
+        "'latest:N' - newest patch release of the N newest minor versions\n"
+        "'latest:all' - newest patch release of every minor version\n"
+        "e.g. '>=1.4,<2;latest:all'. Overrides --versions and --rust-driver-versions-size",
+        default=None,
+    )
     parser.add_argument(
         "--recipients",
         help="whom to send mail at the end of the run",
         nargs="+",
         default=None,
     )
+    parser.add_argument(
+        "--notify-first-failure",
+        help="Also send a short notification to the recipients as soon as the first "
+        "driver version fails, instead of only the report at the end of the run",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--smtp-server",
+        help="host:port of an SMTP relay accepting mail without authentication, used "
+        "instead of the default server (e.g. a local stand-in for testing)",
+        type=smtp_server_address,
+        default=os.environ.get("MATRIX_SMTP_SERVER"),
+    )
     parser.add_argument(
         "--test-threads",
         help="How many threads to use for testing. Corresponds to the same flag in `cargo test`."
@@ -199,20 +342,90 @@ def get_arguments() -> argparse.Namespace:
         type=int,
         default=default_test_threads,
     )
+    parser.add_argument(
+        "--bench-iterations",
+        help="How many times the bench workload is repeated for every driver version",
+        type=int,
+        default=5,
+    )
+    parser.add_argument(
+        "--bench-ops",
+        help="Number of operations of every bench scenario in a single iteration",
+        type=int,
+        default=20000,
+    )
+    parser.add_argument(
+        "--profile-duration",
+        help="How many seconds the profiled session workload runs",
+        type=int,
+        default=120,
+    )
+    parser.add_argument(
+        "--test-timeout",
+        help="Seconds after which the test command of a single driver version is "
+        "terminated, the build of the tests before it has its own limit of "
+        f"{PHASE_TIMEOUTS['build']}s",
+        type=float,
+        default=PHASE_TIMEOUTS["test"],
+    )
+    parser.add_argument(
+        "--clean-build",
+        help="Remove earlier build output from the cargo target dir before building the tests "
+        "of every version, so build times of versions are comparable (slower)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--topology",
+        help="Cluster topology: nodes per datacenter and rack with optional Scylla SMP, e.g.\n"
+        "'3' - single DC with 3 nodes (default)\n"
+        "'3,3' - two DCs with 3 nodes each\n"
+        "'2+1,3;smp=2;smp.node4=4' - dc1 split into two racks, 2 shards per node, 4 on node4",
+        type=Topology.parse,
+        default=Topology.uniform(3),
+    )
+    parser.add_argument(
+        "--select-against",
+        help="Run only the tests affected by the driver changes since this ref (e.g. the "
+        "latest tag with known results), plus a smoke set. Changed files are mapped to "
+        "tests by versions/test_selection.yaml, the run is marked as partial",
+        default=None,
+    )
+    parser.add_argument(
+        "--history-dir",
+        help="Folder where processed junit files of every run are archived. When set, past runs "
+        "are analysed for flaky and newly broken tests and ignore.yaml changes are suggested",
+        type=Path,
+        default=os.environ.get("MATRIX_HISTORY_DIR"),
+    )
+    parser.add_argument(
+        "--plan",
+        help="Print the execution plan (versions, patches, ignore rules, expected duration "
+        "from earlier results in test_results) as JSON and exit, without running anything",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watchdog",
+        help="Monitor cluster nodes during the run (liveness, CQL port, log errors), "
+        "capture node logs on every incident and record the incident timeline in metadata",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watchdog-restart",
+        help="Let the cluster watchdog restart nodes that went down or stopped responding (implies --watchdog)",
+        action="store_true",
+    )
     arguments = parser.parse_args()
     versions = arguments.versions
     if not isinstance(versions, list):
         versions = versions.split(",")
 
     arguments.versions = versions
-    if arguments.rust_driver_versions_size:
-        arguments.versions = extract_n_latest_repo_tags(
-            repo_directory=arguments.rust_driver_git,
-            latest_tags_size=arguments.rust_driver_versions_size,
-        )
-
     return arguments
 
 
 if __name__ == "__main__":
-    main(get_arguments())
+    parsed_arguments = get_arguments()
+    if parsed_arguments.plan:
+        print_plan(parsed_arguments)
+    else:
+        main(parsed_arguments)
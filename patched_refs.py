@@ -0,0 +1,101 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from process import command_output
+
+LOGGER = logging.getLogger(__name__)
+
+# Private namespace, not fetched, pushed or shown by ``git tag``/``git branch``.
+REF_NAMESPACE = "refs/matrix/patched"
+
+# Fixed identity and dates make the patched commit of a (tag, patch set)
+# identical in every clone.
+COMMIT_ENV = {
+    "GIT_AUTHOR_NAME": "rust-driver-matrix",
+    "GIT_AUTHOR_EMAIL": "rust-driver-matrix@localhost",
+    "GIT_AUTHOR_DATE": "@0 +0000",
+    "GIT_COMMITTER_NAME": "rust-driver-matrix",
+    "GIT_COMMITTER_EMAIL": "rust-driver-matrix@localhost",
+    "GIT_COMMITTER_DATE": "@0 +0000",
+}
+
+
+def patch_set_hash(patch_files: Sequence[Path]) -> str:
+    digest = hashlib.sha256()
+    for patch_file in patch_files:
+        digest.update(patch_file.name.encode() + b"\0")
+        digest.update(patch_file.read_bytes() + b"\0")
+    return digest.hexdigest()[:16]
+
+
+def _git(
+    args: List[str], extra_env: Optional[Dict[str, str]] = None, **command_kwargs
+) -> List[str]:
+    env = command_kwargs.pop("env", None) or dict(os.environ)
+    return command_output(
+        ["git", *args], env={**env, **(extra_env or {})}, **command_kwargs
+    )
+
+
+def _existing_commit(ref: str, **command_kwargs) -> Optional[str]:
+    lines = _git(["for-each-ref", "--format=%(objectname)", ref], **command_kwargs)
+    return lines[0] if lines else None
+
+
+def patch_files(version_folder: Optional[Path]) -> List[Path]:
+    """Patches of a driver version from its ``versions/scylla/<tag>`` folder, in the
+    order they are applied."""
+    if version_folder is None or not version_folder.is_dir():
+        return []
+    return sorted(
+        file_path
+        for file_path in version_folder.iterdir()
+        if file_path.name.endswith(".patch")
+    )
+
+
+def patched_ref(tag: str, patch_files: Sequence[Path], **command_kwargs) -> str:
+    """Commit of ``tag`` with ``patch_files`` applied, created once under a private ref.
+
+    The commit is built in a temporary index with ``git apply --cached``, so the
+    working tree isn't touched. Checking the returned ref out only rewrites files
+    that differ from the current checkout, which keeps cargo's fingerprints valid
+    between runs of the same tag. ``command_kwargs`` are passed to ``run_command``
+    and must include ``cwd`` of the driver repository."""
+    if not patch_files:
+        return tag
+    ref = f"{REF_NAMESPACE}/{tag}/{patch_set_hash(patch_files)}"
+    if (commit := _existing_commit(ref, **command_kwargs)) is not None:
+        LOGGER.info("Reusing patched tree %s (%s)", ref, commit)
+        return ref
+
+    base = _git(["rev-parse", "--verify", f"{tag}^{{commit}}"], **command_kwargs)[0]
+    with tempfile.TemporaryDirectory(prefix="matrix-index-") as index_dir:
+        index_env = {"GIT_INDEX_FILE": str(Path(index_dir) / "index")}
+        _git(["read-tree", base], extra_env=index_env, **command_kwargs)
+        for patch_file in patch_files:
+            LOGGER.info("Applying patch file '%s' to %s", patch_file, tag)
+            _git(
+                ["apply", "--cached", "--stat", "--apply", str(patch_file)],
+                extra_env=index_env,
+                **command_kwargs,
+            )
+        tree = _git(["write-tree"], extra_env=index_env, **command_kwargs)[0]
+    message = f"{tag} with matrix patches\n\n" + "\n".join(
+        patch_file.name for patch_file in patch_files
+    )
+    commit = _git(
+        ["commit-tree", tree, "-p", base, "-m", message], extra_env=COMMIT_ENV, **command_kwargs
+    )[0]
+    # Refs of outdated patch sets of this tag are not needed anymore.
+    for stale_ref in _git(
+        ["for-each-ref", "--format=%(refname)", f"{REF_NAMESPACE}/{tag}/"], **command_kwargs
+    ):
+        _git(["update-ref", "-d", stale_ref], **command_kwargs)
+    _git(["update-ref", ref, commit], **command_kwargs)
+    LOGGER.info("Created patched tree %s (%s)", ref, commit)
+    return ref
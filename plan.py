@@ -0,0 +1,94 @@
+import logging
+import os
+import statistics
+from pathlib import Path
+from typing import Dict, List, Optional
+from xml.etree import ElementTree
+
+from buildstats import DEFAULT_STATS_DIR, latest_record
+from ignore_rules import VERSIONS_DIR, load_rules
+from patched_refs import patch_files
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_RESULTS_DIR = Path(os.path.dirname(__file__)) / "test_results"
+
+
+def junit_duration(junit_file: Path) -> Optional[float]:
+    """Total time of a junit file, read from the root element only."""
+    if not junit_file.exists():
+        return None
+    try:
+        for _, element in ElementTree.iterparse(junit_file, events=("start",)):
+            return float(element.attrib["time"])
+    except (OSError, ElementTree.ParseError, KeyError, ValueError):
+        LOGGER.warning("No duration in %s", junit_file)
+    return None
+
+
+def version_plan(
+    tag: str,
+    scylla_version: Optional[str],
+    results_dir: Path = DEFAULT_RESULTS_DIR,
+    versions_dir: Path = VERSIONS_DIR,
+    stats_dir: Path = DEFAULT_STATS_DIR,
+) -> Dict:
+    """What a run of one driver version would do, from files of earlier runs only."""
+    driver_version = tag.split("-", maxsplit=1)[0]
+    ignore_index = load_rules(versions_dir).index(driver_version, scylla_version)
+    build = latest_record(tag, stats_dir)
+    return dict(
+        tag=tag,
+        patches=[
+            patch.name
+            for patch in patch_files(versions_dir / "scylla" / driver_version)
+        ],
+        ignore_rules=[rule.rule_id for rule in ignore_index.rules],
+        test_duration_s=junit_duration(results_dir / f"rust_results_{driver_version}.xml"),
+        build_duration_s=build["wall_time_s"] if build else None,
+    )
+
+
+def expected_duration(versions: List[Dict]) -> Optional[float]:
+    """Sum of the known durations, versions without earlier results are expected to
+    take the median of the others."""
+    durations = [
+        (version["test_duration_s"], version["build_duration_s"]) for version in versions
+    ]
+    known_tests = [test for test, _ in durations if test is not None]
+    known_builds = [build for _, build in durations if build is not None]
+    if not known_tests:
+        return None
+    test_default = statistics.median(known_tests)
+    build_default = statistics.median(known_builds) if known_builds else 0.0
+    return sum(
+        (test_default if test is None else test) + (build_default if build is None else build)
+        for test, build in durations
+    )
+
+
+def build_plan(
+    versions: List[str],
+    tests: List[str],
+    scylla_version: Optional[str],
+    results_dir: Path = DEFAULT_RESULTS_DIR,
+    versions_dir: Path = VERSIONS_DIR,
+    stats_dir: Path = DEFAULT_STATS_DIR,
+    **options,
+) -> Dict:
+    """Execution plan of a matrix run, without touching ccm, cargo or the driver
+    repository. ``options`` are the other run settings, included as they are."""
+    version_plans = [
+        version_plan(tag, scylla_version, results_dir, versions_dir, stats_dir)
+        for tag in versions
+    ]
+    rust_duration = expected_duration(version_plans)
+    return dict(
+        scylla_version=scylla_version,
+        tests=tests,
+        cells=[dict(version=tag, test=test) for tag in versions for test in tests],
+        versions=version_plans,
+        # Only the driver test suite has earlier results to estimate from.
+        expected_duration_s=rust_duration if "rust" in tests else None,
+        **options,
+    )
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import os
+import signal
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Longer lines are split, so a single runaway line can't exhaust memory.
+MAX_LINE_LENGTH = 64 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+# How long output is still read after the command exited.
+DRAIN_TIMEOUT = 3
+
+
+class ProcessError(Exception):
+    def __init__(self, result: "ProcessResult", message: str):
+        self.result = result
+        tail = "\n".join(result.tail)
+        super().__init__(f"{message}\nLast {len(result.tail)} lines of output:\n{tail}")
+
+
+class ProcessTimeout(ProcessError):
+    pass
+
+
+class ProcessResult:
+    def __init__(
+        self,
+        args: Sequence[str],
+        returncode: int,
+        tail: List[str],
+        timed_out: bool,
+        duration: float,
+    ):
+        self.args = list(args)
+        self.returncode = returncode
+        self.tail = tail
+        self.timed_out = timed_out
+        self.duration = duration
+
+    def check(self) -> "ProcessResult":
+        if self.timed_out:
+            raise ProcessTimeout(
+                self, f"Command {self.args} timed out after {self.duration:.1f}s"
+            )
+        if self.returncode != 0:
+            raise ProcessError(
+                self, f"Command {self.args} failed with exit code {self.returncode}"
+            )
+        return self
+
+
+class RotatingLogFile:
+    """Append-only log file rotated to ``<name>.1``, ``<name>.2``... when it grows too big."""
+
+    def __init__(self, path: Path, max_bytes: int = 100 * 1024 * 1024, backup_count: int = 3):
+        self.path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open(mode="ab")
+
+    def write_line(self, line: str) -> None:
+        data = line.encode(errors="replace") + b"\n"
+        if self._file.tell() + len(data) > self._max_bytes:
+            self._rotate()
+        self._file.write(data)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for index in range(self._backup_count - 1, 0, -1):
+            backup = self.path.with_name(f"{self.path.name}.{index}")
+            if backup.exists():
+                backup.replace(self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self._backup_count > 0:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        self._file = self.path.open(mode="wb")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+async def _pump(
+    stream: asyncio.StreamReader,
+    prefix: str,
+    sinks: Iterable[Callable[[str], None]],
+) -> None:
+    sinks = list(sinks)
+    buffer = b""
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        while len(buffer) > MAX_LINE_LENGTH:
+            lines.append(buffer[:MAX_LINE_LENGTH])
+            buffer = buffer[MAX_LINE_LENGTH:]
+        for line in lines:
+            text = prefix + line.decode(errors="replace").rstrip("\r")
+            for sink in sinks:
+                sink(text)
+    if buffer:
+        text = prefix + buffer.decode(errors="replace")
+        for sink in sinks:
+            sink(text)
+
+
+def _signal_group(proc: asyncio.subprocess.Process, sig: int) -> None:
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+async def _open_pipe() -> Tuple[int, asyncio.StreamReader, asyncio.ReadTransport]:
+    """Pipe for the output of a command: the write end for the command, and the
+    reader of the read end, whose transport can be closed while daemonized
+    children still hold the write end."""
+    read_fd, write_fd = os.pipe()
+    reader = asyncio.StreamReader()
+    transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        os.fdopen(read_fd, mode="rb", buffering=0),
+    )
+    return write_fd, reader, transport
+
+
+async def run_async(
+    args: Sequence[str],
+    cwd: Optional[str | Path] = None,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    kill_grace: float = 30,
+    drain_timeout: float = DRAIN_TIMEOUT,
+    log_file: Optional[Path] = None,
+    tail_lines: int = 200,
+    echo: bool = False,
+    on_line: Optional[Callable[[str], None]] = None,
+    on_start: Optional[Callable[[int], None]] = None,
+) -> ProcessResult:
+    """Run a command, streaming its stdout/stderr line by line.
+
+    Output goes to a rotating ``log_file``, optionally to our stdout and to the
+    ``on_line`` callback, and the last ``tail_lines`` lines are kept in memory.
+    ``on_start`` is called with the pid of the started process. The command runs in its own process
+    group; on ``timeout`` the whole group gets SIGTERM, then SIGKILL after
+    ``kill_grace`` seconds. Output still open ``drain_timeout`` seconds after the
+    command exited is not read anymore."""
+    LOGGER.debug("Execute the cmd '%s'", args)
+    tail: deque[str] = deque(maxlen=tail_lines)
+    sinks: List[Callable[[str], None]] = [tail.append]
+    log = RotatingLogFile(log_file) if log_file is not None else None
+    if log is not None:
+        sinks.append(log.write_line)
+    if echo:
+        sinks.append(lambda line: print(line, flush=True))
+    if on_line is not None:
+        sinks.append(on_line)
+
+    start = time.monotonic()
+    timed_out = False
+    # Own pipes instead of asyncio's, whose proc.wait() returns only once the
+    # pipes are closed by every process holding them.
+    stdout_fd, stdout, stdout_transport = await _open_pipe()
+    stderr_fd, stderr, stderr_transport = await _open_pipe()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            cwd=cwd,
+            env=env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=stdout_fd,
+            stderr=stderr_fd,
+            start_new_session=True,
+        )
+    except BaseException:
+        stdout_transport.close()
+        stderr_transport.close()
+        raise
+    finally:
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+    if on_start is not None:
+        on_start(proc.pid)
+    pumps = asyncio.gather(_pump(stdout, "", sinks), _pump(stderr, "[stderr] ", sinks))
+    try:
+        await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        LOGGER.warning("Command %s timed out after %ss, terminating", args, timeout)
+        _signal_group(proc, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(proc.wait(), kill_grace)
+        except asyncio.TimeoutError:
+            LOGGER.warning("Command %s ignored SIGTERM, killing", args)
+            _signal_group(proc, signal.SIGKILL)
+            await proc.wait()
+    finally:
+        # Daemonized children (e.g. nodes started by ccm tests) may inherit and keep
+        # the pipes open, stop reading once the command itself exited.
+        _, pending = await asyncio.wait([pumps], timeout=drain_timeout)
+        if pending:
+            LOGGER.warning("Output of %s is still open after exit, detaching", args)
+            pumps.cancel()
+        stdout_transport.close()
+        stderr_transport.close()
+        if log is not None:
+            log.close()
+    assert proc.returncode is not None
+    return ProcessResult(
+        args, proc.returncode, list(tail), timed_out, time.monotonic() - start
+    )
+
+
+def run_command(args: Sequence[str], **kwargs) -> ProcessResult:
+    """Synchronous wrapper of :func:`run_async`."""
+    return asyncio.run(run_async(args, **kwargs))
+
+
+def command_output(args: Sequence[str], **kwargs) -> List[str]:
+    """Stdout lines of a command that has to succeed."""
+    output: List[str] = []
+    run_command(
+        args,
+        on_line=lambda line: None if line.startswith("[stderr] ") else output.append(line),
+        **kwargs,
+    ).check()
+    return output
+
+
+def run_commands_concurrently(commands: Iterable[Dict]) -> List[ProcessResult]:
+    """Run independent commands (keyword arguments of :func:`run_async`) at once."""
+
+    async def _run_all() -> List[ProcessResult]:
+        return list(await asyncio.gather(*(run_async(**command) for command in commands)))
+
+    return asyncio.run(_run_all())
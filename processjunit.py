@@ -1,7 +1,11 @@
 import logging
+import os
 from pathlib import Path
+from typing import Callable, Dict, Iterable, List
 from xml.etree import ElementTree
 
+from ignore_rules import IgnoreIndex
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -10,13 +14,21 @@ class ProcessJUnit:
         self,
         tests_result_xml: Path,
         tag: str,
-        ignore_set: list,
+        ignore_set: IgnoreIndex | Iterable[str],
     ):
         self.tests_result_xml = tests_result_xml
         self._summary = {}
         self.tag = tag
-        self.ignore_set = set(ignore_set)  # Use set for O(1) lookup
-        LOGGER.info("Ignore tests: %s", self.ignore_set)
+        # Exact names are looked up in O(1), patterns with a single compiled regex
+        self.ignore_set = (
+            ignore_set
+            if isinstance(ignore_set, IgnoreIndex)
+            else IgnoreIndex.from_names(ignore_set)
+        )
+        # Ignored failing test -> id of the rule that matched it
+        self.ignored_failures: Dict[str, str] = {}
+        self._matched_rules: set[str] = set()
+        LOGGER.info("Ignore rules: %s", self.ignore_set.rules)
 
     def update_testcase_classname_with_tag(self):
         """Prepend driver version tag to all classname attributes."""
@@ -30,8 +42,9 @@ class ProcessJUnit:
         # Simple string replacement - preserves formatting
         updated_text = xml_text.replace('classname="', f'classname="{self.tag}.')
 
-        with self.tests_result_xml.open(mode="w", encoding="utf-8") as file:
-            file.write(updated_text)
+        self._replace_result_file(
+            lambda temp: temp.write_text(updated_text, encoding="utf-8")
+        )
 
     def process(self):
         """
@@ -76,8 +89,17 @@ class ProcessJUnit:
                 test_name = testcase.attrib.get("name")
                 failure = testcase.find("failure")
 
-                if failure is not None and test_name in self.ignore_set:
-                    LOGGER.info(f"Ignoring expected failure: {test_name}")
+                rule = self.ignore_set.match(test_name) if test_name else None
+                if rule is not None:
+                    self._matched_rules.update(
+                        equivalent.rule_id
+                        for equivalent in self.ignore_set.equivalent(rule)
+                    )
+                if failure is not None and rule is not None:
+                    LOGGER.info(
+                        f"Ignoring expected failure: {test_name} (rule {rule.rule_id})"
+                    )
+                    self.ignored_failures[test_name] = rule.rule_id
                     # Rename <failure> to <ignored_on_failure> (preserves all attributes and text)
                     failure.tag = "ignored_on_failure"
                     suite_stats["failures"] -= 1
@@ -97,7 +119,25 @@ class ProcessJUnit:
         self._summary["testsuite_summary"] = testsuite_summary
 
         # Write modified XML back, preserving structure
-        tree.write(self.tests_result_xml, encoding="utf-8", xml_declaration=True)
+        self._replace_result_file(
+            lambda temp: tree.write(temp, encoding="utf-8", xml_declaration=True)
+        )
+
+    def _replace_result_file(self, write: Callable[[Path], None]) -> None:
+        """Write a new file and rename it over the result file, instead of
+        rewriting it in place - it may be hardlinked from the artifact store."""
+        temp = self.tests_result_xml.with_name(f".{self.tests_result_xml.name}.tmp")
+        write(temp)
+        os.replace(temp, self.tests_result_xml)
+
+    @property
+    def unmatched_rules(self) -> List[str]:
+        """Rules applicable to this run which matched none of its tests."""
+        return [
+            rule.rule_id
+            for rule in self.ignore_set.rules
+            if rule.rule_id not in self._matched_rules
+        ]
 
     @property
     def summary(self):
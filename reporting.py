@@ -0,0 +1,143 @@
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from artifacts import replace_text
+from email_sender import (
+    create_report,
+    get_driver_origin_remote,
+    render_report,
+    send_notification,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+RESULTS_FILE_NAME = "matrix_results.json"
+REPORT_FILE_NAME = "matrix_report.html"
+
+
+class IncrementalReport:
+    """Report of a matrix run kept up to date after every finished cell (driver
+    version x test), so a run that dies midway still leaves the results of the
+    cells it finished.
+
+    ``matrix_results.json`` and ``matrix_report.html`` in ``results_dir`` are
+    replaced after every cell. With ``recipients`` and ``notify_first_failure`` a
+    short notification is sent as soon as the first cell fails, the full email
+    is still sent at the end of the run."""
+
+    def __init__(
+        self,
+        results_dir: Path,
+        cells_total: int,
+        recipients: Optional[List[str]] = None,
+        notify_first_failure: bool = False,
+        smtp_server: Optional[str] = None,
+        rust_driver_git: Optional[str] = None,
+    ):
+        self.results_file = results_dir / RESULTS_FILE_NAME
+        self.report_file = results_dir / REPORT_FILE_NAME
+        self._cells_total = cells_total
+        self._cells_done = 0
+        self._recipients = recipients if notify_first_failure else None
+        self._smtp_server = smtp_server
+        self._rust_driver_git = rust_driver_git
+        self.first_failure: Optional[Dict] = None
+        self._base: Optional[Dict] = None
+
+    def _base_report(self) -> Dict:
+        # Build and CI info do not change during the run, look them up once.
+        if self._base is None:
+            self._base = create_report(results={})
+            self._base["start_time"] = datetime.now().isoformat(timespec="seconds")
+            if self._rust_driver_git:
+                self._base["driver_remote"] = get_driver_origin_remote(self._rust_driver_git)
+        return self._base
+
+    def _write(self, results: Dict, status: int, complete: bool, **extra) -> Optional[Dict]:
+        # A report that cannot be written must not abort the rest of the matrix.
+        try:
+            return self._write_report(results, status, complete, **extra)
+        except Exception:
+            LOGGER.exception("Cannot update %s", self.results_file)
+            return None
+
+    def _write_report(self, results: Dict, status: int, complete: bool, **extra) -> Dict:
+        report = dict(
+            self._base_report(),
+            results=results,
+            status="SUCCESS" if status == 0 else "FAILED",
+            progress=dict(
+                done=self._cells_done, total=self._cells_total, complete=complete
+            ),
+            **extra,
+        )
+        if complete:
+            report["end_time"] = datetime.now().isoformat(timespec="seconds")
+        self.results_file.parent.mkdir(parents=True, exist_ok=True)
+        replace_text(self.results_file, json.dumps(report, indent=2, default=str))
+        # The JSON is enough to recover the results, even if rendering fails.
+        try:
+            replace_text(self.report_file, render_report(report))
+        except Exception:
+            LOGGER.exception("Cannot render %s", self.report_file)
+        return report
+
+    def cell_finished(
+        self,
+        driver_version: str,
+        test: str,
+        failed: bool,
+        results: Dict,
+        status: int,
+        **extra,
+    ) -> None:
+        self._cells_done += 1
+        new_failure = failed and self.first_failure is None
+        if new_failure:
+            self.first_failure = dict(
+                driver_version=driver_version,
+                test=test,
+                time=datetime.now().isoformat(timespec="seconds"),
+            )
+        report = self._write(
+            results, status, complete=False, first_failure=self.first_failure, **extra
+        )
+        LOGGER.info(
+            "Report of %d/%d matrix cells saved to %s",
+            self._cells_done,
+            self._cells_total,
+            self.results_file,
+        )
+        if new_failure and self._recipients and report is not None:
+            self._notify(report)
+
+    def finish(self, results: Dict, status: int, **extra) -> None:
+        self._write(results, status, complete=True, first_failure=self.first_failure, **extra)
+
+    def _notify(self, report: Dict) -> None:
+        failure = self.first_failure
+        subject = (
+            f"FAILING: {report['job_name']} {report['build_id']} - driver "
+            f"{failure['driver_version']} ({failure['test']})"
+        )
+        result = report["results"].get(failure["driver_version"], {})
+        content = "\n".join(
+            [
+                f"First failure of the run: driver version {failure['driver_version']}, "
+                f"test '{failure['test']}', at {failure['time']}.",
+                f"{self._cells_done} of {self._cells_total} matrix cells are finished, "
+                "the full report is sent at the end of the run.",
+                f"Build: {report['build_url']}",
+                f"Partial report: {self.report_file}",
+                "",
+                json.dumps(result, indent=2, default=str),
+            ]
+        )
+        # The run goes on even if the notification cannot be sent.
+        try:
+            send_notification(self._recipients, subject, content, self._smtp_server)
+        except Exception:
+            LOGGER.exception("Cannot send the first failure notification")
@@ -2,22 +2,49 @@ import json
 import logging
 import os
 import shutil
-import subprocess
+import time
 from functools import cached_property
 from pathlib import Path
 from typing import Dict, List, Optional
+from xml.etree import ElementTree
 
-import yaml
-import re
-
+from artifacts import ArtifactStore, replace_file, replace_text
+from bench import BenchReport, parse_workload_output, write_workload_project
+from buildstats import append_record, build_command, build_record
 from cluster import TestCluster
-from common import scylla_uri_per_node
+from footprint import FootprintReport, ProcessSampler
+from ignore_rules import IgnoreIndex, load_rules
+from common import NEXTEST_TEST_RUN_FAILED, PHASE_TIMEOUTS, scylla_uri_env
+from driver_logging import failed_tests, load_config, merge_rerun, rerun_command
+from patched_refs import patch_files, patched_ref
+from process import ProcessError, run_command
+from selection import ImpactSelection, select_tests
 from processjunit import ProcessJUnit
+from topology import Topology
 
 
 class Run:
     def __init__(
-        self, rust_driver_git, tag, test, scylla_version, test_threads: Optional[int]
+        self,
+        rust_driver_git,
+        tag,
+        test,
+        scylla_version,
+        test_threads: Optional[int],
+        watchdog: bool = False,
+        watchdog_restart: bool = False,
+        test_filter: Optional[str] = None,
+        cargo_target_dir: Optional[Path] = None,
+        cluster: Optional[TestCluster] = None,
+        partition: Optional[str] = None,
+        results_dir: Optional[Path] = None,
+        topology: str | Topology = "3",
+        timeouts: Optional[Dict[str, float]] = None,
+        bench_iterations: int = 5,
+        bench_ops: int = 20000,
+        profile_duration: int = 120,
+        selection_baseline: Optional[str] = None,
+        clean_build: bool = False,
     ):
         self.driver_version = tag.split("-", maxsplit=1)[0]
         self._full_driver_version = tag
@@ -28,61 +55,48 @@ class Run:
         if not self.call_test_func:
             raise RuntimeError(f"Not supported test: {test}")
         self._test_threads = test_threads
+        self._watchdog = watchdog
+        self._watchdog_restart = watchdog_restart
+        self._test_filter = test_filter
+        self._cargo_target_dir = cargo_target_dir
+        # An already started cluster (e.g. a warm one kept by the matrix daemon)
+        # is reused as is instead of creating a new one for this run.
+        self._cluster: TestCluster | None = cluster
+        self._partition = partition
+        # Base folder of test_results/argus_test_results, separate workers on one
+        # machine use separate folders.
+        self._results_dir = results_dir or Path(os.path.dirname(__file__))
+        self._topology = (
+            Topology.parse(topology) if isinstance(topology, str) else topology
+        )
+        self._timeouts = {**PHASE_TIMEOUTS, **(timeouts or {})}
+        self._bench_iterations = bench_iterations
+        self._bench_ops = bench_ops
+        self._profile_duration = profile_duration
+        self.build_record: Optional[Dict] = None
+        # Build output of earlier versions is removed before the measured build.
+        self._clean_build = clean_build
+        # Only tests affected by the changes since this ref (plus a smoke set) run.
+        self._selection_baseline = selection_baseline
+        self.selection: Optional[ImpactSelection] = None
+        # RUST_LOG of the suite and of the rerun of failed tests, per version.
+        self.logging_config = load_config(self.driver_version)
 
     def version_folder(self) -> Path | None:
-        target_version_folder = Path(os.path.dirname(__file__)) / "versions" / "scylla"
-        logging.info("target_version_folder '%s'", target_version_folder)
-
-        for folder_path in target_version_folder.iterdir():
-            logging.info("folder_path.name '%s'", folder_path.name)
-            if folder_path.name == self.driver_version:
-                return target_version_folder / folder_path.name
-        return None
-
-    def ignore_tests(self) -> List[str]:
-        version_folder = self.version_folder()
-        if version_folder is None:
-            logging.info(
-                "There are no ignore tests for version tag '%s'", self.driver_version
-            )
-            return []
-
-        ignore_file = version_folder / "ignore.yaml"
-        if not ignore_file.exists():
-            logging.info(
-                "Cannot find ignore file for version '%s'", self.driver_version
-            )
-            return []
-
-        with ignore_file.open(mode="r", encoding="utf-8") as file:
-            content = yaml.safe_load(file)
-
-        logging.info("Ignore file content: %s", content)
-        ignore_tests = content.get("tests", {})
-        logging.info("ignore_tests: %s", ignore_tests)
-        if not (ignore := ignore_tests.get("ignore", [])):
-            logging.info(
-                "The file '%s' for version tag '%s' doesn't contains any test to ignore",
-                ignore_file,
-                self.driver_version,
-            )
-
-        effective_version = self._scylla_version.removeprefix("release:")
-        logging.info("Checking version-specific ignores for %s", effective_version)
-        for ignored_version, test_list in ignore_tests.get(
-            "version_ignore", {}
-        ).items():
-            if re.match(ignored_version, effective_version):
-                logging.debug(
-                    "Adding ignored tests for version regex %s because it matches %s: %s",
-                    ignored_version,
-                    effective_version,
-                    test_list,
-                )
-                ignore += test_list
+        version_folder = (
+            Path(os.path.dirname(__file__)) / "versions" / "scylla" / self.driver_version
+        )
+        return version_folder if version_folder.is_dir() else None
 
-        logging.info("Ignored test list: %s", ignore)
-        return ignore
+    def ignore_tests(self) -> IgnoreIndex:
+        ignore_index = load_rules().index(self.driver_version, self._scylla_version)
+        logging.info(
+            "%d ignore rules apply to version tag '%s' with Scylla %s",
+            len(ignore_index),
+            self.driver_version,
+            self._scylla_version,
+        )
+        return ignore_index
 
     @cached_property
     def environment(self) -> Dict:
@@ -90,32 +104,33 @@ class Run:
         result.update(os.environ)
         result["SCYLLA_VERSION"] = self._scylla_version
         result["RUST_BACKTRACE"] = "full"
-        result["RUST_LOG"] = "trace"
+        result["RUST_LOG"] = self.logging_config["level"]
         # This env variable is used by ccm wrapper in Rust Driver tests
         result["SCYLLA_TEST_CLUSTER"] = self._scylla_version
+        if self._cargo_target_dir is not None:
+            result["CARGO_TARGET_DIR"] = str(self._cargo_target_dir)
         return result
 
-    def _run_command_in_shell(self, cmd: str):
-        logging.debug("Execute the cmd '%s'", cmd)
-        with subprocess.Popen(
-            cmd,
-            shell=True,
-            executable="/bin/bash",
-            env=self.environment,
+    def _command_kwargs(self, phase: str, env: Optional[Dict] = None) -> Dict:
+        return dict(
             cwd=self._rust_driver_git,
-            stderr=subprocess.PIPE,
-        ) as proc:
-            stderr = proc.communicate()
-            status_code = proc.returncode
-        assert status_code == 0, stderr
+            env={**self.environment, **(env or {})},
+            timeout=self._timeouts.get(phase),
+            log_file=self.xunit_dir
+            / "logs"
+            / f"{self._full_driver_version}_{phase}.log",
+        )
+
+    def _run_command(self, args: List[str], phase: str = "git"):
+        run_command(args, **self._command_kwargs(phase)).check()
 
     def _checkout_branch(self):
         try:
-            self._run_command_in_shell("git clean -d -f -e ccm/")
-            self._run_command_in_shell("git checkout .")
-            logging.info("git checkout to '%s' tag branch", self._full_driver_version)
-            self._run_command_in_shell(f"git checkout {self._full_driver_version}")
-            return True
+            self._run_command(["git", "clean", "-d", "-f", "-e", "ccm/"])
+            self._run_command(["git", "checkout", "."])
+            self._run_command(
+                ["git", "rev-parse", "--verify", f"{self._full_driver_version}^{{commit}}"]
+            )
         except Exception as exc:
             logging.error(
                 "Failed to branch for version '%s', with: '%s'",
@@ -123,34 +138,50 @@ class Run:
                 str(exc),
             )
             return False
-
-    def _apply_patch_files(self):
+        # Only files differing from the current checkout are rewritten, so
+        # repeated runs of a tag keep cargo's fingerprints valid.
+        ref = self._patched_ref()
+        logging.info("git checkout to '%s'", ref)
+        self._run_command(["git", "checkout", "--force", "--detach", ref])
+        return True
+
+    def _patched_ref(self) -> str:
+        """Ref of the tag with this version's patches applied, see :func:`patched_ref`."""
         version_folder = self.version_folder()
         if version_folder is None:
             logging.info(
                 "There are no patches for version tag '%s'", self.driver_version
             )
-            return
-        for file_path in version_folder.iterdir():
-            if file_path.name.endswith(".patch"):
-                try:
-                    logging.info("Show patch's statistics for file '%s'", file_path)
-                    self._run_command_in_shell(f"git apply --stat {file_path}")
-                    logging.info("Detect patch's errors for file '%s'", file_path)
-                    self._run_command_in_shell(f"git apply --check {file_path}")
-                    logging.info("Applying patch file '%s'", file_path)
-                    self._run_command_in_shell(f"patch -p1 -i {file_path}")
-                except Exception:
-                    logging.exception(
-                        "Failed to apply patch '%s' to version '%s'",
-                        file_path,
-                        self.driver_version,
-                    )
-                    raise
+        patches = patch_files(version_folder)
+        try:
+            return patched_ref(
+                self._full_driver_version, patches, **self._command_kwargs("patch")
+            )
+        except ProcessError:
+            logging.exception(
+                "Failed to apply patches %s to version '%s'",
+                patches,
+                self.driver_version,
+            )
+            raise
+
+    @property
+    def target_dir(self) -> Path:
+        if self._cargo_target_dir is not None:
+            return self._cargo_target_dir
+        return Path(self._rust_driver_git) / "target"
 
     @cached_property
     def xunit_dir(self) -> Path:
-        return Path(os.path.dirname(__file__)) / "test_results"
+        return self._results_dir / "test_results"
+
+    @cached_property
+    def argus_dir(self) -> Path:
+        return self._results_dir / "argus_test_results"
+
+    @cached_property
+    def artifacts(self) -> ArtifactStore:
+        return ArtifactStore(self._results_dir / ".artifacts")
 
     @property
     def result_file_name(self) -> str:
@@ -160,27 +191,199 @@ class Run:
     def metadata_file_name(self) -> str:
         return f"metadata_rust_results_{self.driver_version}.json"
 
-    def run_rust(self):
+    def _build_tests(self) -> Optional[Dict]:
+        """Build test binaries as a separate step, measuring and recording its cost.
+        Returns None when the build fails."""
+        toolchain: List[str] = []
+        run_command(
+            ["rustc", "--version"],
+            on_line=toolchain.append,
+            **self._command_kwargs("build"),
+        ).check()
+        build_dir = self.target_dir / "debug"
+        if self._clean_build and build_dir.exists():
+            logging.info("Removing %s before the measured build", build_dir)
+            shutil.rmtree(build_dir)
+        clean = not build_dir.exists()
+        artifacts: List[str] = []
+        command = build_command()
+        logging.info("Build tests command: %s", command)
+        build_start = time.time()
+        result = run_command(
+            command,
+            on_line=lambda line: (
+                artifacts.append(line) if '"executable":"' in line else None
+            ),
+            **self._command_kwargs("build"),
+        )
+        timings_file = self.target_dir / "cargo-timings" / "cargo-timing.html"
+        record = build_record(
+            tag=self._full_driver_version,
+            toolchain=toolchain[0] if toolchain else "unknown",
+            wall_time=result.duration,
+            cargo_messages=artifacts,
+            # A report older than the build is left by an earlier build.
+            timings_html=timings_file.read_text(encoding="utf-8")
+            if timings_file.exists() and timings_file.stat().st_mtime >= build_start
+            else None,
+            clean=clean,
+        )
+        if result.returncode != 0:
+            logging.error(
+                "Failed to build tests for version '%s'%s, the tests are not run:\n%s",
+                self.driver_version,
+                " (timed out)" if result.timed_out else "",
+                "\n".join(result.tail),
+            )
+            return None
+        stats_file = append_record(record)
+        logging.info(
+            "Tests built in %.1fs, test binaries size %d bytes, recorded in %s",
+            record["wall_time_s"],
+            record["test_binaries_size"],
+            stats_file,
+        )
+        return record
+
+    def _with_cluster(self, func):
+        if self._cluster is not None:
+            return func(self._cluster)
         with TestCluster(
-            Path(self._rust_driver_git), self._scylla_version, nodes=3,
-            log_dest_dir=Path(os.path.dirname(__file__)) / "test_results",
+            Path(self._rust_driver_git), self._scylla_version, nodes=self._topology,
+            log_dest_dir=self.xunit_dir,
             log_file_prefix=self._full_driver_version,
+            watchdog=self._watchdog,
+            watchdog_restart=self._watchdog_restart,
+            artifacts=self.artifacts,
         ) as cluster:
+            self._cluster = cluster
             cluster.start()
-            cluster_nodes_ip = cluster.nodes_addresses()
-            test_threads_flag = (
-                f"--test-threads={self._test_threads}"
-                if self._test_threads is not None
-                else ""
+            return func(cluster)
+
+    def run_rust(self):
+        return self._with_cluster(self._run_rust_tests)
+
+    def run_bench(self):
+        return self._with_cluster(self._run_bench)
+
+    def run_profile(self):
+        return self._with_cluster(self._run_profile)
+
+    def _build_workload(self) -> Path:
+        project_dir = self.target_dir / "matrix-workload"
+        manifest = write_workload_project(
+            project_dir, Path(self._rust_driver_git).resolve()
+        )
+        build_command = [
+            "cargo",
+            "build",
+            "--release",
+            "--manifest-path",
+            str(manifest),
+            "--target-dir",
+            str(project_dir / "target"),
+        ]
+        logging.info("Build workload command: %s", build_command)
+        run_command(build_command, echo=True, **self._command_kwargs("build")).check()
+        return project_dir / "target" / "release" / "matrix-workload"
+
+    def _workload_command(self, binary: Path, cluster: TestCluster) -> List[str]:
+        return [
+            str(binary),
+            "--uri",
+            scylla_uri_env(cluster.nodes_addresses())["SCYLLA_URI"],
+            "--replication-factor",
+            str(min(3, self._topology.node_count)),
+        ]
+
+    def _run_bench(self, cluster: TestCluster) -> BenchReport | None:
+        os.chdir(self._rust_driver_git)
+        if not self._checkout_branch():
+            return None
+        try:
+            binary = self._build_workload()
+            bench_command = self._workload_command(binary, cluster) + [
+                "--iterations",
+                str(self._bench_iterations),
+                "--ops",
+                str(self._bench_ops),
+            ]
+            logging.info("Run bench command: %s", bench_command)
+            output: List[str] = []
+            run_command(
+                bench_command, on_line=output.append, **self._command_kwargs("bench")
+            ).check()
+        finally:
+            self._run_command(["git", "clean", "-d", "-f", "-e", "ccm/"])
+            self._run_command(["git", "checkout", "."])
+
+        report = BenchReport(parse_workload_output(output))
+        report.write(self.xunit_dir / f"bench_results_{self.driver_version}.json")
+        return report
+
+    def _run_profile(self, cluster: TestCluster) -> FootprintReport | None:
+        os.chdir(self._rust_driver_git)
+        if not self._checkout_branch():
+            return None
+        try:
+            binary = self._build_workload()
+            profile_command = self._workload_command(binary, cluster) + [
+                "--mode",
+                "session",
+                "--duration-secs",
+                str(self._profile_duration),
+            ]
+            logging.info("Run profile command: %s", profile_command)
+            samplers: List[ProcessSampler] = []
+            result = run_command(
+                profile_command,
+                on_start=lambda pid: samplers.append(ProcessSampler(pid).start()),
+                **self._command_kwargs("profile"),
             )
-            test_command = (
-                f"{scylla_uri_per_node(nodes_ips=cluster_nodes_ip)} "
-                f"cargo nextest run --profile matrix --all-features {test_threads_flag}"
+            samples = samplers[0].stop() if samplers else []
+        finally:
+            self._run_command(["git", "clean", "-d", "-f", "-e", "ccm/"])
+            self._run_command(["git", "checkout", "."])
+
+        if result.timed_out:
+            result.check()
+        report = FootprintReport(samples, workload_failed=result.returncode != 0)
+        report.write(self.xunit_dir / f"footprint_results_{self.driver_version}.json")
+        return report
+
+    def _run_rust_tests(self, cluster: TestCluster):
+        cluster_nodes_ip = cluster.nodes_addresses()
+        test_command = [
+            "cargo",
+            "nextest",
+            "run",
+            "--profile",
+            "matrix",
+            "--all-features",
+        ]
+        if self._test_threads is not None:
+            test_command.append(f"--test-threads={self._test_threads}")
+        filters = [self._test_filter] if self._test_filter else []
+        if self._selection_baseline:
+            self.selection = select_tests(
+                self._selection_baseline,
+                self._full_driver_version,
+                **self._command_kwargs("git"),
             )
-            logging.info("Test command: %s", test_command)
-            return self.run(
-                test_command=test_command, test_result_file_pref="rust_results"
+            if self.selection.filter_expr is not None:
+                filters.append(self.selection.filter_expr)
+        if filters:
+            test_command.extend(
+                ["-E", " & ".join(f"({test_filter})" for test_filter in filters)]
             )
+        if self._partition:
+            test_command.extend(["--partition", f"count:{self._partition}"])
+        logging.info("Test command: %s", test_command)
+        return self.run(
+            test_command=test_command,
+            test_result_file_pref="rust_results",
+            test_env=scylla_uri_env(nodes_ips=cluster_nodes_ip),
+        )
 
     def create_metadata_for_failure(self, reason: str) -> None:
         metadata_file = self.xunit_dir / self.metadata_file_name
@@ -189,17 +392,26 @@ class Run:
         metadata = {
             "driver_name": self.result_file_name.replace(".xml", ""),
             "driver_type": "rust",
+            "scylla_version": self._scylla_version,
             "failure_reason": reason,
         }
-        metadata_file.write_text(json.dumps(metadata))
-
-    def run(self, test_command: str, test_result_file_pref: str) -> ProcessJUnit | None:
-        test_results_dir = Path(os.path.dirname(__file__)) / "test_results"
-        argus_test_results_dir = Path(os.path.dirname(__file__)) / "argus_test_results"
+        if self._cluster is not None:
+            metadata.update(self._cluster.metadata())
+        replace_text(metadata_file, json.dumps(metadata))
+
+    def run(
+        self,
+        test_command: List[str],
+        test_result_file_pref: str,
+        test_env: Optional[Dict[str, str]] = None,
+    ) -> ProcessJUnit | None:
+        test_results_dir = self.xunit_dir
+        argus_test_results_dir = self.argus_dir
         metadata_file = self.xunit_dir / self.metadata_file_name
         metadata = {
             "driver_name": self.result_file_name.replace(".xml", ""),
             "driver_type": "rust",
+            "scylla_version": self._scylla_version,
             "junit_result": f"./{self.result_file_name}",
         }
         logging.info(
@@ -211,17 +423,34 @@ class Run:
         if not self._checkout_branch():
             return None
 
-        self._apply_patch_files()
+        self.build_record = self._build_tests()
+        if self.build_record is None:
+            return None
+        if self.selection is not None:
+            metadata["selection"] = self.selection.as_dict()
+        metadata["build"] = {
+            key: self.build_record[key]
+            for key in ("toolchain", "wall_time_s", "test_binaries_size")
+        }
 
+        ignore_index = self.ignore_tests()
         logging.info("Run test command: %s", test_command)
-        subprocess.call(
+        # Failing tests make nextest exit with non-zero code, they are reported
+        # through junit.xml. Only a timeout aborts the run.
+        result = run_command(
+            test_command, echo=True, **self._command_kwargs("test", env=test_env)
+        )
+        if result.timed_out:
+            result.check()
+        logging.info(
+            "Finish test command: %s (exit code %s, %.1fs)",
             test_command,
-            shell=True,
-            executable="/bin/bash",
-            env=self.environment,
-            cwd=self._rust_driver_git,
+            result.returncode,
+            result.duration,
+        )
+        metadata["logging"] = self._rerun_failed_tests(
+            test_command, result.returncode, test_env, ignore_index
         )
-        logging.info("Finish test command: %s", test_command)
 
         logging.info("Start Copy test result files")
         self.copy_test_results(
@@ -229,30 +458,44 @@ class Run:
             copy_to_dir=test_results_dir,
             test_result_file_pref=f"{test_result_file_pref}_{self._full_driver_version}",
             move=True,
+            store=self.artifacts,
         )
-        shutil.copy(
-            Path(self._rust_driver_git) / "target" / "nextest" / "matrix" / "junit.xml",
+        # The results folder is reused, an earlier result file may be a view of
+        # the artifact store and must be replaced, not written through.
+        replace_file(
+            self.target_dir / "nextest" / "matrix" / "junit.xml",
             test_results_dir / self.result_file_name,
         )
         logging.info("Finish Copy test result files")
 
-        # Remove patched files - this will prevent patches from
-        # dirtying driver repo when working with matrix locally.
-        self._run_command_in_shell("git clean -d -f -e ccm/")
-        self._run_command_in_shell("git checkout .")
+        # Remove files left by the run - patches are committed in the checked
+        # out ref, so this only keeps the driver repo clean for local work.
+        self._run_command(["git", "clean", "-d", "-f", "-e", "ccm/"])
+        self._run_command(["git", "checkout", "."])
 
         report = ProcessJUnit(
             tests_result_xml=test_results_dir / self.result_file_name,
             tag=self._full_driver_version,
-            ignore_set=self.ignore_tests(),
+            ignore_set=ignore_index,
         )
 
         report.update_testcase_classname_with_tag()
         report.process()
+        metadata["ignored_failures"] = report.ignored_failures
+        metadata["unmatched_ignore_rules"] = report.unmatched_rules
+        if report.unmatched_rules:
+            logging.warning(
+                "Ignore rules matching no test of version '%s': %s",
+                self.driver_version,
+                report.unmatched_rules,
+            )
 
         self.xunit_dir.mkdir(parents=True, exist_ok=True)
 
-        metadata_file.write_text(json.dumps(metadata))
+        if self._cluster is not None:
+            metadata.update(self._cluster.metadata())
+        metadata["artifacts"] = self.artifacts.stats()
+        replace_text(metadata_file, json.dumps(metadata))
         # Copy test results exclude summary files, as Argus can not parse them
         logging.info("Start Copy test result files for Argus")
         self.copy_test_results(
@@ -260,15 +503,101 @@ class Run:
             copy_to_dir=argus_test_results_dir,
             test_result_file_pref=f"{test_result_file_pref}_{self._full_driver_version}",
             move=False,
+            store=self.artifacts,
         )
         logging.info("Finish Copy test result files for Argus")
+        self.artifacts.save_manifest()
 
         return report
 
+    def _rerun_failed_tests(
+        self,
+        test_command: List[str],
+        returncode: int,
+        test_env: Optional[Dict[str, str]],
+        ignore_index: IgnoreIndex,
+    ) -> Dict:
+        """Run the failed tests again at ``failure_level`` and merge their output into
+        junit.xml, so the suite itself runs at a lower log level. The rerun only
+        helps debugging, when it fails the results of the first run are kept."""
+        summary: Dict = {"level": self.logging_config["level"]}
+        try:
+            self._rerun(test_command, returncode, test_env, ignore_index, summary)
+        except (ProcessError, ElementTree.ParseError, OSError) as error:
+            logging.warning(
+                "Rerun of failed tests failed, the first run's results are kept",
+                exc_info=True,
+            )
+            summary["rerun_error"] = repr(error)
+        return summary
+
+    def _rerun(
+        self,
+        test_command: List[str],
+        returncode: int,
+        test_env: Optional[Dict[str, str]],
+        ignore_index: IgnoreIndex,
+        summary: Dict,
+    ) -> None:
+        config = self.logging_config
+        junit_file = self.target_dir / "nextest" / "matrix" / "junit.xml"
+        if (
+            not config["rerun_failed"]
+            or returncode != NEXTEST_TEST_RUN_FAILED
+            or not junit_file.exists()
+        ):
+            return
+        failed = failed_tests(junit_file, ignore_index)
+        if not failed:
+            return
+        if len(failed) > config["max_reruns"]:
+            logging.warning(
+                "%d tests failed, more than %d, they are not rerun with RUST_LOG=%s",
+                len(failed),
+                config["max_reruns"],
+                config["failure_level"],
+            )
+            summary["rerun_skipped"] = len(failed)
+            return
+
+        first_run_junit = junit_file.with_name("junit.first.xml")
+        # Moved aside, so junit.xml exists afterwards only if the rerun produced it.
+        os.replace(junit_file, first_run_junit)
+        try:
+            command = rerun_command(test_command, failed)
+            logging.info("Rerun %d failed tests: %s", len(failed), command)
+            result = run_command(
+                command,
+                echo=True,
+                **self._command_kwargs(
+                    "rerun", env={**(test_env or {}), "RUST_LOG": config["failure_level"]}
+                ),
+            )
+            if result.timed_out or not junit_file.exists():
+                logging.warning(
+                    "Rerun of failed tests did not finish, its output is not merged"
+                )
+                return
+            reruns = merge_rerun(first_run_junit, junit_file, config["failure_level"])
+        finally:
+            # The first run's results, merged or not, are the results of the run.
+            os.replace(first_run_junit, junit_file)
+        summary.update(
+            failure_level=config["failure_level"],
+            reruns=reruns,
+            rerun_duration=round(result.duration, 3),
+        )
+
     @staticmethod
     def copy_test_results(
-        copy_from_dir: Path, copy_to_dir: Path, test_result_file_pref: str, move: bool
+        copy_from_dir: Path,
+        copy_to_dir: Path,
+        test_result_file_pref: str,
+        move: bool,
+        store: Optional[ArtifactStore] = None,
     ):
+        """Copy (or move) result files, with ``store`` the destination files are
+        hardlinks to its blobs instead of copies."""
         if not (
             test_result_files := Path(copy_from_dir).glob(f"{test_result_file_pref}*")
         ):
@@ -282,7 +611,9 @@ class Run:
                 source_file = copy_from_dir / elem.name
                 destination_file = copy_to_dir / elem.name
                 logging.info("Move from %s to %s", source_file, destination_file)
-                if move:
+                if store is not None:
+                    store.add(source_file, destination_file, move=move)
+                elif move:
                     shutil.move(source_file, destination_file)
                 else:
-                    shutil.copy(source_file, destination_file)
+                    replace_file(source_file, destination_file)
@@ -0,0 +1,423 @@
+"""Benchmarks of the matrix's own processing paths (junit processing, ignore
+rules, result copies, report rendering, tag selection) on synthetic data.
+
+Every benchmark records the best wall time of a few repeats and the peak of
+Python allocations (tracemalloc) of a separate run. Results are written as JSON,
+comparing them with the results of the base branch shows regressions:
+
+    python3 scripts/benchmark_processing.py --output base.json          # on main
+    python3 scripts/benchmark_processing.py --baseline base.json        # on the branch
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import yaml
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from artifacts import ArtifactStore  # noqa: E402
+from ignore_rules import IgnoreRules  # noqa: E402
+from processjunit import ProcessJUnit  # noqa: E402
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT = REPO_ROOT / "test_results" / "processing_benchmarks.json"
+DEFAULT_TESTCASES = [10_000, 50_000, 200_000]
+DEFAULT_VERSIONS = 200
+DEFAULT_TAGS = 3_000
+DEFAULT_PAYLOAD_BYTES = 8 * 1024
+# Every FAILURE_EVERY-th testcase fails and carries the <system-out> payload.
+FAILURE_EVERY = 20
+SCYLLA_VERSION = "2025.1.0"
+
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.10
+
+
+def testcase_name(index: int) -> str:
+    return f"module_{index % 200}::submodule_{index % 7}::test_{index}"
+
+
+def write_junit(path: Path, testcases: int, payload_bytes: int) -> Path:
+    """nextest-like junit file, written as a stream."""
+    failures = len(range(0, testcases, FAILURE_EVERY))
+    payload = ("TRACE scylla::network::connection: frame sent " * 32)[:80] + "\n"
+    output = payload * max(1, payload_bytes // len(payload))
+    with path.open(mode="w", encoding="utf-8") as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        file.write(
+            f'<testsuites name="matrix" tests="{testcases}" failures="{failures}" '
+            f'errors="0" time="{testcases * 0.05:.3f}">\n'
+        )
+        file.write(
+            f'<testsuite name="scylla::integration" tests="{testcases}" '
+            f'disabled="0" errors="0" failures="{failures}" time="{testcases * 0.05:.3f}">\n'
+        )
+        for index in range(testcases):
+            name = testcase_name(index)
+            if index % FAILURE_EVERY:
+                file.write(
+                    f'<testcase name="{name}" classname="scylla::integration" time="0.050"/>\n'
+                )
+                continue
+            file.write(
+                f'<testcase name="{name}" classname="scylla::integration" time="0.050">'
+                '<failure type="test failure">thread panicked at assertion</failure>'
+                f"<system-out>{output}</system-out><system-err>{output}</system-err>"
+                "</testcase>\n"
+            )
+        file.write("</testsuite>\n</testsuites>\n")
+    return path
+
+
+def write_versions_tree(versions_dir: Path, versions: int) -> List[str]:
+    """versions/ tree with an ignore.yaml of exact names, Scylla version specific
+    names and pattern rules for every version. Returns the version tags."""
+    tags = [f"v1.{minor}.0" for minor in range(versions)]
+    for number, tag in enumerate(tags):
+        version_folder = versions_dir / "scylla" / tag
+        version_folder.mkdir(parents=True, exist_ok=True)
+        content = {
+            "tests": {
+                "ignore": [testcase_name(number * 40 + index) for index in range(20)],
+                "version_ignore": {
+                    "2025\\.1\\..*": [
+                        testcase_name(number * 40 + index) for index in range(20, 30)
+                    ]
+                },
+                "rules": [
+                    {"glob": f"module_{number % 200}::submodule_1::*", "scylla": "<2025.2"},
+                    {"regex": f"^module_{number % 200}::.*_1{number % 10}$", "inherit": True},
+                    {"exact": testcase_name(number), "driver": ">=1.0"},
+                ],
+            }
+        }
+        (version_folder / "ignore.yaml").write_text(yaml.safe_dump(content), encoding="utf-8")
+        (version_folder / "fix.patch").write_text("", encoding="utf-8")
+    (versions_dir / "ignore.yaml").write_text(
+        yaml.safe_dump({"rules": [{"glob": "module_1::*", "driver": "<1.5"}]}),
+        encoding="utf-8",
+    )
+    return tags
+
+
+def write_tag_repo(repo: Path, tags: int) -> Path:
+    """Git repository with ``tags`` release tags on one commit."""
+    repo.mkdir(parents=True, exist_ok=True)
+    git = ["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost"]
+    subprocess.check_call([*git, "init", "-q"], cwd=repo)
+    subprocess.check_call(
+        [*git, "commit", "-q", "--allow-empty", "-m", "initial"], cwd=repo
+    )
+    commit = subprocess.check_output(
+        [*git, "rev-parse", "HEAD"], cwd=repo, text=True
+    ).strip()
+    names = [
+        f"v{major}.{minor}.{patch}"
+        for major in range(3)
+        for minor in range(50)
+        for patch in range(20)
+    ][:tags]
+    subprocess.run(
+        [*git, "update-ref", "--stdin"],
+        input="".join(f"create refs/tags/{name} {commit}\n" for name in names),
+        text=True,
+        cwd=repo,
+        check=True,
+    )
+    return repo
+
+
+def measure(
+    name: str,
+    params: Dict,
+    func: Callable[[object], object],
+    setup: Optional[Callable[[], object]] = None,
+    repeat: int = 3,
+) -> Dict:
+    """Best wall time of ``repeat`` runs, and the allocation peak of one more run
+    (tracemalloc slows the code down, so it's not enabled while timing)."""
+    durations = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state)
+        durations.append(time.perf_counter() - start)
+    state = setup() if setup else None
+    tracemalloc.start()
+    try:
+        func(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = dict(
+        benchmark=name, params=params, seconds=round(min(durations), 6), peak_bytes=peak
+    )
+    LOGGER.info(
+        "%s %s: %.3fs, peak %.1f MiB", name, params, result["seconds"], peak / 2**20
+    )
+    return result
+
+
+def skipped(name: str, params: Dict, reason: str) -> Dict:
+    LOGGER.warning("%s %s skipped: %s", name, params, reason)
+    return dict(benchmark=name, params=params, skipped=reason)
+
+
+def bench_junit(
+    work_dir: Path, testcases: int, payload_bytes: int, ignore_index, repeat: int
+) -> Dict:
+    source = write_junit(work_dir / f"junit_{testcases}.xml", testcases, payload_bytes)
+    target = work_dir / "rust_results_v1.0.0.xml"
+
+    def setup():
+        shutil.copy(source, target)
+
+    def process(_):
+        report = ProcessJUnit(target, tag="v1.0.0", ignore_set=ignore_index)
+        report.update_testcase_classname_with_tag()
+        report.process()
+
+    params = dict(
+        testcases=testcases, payload_bytes=payload_bytes, file_bytes=source.stat().st_size
+    )
+    return measure("junit_process", params, process, setup, repeat)
+
+
+def bench_ignore_rules(versions_dir: Path, tags: List[str], repeat: int) -> List[Dict]:
+    """Run.ignore_tests is ``load_rules().index(...)``: loading the tree happens once
+    per process (then it's cached), the index is built once per version."""
+    params = dict(versions=len(tags))
+    rules = IgnoreRules.load(versions_dir)
+    return [
+        measure(
+            "ignore_rules_load", params, lambda _: IgnoreRules.load(versions_dir), repeat=repeat
+        ),
+        measure(
+            "ignore_rules_index",
+            params,
+            lambda _: [IgnoreRules(rules.rules).index(tag, SCYLLA_VERSION) for tag in tags],
+            repeat=repeat,
+        ),
+    ]
+
+
+def bench_copy_results(work_dir: Path, junit: Path, repeat: int) -> Dict:
+    params = dict(files=21, bytes=junit.stat().st_size + 20 * 2**20)
+    try:
+        from run import Run
+    except ImportError as error:
+        return skipped("copy_test_results", params, f"run.py cannot be imported: {error}")
+
+    def setup():
+        # The results are moved away, every repetition needs its own source files.
+        results_dir = Path(tempfile.mkdtemp(dir=work_dir))
+        source_dir = results_dir / "driver"
+        source_dir.mkdir()
+        shutil.copy(junit, source_dir / "rust_results_v1.0.0.xml")
+        for node in range(20):
+            (source_dir / f"rust_results_v1.0.0_node{node}.log").write_bytes(b"x" * 2**20)
+        return results_dir
+
+    def copy(results_dir):
+        # As Run.run: results moved to test_results, then copied for Argus.
+        store = ArtifactStore(results_dir / ".artifacts")
+        test_results = results_dir / "test_results"
+        Run.copy_test_results(
+            results_dir / "driver", test_results, "rust_results_v1.0.0", True, store
+        )
+        Run.copy_test_results(
+            test_results, results_dir / "argus_test_results", "rust_results_v1.0.0", False, store
+        )
+
+    return measure("copy_test_results", params, copy, setup, repeat)
+
+
+def bench_report(versions: int, repeat: int) -> List[Dict]:
+    from email_sender import create_report, render_report
+
+    results = {
+        f"v1.{minor}.0": {
+            "rust": {
+                "testsuite_summary": dict(
+                    time=3600.0,
+                    tests=2000,
+                    errors=0,
+                    failures=minor % 3,
+                    skipped=5,
+                    ignored_on_failure=2,
+                ),
+                "time": "1:00:00",
+            }
+        }
+        for minor in range(versions)
+    }
+    params = dict(versions=versions)
+    report = create_report(results=results)
+    benchmarks = [
+        measure(
+            "create_report", params, lambda _: create_report(results=results), repeat=repeat
+        )
+    ]
+    try:
+        import jinja2  # noqa: F401
+    except ImportError as error:
+        benchmarks.append(skipped("render_report", params, str(error)))
+    else:
+        benchmarks.append(
+            measure("render_report", params, lambda _: render_report(report), repeat=repeat)
+        )
+    return benchmarks
+
+
+def bench_tags(work_dir: Path, tags: int, repeat: int) -> Dict:
+    from main import extract_n_latest_repo_tags
+
+    repo = write_tag_repo(work_dir / "driver", tags)
+    return measure(
+        "extract_n_latest_repo_tags",
+        dict(tags=tags),
+        lambda _: extract_n_latest_repo_tags(str(repo), 5),
+        repeat=repeat,
+    )
+
+
+def run_benchmarks(
+    testcases: List[int] = DEFAULT_TESTCASES,
+    versions: int = DEFAULT_VERSIONS,
+    tags: int = DEFAULT_TAGS,
+    payload_bytes: int = DEFAULT_PAYLOAD_BYTES,
+    repeat: int = 3,
+    work_dir: Optional[Path] = None,
+) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="matrix-bench-", dir=work_dir) as temp:
+        temp_dir = Path(temp)
+        version_tags = write_versions_tree(temp_dir / "versions", versions)
+        rules = IgnoreRules.load(temp_dir / "versions")
+        ignore_index = rules.index(version_tags[0], SCYLLA_VERSION)
+
+        results = [
+            bench_junit(temp_dir, count, payload_bytes, ignore_index, repeat)
+            for count in testcases
+        ]
+        results.extend(bench_ignore_rules(temp_dir / "versions", version_tags, repeat))
+        results.append(
+            bench_copy_results(temp_dir, temp_dir / f"junit_{min(testcases)}.xml", repeat)
+        )
+        results.extend(bench_report(versions, repeat))
+        results.append(bench_tags(temp_dir, tags, repeat))
+    return dict(
+        created=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        python=platform.python_version(),
+        machine=platform.machine(),
+        results=results,
+    )
+
+
+def _key(result: Dict) -> str:
+    return f"{result['benchmark']} {json.dumps(result['params'], sort_keys=True)}"
+
+
+def compare(
+    current: Dict,
+    baseline: Dict,
+    time_threshold: float = TIME_THRESHOLD,
+    memory_threshold: float = MEMORY_THRESHOLD,
+) -> List[Dict]:
+    """Benchmarks slower or allocating more than the thresholds (relative change)."""
+    baseline_results = {_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        previous = baseline_results.get(_key(result))
+        if previous is None or "skipped" in result or "skipped" in previous:
+            continue
+        for metric, threshold in (("seconds", time_threshold), ("peak_bytes", memory_threshold)):
+            if not previous[metric]:
+                continue
+            change = (result[metric] - previous[metric]) / previous[metric]
+            if change > threshold:
+                regressions.append(
+                    dict(
+                        benchmark=result["benchmark"],
+                        params=result["params"],
+                        metric=metric,
+                        value=result[metric],
+                        previous_value=previous[metric],
+                        change=round(change, 3),
+                    )
+                )
+    return regressions
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # Per testcase logs of junit processing would dominate the measurements.
+    logging.getLogger("processjunit").setLevel(logging.WARNING)
+    logging.getLogger("ignore_rules").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--testcases", type=int, nargs="+", default=DEFAULT_TESTCASES)
+    parser.add_argument(
+        "--versions",
+        type=int,
+        default=DEFAULT_VERSIONS,
+        help="versions in the synthetic versions/ tree",
+    )
+    parser.add_argument(
+        "--tags", type=int, default=DEFAULT_TAGS, help="tags in the synthetic driver repository"
+    )
+    parser.add_argument(
+        "--payload-bytes",
+        type=int,
+        default=DEFAULT_PAYLOAD_BYTES,
+        help="system-out size of failed testcases",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--work-dir", type=Path, help="where synthetic data is generated, default - system temp"
+    )
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument(
+        "--baseline", type=Path, help="results to compare with, regressions fail the run"
+    )
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    arguments = parser.parse_args()
+
+    benchmark_results = run_benchmarks(
+        arguments.testcases,
+        arguments.versions,
+        arguments.tags,
+        arguments.payload_bytes,
+        arguments.repeat,
+        arguments.work_dir,
+    )
+    arguments.output.parent.mkdir(parents=True, exist_ok=True)
+    arguments.output.write_text(json.dumps(benchmark_results, indent=2))
+    LOGGER.info("Results saved to %s", arguments.output)
+    if arguments.baseline:
+        found = compare(
+            benchmark_results,
+            json.loads(arguments.baseline.read_text()),
+            arguments.time_threshold,
+            arguments.memory_threshold,
+        )
+        for regression in found:
+            LOGGER.error("Regression: %s", regression)
+        sys.exit(1 if found else 0)
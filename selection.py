@@ -0,0 +1,159 @@
+import fnmatch
+import logging
+import os
+import tomllib
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional
+
+import yaml
+
+from process import command_output
+
+LOGGER = logging.getLogger(__name__)
+
+MAPPING_FILE = Path(os.path.dirname(__file__)) / "versions" / "test_selection.yaml"
+
+# Nextest expression selecting every test.
+ALL_TESTS = "all()"
+
+
+class ImpactSelection:
+    """Nextest filter selecting the tests affected by the changes between ``baseline``
+    and ``ref``, plus the smoke set. ``filter_expr`` is None when the full suite has
+    to run."""
+
+    def __init__(
+        self,
+        baseline: str,
+        ref: str,
+        filter_expr: Optional[str],
+        changed_files: List[str],
+        reasons: Dict[str, List[str]],
+    ):
+        self.baseline = baseline
+        self.ref = ref
+        self.filter_expr = filter_expr
+        self.changed_files = changed_files
+        self.reasons = reasons
+
+    @property
+    def partial(self) -> bool:
+        return self.filter_expr is not None
+
+    def as_dict(self) -> Dict:
+        return dict(
+            partial=self.partial,
+            baseline=self.baseline,
+            ref=self.ref,
+            filter=self.filter_expr,
+            changed_files=len(self.changed_files),
+            reasons=self.reasons,
+        )
+
+
+def _matches(path: str, patterns: Iterable[str]) -> bool:
+    return any(fnmatch.fnmatchcase(path, pattern) for pattern in patterns)
+
+
+def _workspace_packages(ref: str, **command_kwargs) -> Dict[str, str]:
+    """Crate directory -> package name, read from the manifests at ``ref``."""
+    packages = {}
+    for path in command_output(
+        ["git", "ls-tree", "-r", "--name-only", ref], **command_kwargs
+    ):
+        if PurePosixPath(path).name != "Cargo.toml":
+            continue
+        manifest = tomllib.loads(
+            "\n".join(command_output(["git", "show", f"{ref}:{path}"], **command_kwargs))
+        )
+        if "package" in manifest:
+            packages[str(PurePosixPath(path).parent)] = manifest["package"]["name"]
+    return packages
+
+
+def _test_file_expression(crate_dir: str, package: str, path: str) -> Optional[str]:
+    """Expression of the tests defined in a file of ``<crate>/tests/``."""
+    relative = PurePosixPath(path)
+    if crate_dir != ".":
+        relative = relative.relative_to(crate_dir)
+    if relative.parts[0] != "tests" or relative.suffix != ".rs" or len(relative.parts) < 2:
+        return None
+    binary = relative.parts[1].removesuffix(".rs")
+    binary_expr = f"binary_id({package}::{binary})"
+    modules = [
+        part.removesuffix(".rs")
+        for part in relative.parts[2:]
+        if part not in ("mod.rs", "main.rs", "lib.rs")
+    ]
+    if not modules:
+        return binary_expr
+    return f"{binary_expr} & test(/^{'::'.join(modules)}::/)"
+
+
+def file_expression(
+    path: str, mapping: Dict, packages: Dict[str, str]
+) -> Optional[str]:
+    """Nextest expression of the tests affected by a changed file, None if none are."""
+    if _matches(path, mapping.get("full") or []):
+        return ALL_TESTS
+    if _matches(path, mapping.get("unaffected") or []):
+        return None
+    mapped = [
+        expression
+        for pattern, expression in (mapping.get("paths") or {}).items()
+        if fnmatch.fnmatchcase(path, pattern)
+    ]
+    if mapped:
+        return " | ".join(f"({expression})" for expression in mapped)
+    crate_dir = max(
+        (
+            directory
+            for directory in packages
+            if directory == "." or path.startswith(f"{directory}/")
+        ),
+        key=len,
+        default=None,
+    )
+    if crate_dir is None:
+        return None
+    package = packages[crate_dir]
+    return _test_file_expression(crate_dir, package, path) or f"rdeps({package})"
+
+
+def select_tests(
+    baseline: str, ref: str, mapping_file: Path = MAPPING_FILE, **command_kwargs
+) -> ImpactSelection:
+    """Diff ``ref`` against ``baseline`` and map the changed files to nextest filters.
+
+    Files are mapped by the maintained globs of ``mapping_file`` first. Other files
+    of a crate select the tests of the crates depending on it (nextest's ``rdeps``),
+    or just their own tests when they are test files. ``command_kwargs`` are passed
+    to ``run_command`` and must include ``cwd`` of the driver repository."""
+    mapping = yaml.safe_load(mapping_file.read_text(encoding="utf-8")) or {}
+    changed_files = command_output(
+        ["git", "diff", "--name-only", f"{baseline}...{ref}"], **command_kwargs
+    )
+    packages = _workspace_packages(ref, **command_kwargs)
+
+    reasons: Dict[str, List[str]] = {}
+    for path in changed_files:
+        expression = file_expression(path, mapping, packages)
+        if expression is not None:
+            reasons.setdefault(expression, []).append(path)
+
+    if ALL_TESTS in reasons:
+        filter_expr = None
+    else:
+        expressions = list(reasons) + list(mapping.get("smoke") or [])
+        filter_expr = (
+            " | ".join(f"({expression})" for expression in expressions) or "none()"
+        )
+    selection = ImpactSelection(baseline, ref, filter_expr, changed_files, reasons)
+    LOGGER.info(
+        "%d files changed between %s and %s, test filter: %s",
+        len(changed_files),
+        baseline,
+        ref,
+        filter_expr or "full suite",
+    )
+    return selection
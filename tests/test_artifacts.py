@@ -0,0 +1,132 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+import artifacts
+from artifacts import ArtifactStore, replace_file
+from processjunit import ProcessJUnit
+
+
+JUNIT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuites name="matrix" tests="1" failures="0" errors="0">
+  <testsuite name="scylla::integration" tests="1" failures="0" errors="0">
+    <testcase name="session::test_a" classname="scylla::integration" time="0.1"/>
+  </testsuite>
+</testsuites>
+"""
+
+
+def test_results_are_stored_once_and_linked(tmp_path):
+    driver_dir = tmp_path / "driver"
+    driver_dir.mkdir()
+    (driver_dir / "rust_results_v1.0.0.xml").write_text(JUNIT)
+    (driver_dir / "rust_results_v1.0.0_node1.log").write_text("log")
+    store = ArtifactStore(tmp_path / ".artifacts")
+
+    for source in list(driver_dir.iterdir()):
+        store.add(source, tmp_path / "test_results" / source.name, move=True)
+    for source in (tmp_path / "test_results").iterdir():
+        store.add(source, tmp_path / "argus_test_results" / source.name)
+
+    assert not list(driver_dir.iterdir())
+    view = tmp_path / "test_results" / "rust_results_v1.0.0.xml"
+    argus_view = tmp_path / "argus_test_results" / "rust_results_v1.0.0.xml"
+    assert argus_view.read_text() == JUNIT
+    assert view.samefile(argus_view)
+    assert len(list(store.root.glob("blobs/*/*"))) == 2
+    stats = store.stats()
+    assert stats["saved_bytes"] == len(JUNIT) + len("log")
+    manifest = json.loads(store.save_manifest().read_text())
+    assert manifest["argus_test_results/rust_results_v1.0.0.xml"] == (
+        manifest["test_results/rust_results_v1.0.0.xml"]
+    )
+
+
+def test_rewriting_a_view_leaves_other_views_intact(tmp_path):
+    store = ArtifactStore(tmp_path / ".artifacts")
+    source = tmp_path / "junit.xml"
+    source.write_text(JUNIT)
+    view = tmp_path / "test_results" / "rust_results_v1.0.0.xml"
+    argus_view = tmp_path / "argus_test_results" / "rust_results_v1.0.0.xml"
+    store.add(source, view, move=True)
+    store.add(view, argus_view)
+
+    ProcessJUnit(view, tag="v1.0.0", ignore_set=[]).update_testcase_classname_with_tag()
+
+    assert "v1.0.0" in view.read_text()
+    assert argus_view.read_text() == JUNIT
+    assert store.prune() == 0
+    argus_view.unlink()
+    assert store.prune() == len(JUNIT)
+    assert not list(store.root.glob("blobs/*/*"))
+
+
+def test_result_of_a_reused_results_dir_is_replaced(tmp_path):
+    store = ArtifactStore(tmp_path / ".artifacts")
+    source = tmp_path / "junit.xml"
+    source.write_text(JUNIT)
+    view = tmp_path / "test_results" / "rust_results_v1.0.0.xml"
+    argus_view = tmp_path / "argus_test_results" / "rust_results_v1.0.0.xml"
+    store.add(source, view, move=True)
+    store.add(view, argus_view)
+
+    next_run = tmp_path / "next_junit.xml"
+    next_run.write_text("next run")
+    replace_file(next_run, view)
+
+    assert view.read_text() == "next run"
+    assert argus_view.read_text() == JUNIT
+
+
+def test_copy_snapshots_a_live_file(tmp_path):
+    store = ArtifactStore(tmp_path / ".artifacts")
+    log = tmp_path / "node1.log"
+    log.write_text("started\n")
+    view = tmp_path / "logs" / "node1.log"
+
+    store.add(log, view, copy=True)
+    with log.open("a") as file:
+        file.write("more\n")
+
+    assert view.read_text() == "started\n"
+    assert not view.samefile(log)
+
+
+def test_links_of_known_blobs_are_not_hashed_again(tmp_path, monkeypatch):
+    store = ArtifactStore(tmp_path / ".artifacts")
+    source = tmp_path / "junit.xml"
+    source.write_text(JUNIT)
+    view = tmp_path / "test_results" / "rust_results_v1.0.0.xml"
+    store.add(source, view, move=True)
+    hashed = []
+    monkeypatch.setattr(artifacts, "file_digest", hashed.append)
+
+    store.add(view, tmp_path / "argus_test_results" / view.name)
+    ArtifactStore(store.root).add(view, tmp_path / "upload" / view.name)
+
+    assert hashed == []
+
+
+def test_cloned_views_keep_their_blobs(tmp_path, monkeypatch):
+    store = ArtifactStore(tmp_path / ".artifacts")
+    source = tmp_path / "junit.xml"
+    source.write_text(JUNIT)
+    view = tmp_path / "test_results" / "rust_results_v1.0.0.xml"
+    store.add(source, view, move=True)
+
+    def no_link(*args):
+        raise OSError("Invalid cross-device link")
+
+    # The view and the blob are different files, as on two filesystems.
+    monkeypatch.setattr(os, "link", no_link)
+    store.add(view, tmp_path / "argus_test_results" / view.name, move=True)
+    store.save_manifest()
+
+    assert ArtifactStore(store.root).prune() == 0
+    (tmp_path / "argus_test_results" / view.name).unlink()
+    assert ArtifactStore(store.root).prune() == len(JUNIT)
@@ -0,0 +1,59 @@
+import json
+import sys
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from bench import BenchReport, compare_versions, mean_confidence_interval, parse_workload_output
+
+
+def sample(ops_per_second, p99, iteration, errors=0):
+    return {
+        "scenario": "prepared_insert",
+        "concurrency": 16,
+        "iteration": iteration,
+        "ops": int(ops_per_second),
+        "errors": errors,
+        "duration_s": 1.0,
+        "latency_us": {"p50": p99 // 4, "p90": p99 // 2, "p99": p99, "p999": p99 * 2, "max": p99 * 4},
+        "histogram": [[256, 10], [512, 5]],
+    }
+
+
+def test_confidence_interval_uses_t_distribution():
+    interval = mean_confidence_interval([10.0, 12.0, 14.0])
+
+    assert interval["mean"] == 12.0
+    assert round(interval["ci95"][0], 2) == round(12.0 - 4.303 * 2.0 / 3**0.5, 2)
+    assert mean_confidence_interval([5.0])["ci95"] is None
+
+
+def test_workload_output_is_aggregated_over_iterations():
+    lines = ["Compiling...", '[stderr] {"not": "json"}'] + [
+        json.dumps(sample(1000 + i, 800, i)) for i in range(3)
+    ]
+
+    report = BenchReport(parse_workload_output(lines))
+    stats = report.summary["prepared_insert@16"]
+
+    assert stats["throughput"]["mean"] == 1001
+    assert stats["throughput"]["samples"] == 3
+    assert stats["histogram"] == [(256, 30), (512, 15)]
+    assert not report.is_failed
+
+
+def test_significant_slowdown_against_predecessor_is_a_regression():
+    new = BenchReport([sample(800 + i, 1500, i) for i in range(5)]).summary
+    old = BenchReport([sample(1000 + i, 1000, i) for i in range(5)]).summary
+
+    comparison = compare_versions({"v1.7.0": old, "v1.6.0": None, "v1.8.0": new})
+
+    row = comparison["workloads"]["prepared_insert@16"]["v1.8.0"]
+    assert comparison["versions"] == ["v1.8.0", "v1.7.0"]
+    assert row["baseline"] == "v1.7.0"
+    assert row["throughput_change"]["regression"]
+    assert row["p99_change"]["regression"]
+    assert comparison["regressions"] == [{"workload": "prepared_insert@16", "version": "v1.8.0"}]
+    assert "throughput_change" not in comparison["workloads"]["prepared_insert@16"]["v1.7.0"]
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from scripts.benchmark_processing import compare, run_benchmarks
+
+
+def test_benchmarks_run_on_small_synthetic_data(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKSPACE", str(tmp_path))
+    results = run_benchmarks(
+        testcases=[100], versions=3, tags=30, payload_bytes=200, repeat=1, work_dir=tmp_path
+    )
+
+    by_name = {result["benchmark"]: result for result in results["results"]}
+    assert set(by_name) == {
+        "junit_process",
+        "ignore_rules_load",
+        "ignore_rules_index",
+        "copy_test_results",
+        "create_report",
+        "render_report",
+        "extract_n_latest_repo_tags",
+    }
+    measured = [result for result in results["results"] if "skipped" not in result]
+    assert all(result["seconds"] > 0 and result["peak_bytes"] > 0 for result in measured)
+    assert by_name["junit_process"]["params"]["testcases"] == 100
+
+
+def test_regressions_against_baseline():
+    def result(benchmark, params, seconds, peak_bytes):
+        return dict(benchmark=benchmark, params=params, seconds=seconds, peak_bytes=peak_bytes)
+
+    baseline = {
+        "results": [
+            result("junit_process", {"testcases": 10}, 1.0, 100),
+            {"benchmark": "render_report", "params": {"versions": 3}, "skipped": "no jinja2"},
+        ]
+    }
+    current = {
+        "results": [
+            result("junit_process", {"testcases": 10}, 1.1, 150),
+            result("render_report", {"versions": 3}, 1.0, 1),
+        ]
+    }
+    regressions = compare(current, baseline)
+    assert [(regression["metric"], regression["change"]) for regression in regressions] == [
+        ("peak_bytes", 0.5)
+    ]
@@ -0,0 +1,108 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from bisection import BAD, GOOD, SKIP, InvalidRange, binary_args, bisect_commits
+
+
+def git(repo, *args):
+    return subprocess.check_output(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@localhost", *args],
+        cwd=repo,
+        text=True,
+    ).strip()
+
+
+def make_history(tmp_path, states):
+    repo = tmp_path / "driver"
+    repo.mkdir()
+    git(repo, "init", "-q")
+    commits = []
+    for index, state in enumerate(states):
+        (repo / "state").write_text(f"{index} {state}\n")
+        git(repo, "add", "state")
+        git(repo, "commit", "-q", "-m", f"commit {index}")
+        commits.append(git(repo, "rev-parse", "HEAD"))
+    return repo, commits
+
+
+def checker(repo, checked):
+    def check(commit):
+        checked.append(commit)
+        return (repo / "state").read_text().split()[1]
+
+    return check
+
+
+def test_first_bad_commit_is_found(tmp_path):
+    repo, commits = make_history(tmp_path, [GOOD] * 9 + [BAD] * 7)
+    checked = []
+
+    result = bisect_commits(commits[0], commits[-1], checker(repo, checked), cwd=repo)
+
+    assert result["first_bad_commit"] == commits[9]
+    assert checked[:2] == [commits[0], commits[-1]]
+    assert len(result["steps"]) == len(checked) <= 2 + 4
+    assert git(repo, "rev-parse", "HEAD") == commits[-1]
+
+
+def test_skipped_commits_give_candidates(tmp_path):
+    repo, commits = make_history(tmp_path, [GOOD, GOOD, SKIP, SKIP, BAD, BAD])
+
+    result = bisect_commits(commits[1], commits[-1], checker(repo, []), cwd=repo)
+
+    assert result["first_bad_commit"] is None
+    assert set(result["candidates"]) == set(commits[2:5])
+
+
+def test_adjacent_commits_are_checked_only_at_the_ends(tmp_path):
+    repo, commits = make_history(tmp_path, [GOOD, BAD])
+    checked = []
+
+    result = bisect_commits(commits[0], commits[1], checker(repo, checked), cwd=repo)
+
+    assert result["first_bad_commit"] == commits[1]
+    assert checked == commits
+
+
+@pytest.mark.parametrize("states", [[BAD, BAD, BAD], [GOOD, GOOD, GOOD], [SKIP, GOOD, BAD]])
+def test_range_with_wrong_ends_is_refused(tmp_path, states):
+    repo, commits = make_history(tmp_path, states)
+
+    with pytest.raises(InvalidRange):
+        bisect_commits(commits[0], commits[-1], checker(repo, []), cwd=repo)
+
+    assert git(repo, "rev-parse", "HEAD") == commits[-1]
+
+
+def test_binary_args_of_test():
+    nextest_list = {
+        "rust-suites": {
+            "scylla": {
+                "package-name": "scylla",
+                "binary-name": "scylla",
+                "kind": "lib",
+                "testcases": {"routing::test_sharding": {}},
+            },
+            "scylla::integration": {
+                "package-name": "scylla",
+                "binary-name": "integration",
+                "kind": "test",
+                "testcases": {"session::test_prepared_statement": {}},
+            },
+        }
+    }
+
+    assert binary_args(nextest_list, "session::test_prepared_statement") == [
+        "--package",
+        "scylla",
+        "--test",
+        "integration",
+    ]
+    assert binary_args(nextest_list, "routing::test_sharding") == ["--package", "scylla", "--lib"]
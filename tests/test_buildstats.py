@@ -0,0 +1,115 @@
+import json
+import sys
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from buildstats import append_record, build_record, find_regressions, parse_crate_timings
+
+
+TIMINGS_HTML = """<html><script>
+const UNIT_DATA = [
+  {"i": 0, "name": "scylla-cql", "version": "1.4.0", "mode": "todo", "duration": 12.5},
+  {"i": 1, "name": "scylla", "version": "1.4.0", "mode": "todo", "duration": 30.25},
+  {"i": 2, "name": "scylla", "version": "1.4.0", "mode": "todo", "duration": 4.0}
+];
+const CONCURRENCY_DATA = [];
+</script></html>"""
+
+
+def artifact_message(tmp_path, target, size, test=True):
+    executable = tmp_path / f"{target}-0123abcd"
+    executable.write_bytes(b"\0" * size)
+    return json.dumps(
+        {
+            "reason": "compiler-artifact",
+            "manifest_path": str(tmp_path / "scylla" / "Cargo.toml"),
+            "target": {"name": target, "kind": ["test"]},
+            "profile": {"test": test},
+            "executable": str(executable),
+        }
+    )
+
+
+def record(tag, wall_time, size, toolchain="rustc 1.85.0", clean=True):
+    return dict(
+        tag=tag,
+        toolchain=toolchain,
+        clean_build=clean,
+        wall_time_s=wall_time,
+        crates={},
+        test_binaries={},
+        test_binaries_size=size,
+    )
+
+
+def test_crate_timings_are_summed_per_crate():
+    assert parse_crate_timings(TIMINGS_HTML) == {"scylla-cql": 12.5, "scylla": 34.25}
+    assert parse_crate_timings("<html></html>") == {}
+
+
+def test_build_record_collects_test_binaries(tmp_path):
+    messages = [
+        "Compiling scylla v1.4.0",
+        artifact_message(tmp_path, "integration", 300),
+        artifact_message(tmp_path, "scylla", 200),
+        artifact_message(tmp_path, "build-script", 50, test=False),
+        json.dumps({"reason": "build-finished", "success": True}),
+    ]
+
+    result = build_record("v1.4.0", "rustc 1.85.0", 61.2, messages, TIMINGS_HTML)
+
+    assert result["test_binaries"] == {"scylla/integration": 300, "scylla/scylla": 200}
+    assert result["test_binaries_size"] == 500
+    assert result["crates"]["scylla"] == 34.25
+
+
+def test_regressions_are_reported_against_predecessor(tmp_path):
+    append_record(record("v1.2.0", 100.0, 1000), tmp_path)
+    append_record(record("v1.3.0", 150.0, 1000), tmp_path)
+    append_record(record("v1.3.0", 110.0, 1000), tmp_path)
+    append_record(record("v1.4.0", 112.0, 1500), tmp_path)
+
+    regressions = find_regressions(["v1.4.0", "v1.3.0", "v1.2.0"], tmp_path)
+
+    assert regressions == [
+        dict(
+            tag="v1.4.0",
+            predecessor="v1.3.0",
+            metric="test_binaries_size",
+            value=1500,
+            previous_value=1000,
+            change=0.5,
+            toolchain="rustc 1.85.0",
+            previous_toolchain="rustc 1.85.0",
+        )
+    ]
+
+
+def metrics(regressions):
+    return [regression["metric"] for regression in regressions]
+
+
+def test_wall_time_is_compared_between_clean_builds_only(tmp_path):
+    append_record(record("v1.3.0", 100.0, 1000), tmp_path)
+    append_record(record("v1.3.0", 10.0, 1000, clean=False), tmp_path)
+    append_record(record("v1.4.0", 30.0, 1000, clean=False), tmp_path)
+
+    assert find_regressions(["v1.4.0"], tmp_path) == []
+
+    append_record(record("v1.4.0", 130.0, 1000), tmp_path)
+
+    assert metrics(find_regressions(["v1.4.0"], tmp_path)) == ["wall_time_s"]
+
+
+def test_builds_with_other_toolchain_are_not_compared(tmp_path):
+    append_record(record("v1.3.0", 100.0, 1000, toolchain="rustc 1.80.0"), tmp_path)
+    append_record(record("v1.4.0", 200.0, 2000), tmp_path)
+
+    assert find_regressions(["v1.4.0"], tmp_path) == []
+
+    append_record(record("v1.3.0", 190.0, 1000), tmp_path)
+
+    assert metrics(find_regressions(["v1.4.0"], tmp_path)) == ["test_binaries_size"]
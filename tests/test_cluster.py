@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+pytest.importorskip("ccmlib")
+
+from cluster import RACKDC_FILE_NAME, persist_rack
+
+
+class NodeStandIn:
+    """The part of a ccm node ``persist_rack`` uses, saving node.conf as yaml."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.rack = None
+        self.data_center = None
+
+    def get_conf_dir(self) -> str:
+        return str(self.path / "conf")
+
+    def _update_config(self) -> None:
+        (self.path / "node.conf").write_text(
+            f"data_center: {self.data_center}\nrack: {self.rack}\n", encoding="utf-8"
+        )
+
+
+def test_rack_is_persisted_to_node_config(tmp_path):
+    node = NodeStandIn(tmp_path / "node3")
+
+    persist_rack(node, "dc1", "rack2")
+
+    properties = (tmp_path / "node3" / "conf" / RACKDC_FILE_NAME).read_text()
+    assert "dc=dc1\n" in properties
+    assert "rack=rack2\n" in properties
+    assert (tmp_path / "node3" / "node.conf").read_text() == "data_center: dc1\nrack: rack2\n"
@@ -0,0 +1,120 @@
+import sys
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from cluster_watchdog import ClusterWatchdog
+
+
+class FakeNode:
+    def __init__(self, name: str, log_file: Path):
+        self.name = name
+        self.log_file = log_file
+        self.log_file.write_text("INFO starting\n")
+        self.running = True
+        self.starts = 0
+
+    def is_running(self):
+        return self.running
+
+    def address(self):
+        # Nothing listens on port 1, so CQL checks always fail.
+        return "127.0.0.1"
+
+    def logfilename(self):
+        return str(self.log_file)
+
+    def stop(self, gently=True):
+        self.running = False
+
+    def start(self, wait_for_binary_proto=False):
+        self.starts += 1
+        self.running = True
+
+
+def make_watchdog(tmp_path, nodes, **kwargs):
+    return ClusterWatchdog(
+        nodes=lambda: nodes,
+        log_dest_dir=tmp_path / "logs",
+        log_file_prefix="v1.0.0",
+        cql_port=1,
+        cql_timeout=0.1,
+        **kwargs,
+    )
+
+
+def test_log_error_pattern_is_recorded_once_with_log_copy(tmp_path):
+    node = FakeNode("node1", tmp_path / "node1.log")
+    watchdog = make_watchdog(tmp_path, [node], cql_failures_threshold=100)
+
+    watchdog.check()
+    with node.log_file.open("a") as file:
+        file.write("ERROR Segmentation fault on shard 0\nINFO partial")
+    watchdog.check()
+    watchdog.check()
+
+    incidents = watchdog.incidents
+    assert [incident["kind"] for incident in incidents] == ["log_error"]
+    assert "Segmentation fault" in incidents[0]["detail"]
+    assert Path(incidents[0]["log_copy"]).read_text().startswith("INFO starting")
+
+
+def test_log_is_copied_once_per_node_and_round(tmp_path):
+    node = FakeNode("node1", tmp_path / "node1.log")
+    watchdog = make_watchdog(tmp_path, [node], cql_failures_threshold=100)
+
+    with node.log_file.open("a") as file:
+        file.write("ERROR Segmentation fault\nERROR std::bad_alloc\nERROR Aborting\n")
+    watchdog.check()
+    with node.log_file.open("a") as file:
+        file.write("ERROR Aborting on shard 1\n")
+    watchdog.check()
+
+    copies = [incident["log_copy"] for incident in watchdog.incidents]
+    assert len(copies) == 4
+    assert copies[0] == copies[1] == copies[2] != copies[3]
+    assert len(list((tmp_path / "logs").iterdir())) == 2
+
+
+def test_errors_logged_before_start_are_not_incidents(tmp_path):
+    node = FakeNode("node1", tmp_path / "node1.log")
+    with node.log_file.open("a") as file:
+        file.write("ERROR Segmentation fault of an earlier run\n")
+    watchdog = make_watchdog(tmp_path, [node], cql_failures_threshold=100, interval=60)
+
+    watchdog.start()
+    watchdog.stop()
+    with node.log_file.open("a") as file:
+        file.write("ERROR Aborting\n")
+    watchdog.check()
+
+    assert [incident["detail"] for incident in watchdog.incidents] == ["ERROR Aborting"]
+
+
+def test_node_down_is_restarted_when_enabled(tmp_path):
+    node = FakeNode("node2", tmp_path / "node2.log")
+    watchdog = make_watchdog(tmp_path, [node], restart=True, cql_failures_threshold=100)
+
+    watchdog.check()
+    node.running = False
+    watchdog.check()
+
+    assert node.starts == 1
+    assert [incident["kind"] for incident in watchdog.incidents] == [
+        "node_down",
+        "restarted",
+    ]
+
+
+def test_unresponsive_cql_port_is_reported_after_threshold(tmp_path):
+    node = FakeNode("node3", tmp_path / "node3.log")
+    watchdog = make_watchdog(tmp_path, [node], cql_failures_threshold=2)
+
+    watchdog.check()
+    assert watchdog.incidents == []
+    watchdog.check()
+    watchdog.check()
+
+    assert [incident["kind"] for incident in watchdog.incidents] == ["cql_unresponsive"]
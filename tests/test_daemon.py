@@ -0,0 +1,86 @@
+import json
+import socket
+import sys
+import threading
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from daemon import MatrixServer, submit_job
+
+
+class FakeDaemon:
+    def __init__(self):
+        self.jobs = []
+
+    def run_job(self, job, emit):
+        self.jobs.append(job)
+        emit({"event": "log", "message": "building"})
+        emit({"event": "result", "summary": {"testsuite_summary": {"tests": 1}}, "junit": "<testsuites/>"})
+        emit({"event": "done", "status": 0})
+        return 0
+
+
+def test_job_events_are_streamed_back_to_the_client(tmp_path):
+    socket_path = str(tmp_path / "matrix.sock")
+    fake_daemon = FakeDaemon()
+    with MatrixServer(socket_path, fake_daemon) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            job = {"driver_ref": "v1.8.0", "scylla_version": "release:2025.1", "test_filter": "test(foo)"}
+            events = list(submit_job(socket_path, job))
+            invalid = list(submit_job(socket_path, {"driver_ref": "v1.8.0"}))
+        finally:
+            server.shutdown()
+
+    assert fake_daemon.jobs == [job]
+    assert [event["event"] for event in events] == ["log", "result", "done"]
+    assert events[1]["junit"] == "<testsuites/>"
+    assert [event["event"] for event in invalid] == ["error", "done"]
+    assert invalid[-1]["status"] == 1
+
+
+class BlockingDaemon:
+    """Emits its events only after the client of the first job went away."""
+
+    def __init__(self):
+        self.client_gone = threading.Event()
+        self.finished = threading.Event()
+        self.statuses = []
+
+    def run_job(self, job, emit):
+        if job["driver_ref"] == "v1.8.0":
+            self.client_gone.wait(timeout=10)
+            for index in range(1000):
+                emit({"event": "log", "message": f"line {index} " + "x" * 1000})
+        emit({"event": "done", "status": 0})
+        self.statuses.append(0)
+        self.finished.set()
+        return 0
+
+
+def test_client_disconnecting_mid_run_does_not_break_the_daemon(tmp_path):
+    socket_path = str(tmp_path / "matrix.sock")
+    blocking_daemon = BlockingDaemon()
+    with MatrixServer(socket_path, blocking_daemon) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(socket_path)
+            client.sendall(json.dumps({"driver_ref": "v1.8.0", "scylla_version": "2025.1"}).encode() + b"\n")
+            # Served while the first job is still running.
+            invalid = list(submit_job(socket_path, {"driver_ref": "v1.7.0"}))
+            client.close()
+            blocking_daemon.client_gone.set()
+            assert blocking_daemon.finished.wait(timeout=10)
+            events = list(submit_job(socket_path, {"driver_ref": "v1.7.0", "scylla_version": "2025.1"}))
+        finally:
+            server.shutdown()
+
+    assert [event["event"] for event in invalid] == ["error", "done"]
+    assert blocking_daemon.statuses == [0, 0]
+    assert [event["event"] for event in events] == ["done"]
@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+from xml.etree import ElementTree
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from driver_logging import failed_tests, load_config, merge_rerun, rerun_command
+from ignore_rules import IgnoreIndex
+
+
+JUNIT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuites name="matrix" tests="3" failures="2" errors="0">
+  <testsuite name="scylla::integration" tests="3" failures="2" errors="0">
+    <testcase name="session::test_a" classname="scylla::integration" time="0.1"/>
+    <testcase name="session::test_b" classname="scylla::integration" time="0.1">
+      <failure type="test failure">assertion failed</failure>
+      <system-out>info output</system-out>
+    </testcase>
+    <testcase name="session::test_known" classname="scylla::integration" time="0.1">
+      <failure type="test failure">known</failure>
+    </testcase>
+  </testsuite>
+</testsuites>
+"""
+
+RERUN_JUNIT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuites name="matrix" tests="1" failures="0" errors="0">
+  <testsuite name="scylla::integration" tests="1" failures="0" errors="0">
+    <testcase name="session::test_b" classname="scylla::integration" time="0.3">
+      <system-out>TRACE scylla::network: frame sent</system-out>
+    </testcase>
+  </testsuite>
+</testsuites>
+"""
+
+
+def test_config_is_overridden_per_version(tmp_path):
+    (tmp_path / "logging.yaml").write_text("level: warn\n")
+    (tmp_path / "scylla" / "v0.14.0").mkdir(parents=True)
+    (tmp_path / "scylla" / "v0.14.0" / "logging.yaml").write_text(
+        "level: trace\nrerun_failed: false\n"
+    )
+    assert load_config("v1.0.0", tmp_path)["level"] == "warn"
+    assert load_config("v1.0.0", tmp_path)["rerun_failed"]
+    old = load_config("v0.14.0", tmp_path)
+    assert (old["level"], old["rerun_failed"]) == ("trace", False)
+    assert load_config("v1.0.0")["failure_level"] == "trace"
+
+
+def test_failed_tests_are_rerun_alone(tmp_path):
+    junit = tmp_path / "junit.xml"
+    junit.write_text(JUNIT)
+    failed = failed_tests(junit, IgnoreIndex.from_names(["session::test_known"]))
+    assert failed == [("scylla::integration", "session::test_b")]
+
+    command = rerun_command(
+        ["cargo", "nextest", "run", "--profile", "matrix", "-E", "test(/x/)", "--partition", "count:1/2"],
+        failed,
+    )
+    assert command == [
+        "cargo", "nextest", "run", "--profile", "matrix",
+        "-E", "(binary_id(scylla::integration) & test(=session::test_b))",
+    ]
+
+
+def test_rerun_output_is_merged_into_failed_testcase(tmp_path):
+    junit = tmp_path / "junit.xml"
+    junit.write_text(JUNIT)
+    rerun_junit = tmp_path / "rerun.xml"
+    rerun_junit.write_text(RERUN_JUNIT)
+
+    assert merge_rerun(junit, rerun_junit, "trace") == {"session::test_b": "passed"}
+
+    root = ElementTree.parse(junit).getroot()
+    testcase = root.find(".//testcase[@name='session::test_b']")
+    assert testcase.find("failure") is not None
+    assert testcase.attrib["rerun"] == "passed"
+    output = testcase.find("system-out").text
+    assert output.startswith("info output")
+    assert "RUST_LOG=trace: passed" in output
+    assert "frame sent" in output
+    assert root.find(".//testcase[@name='session::test_known']").get("rerun") is None
@@ -0,0 +1,69 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from driver_tags import list_tags, prepare_tags, select_tags
+from patched_refs import REF_NAMESPACE
+
+
+TAGS = ["v0.14.0", "v0.15.1", "v1.3.0", "v1.3.1", "v1.4.0", "v1.4.2", "v1.5.0", "v2.0.0"]
+
+
+def git(repo, *args):
+    return subprocess.check_output(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@localhost", *args],
+        cwd=repo,
+        text=True,
+    ).strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "driver"
+    repo.mkdir()
+    git(repo, "init", "-q")
+    for tag in TAGS:
+        git(repo, "commit", "-q", "--allow-empty", "-m", tag)
+        git(repo, "tag", "-a", "-m", tag, tag)
+    git(repo, "tag", "nightly")
+    return repo
+
+
+def test_tags_are_listed_with_their_commits(repo):
+    tags = {tag.name: tag for tag in list_tags(cwd=repo)}
+    assert sorted(tags) == sorted(TAGS)
+    assert tags["v1.5.0"].commit == git(repo, "rev-parse", "v1.5.0^{commit}")
+
+
+def test_select_by_ranges_and_rules(repo):
+    tags = list_tags(cwd=repo)
+    assert select_tags(tags, "latest:3") == ["v2.0.0", "v1.5.0", "v1.4.2"]
+    assert select_tags(tags, ">=1.4,<2") == ["v1.5.0", "v1.4.2", "v1.4.0"]
+    assert select_tags(tags, ">=1.3,<2;latest:all") == ["v1.5.0", "v1.4.2", "v1.3.1"]
+    assert select_tags(tags, "<1;latest") == ["v0.15.1", "v0.14.0"]
+    with pytest.raises(ValueError):
+        select_tags(tags, "newest")
+
+
+def test_prepare_fetches_missing_tags_and_patches(repo, tmp_path, monkeypatch):
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "-q", "--no-tags", str(repo), str(clone))
+    versions_dir = tmp_path / "versions"
+    (versions_dir / "scylla" / "v1.4.2").mkdir(parents=True)
+    (versions_dir / "scylla" / "v1.4.2" / "fix.patch").write_text(
+        "--- /dev/null\n+++ b/fix.txt\n@@ -0,0 +1 @@\n+fixed\n"
+    )
+    monkeypatch.setattr("driver_tags.VERSIONS_DIR", versions_dir)
+
+    refs = prepare_tags(["v1.4.2", "v1.5.0", "v9.9.9"], cwd=clone)
+
+    assert refs["v1.5.0"] == "v1.5.0"
+    assert refs["v1.4.2"].startswith(f"{REF_NAMESPACE}/v1.4.2/")
+    assert git(clone, "show", f"{refs['v1.4.2']}:fix.txt") == "fixed"
+    assert "v9.9.9" not in refs
@@ -0,0 +1,141 @@
+import json
+import sys
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+import flaky
+from flaky import FLAKY, NEWLY_BROKEN, STABLE, analyze, archive_run, change_point, load_history
+
+
+def write_run(history_dir, index, tag, scylla_version, outcomes):
+    run_dir = history_dir / f"run{index:04d}"
+    run_dir.mkdir(parents=True)
+    testcases = []
+    for name, outcome in outcomes.items():
+        body = {
+            "pass": "",
+            "fail": "<failure type='test failure'>panicked</failure>",
+            "ignored": "<ignored_on_failure type='test failure'>panicked</ignored_on_failure>",
+            "skip": "<skipped/>",
+        }[outcome]
+        testcases.append(f"<testcase name='{name}' classname='{tag}.scylla'>{body}</testcase>")
+    (run_dir / f"rust_results_{tag}.xml").write_text(
+        f"<?xml version='1.0' encoding='utf-8'?>"
+        f"<testsuites name='nextest-run' timestamp='2026-01-01T00:{index // 60:02d}:{index % 60:02d}Z'>"
+        f"<testsuite name='scylla'>{''.join(testcases)}</testsuite></testsuites>"
+    )
+    (run_dir / f"metadata_rust_results_{tag}.json").write_text(
+        json.dumps({"scylla_version": scylla_version})
+    )
+
+
+def write_ignore_file(versions_dir, tag, ignore, version_ignore=None):
+    (versions_dir / "scylla" / tag).mkdir(parents=True)
+    tests = {"ignore": ignore}
+    if version_ignore:
+        tests["version_ignore"] = version_ignore
+    (versions_dir / "scylla" / tag / "ignore.yaml").write_text(json.dumps({"tests": tests}))
+
+
+def test_change_point_detects_rate_shift():
+    assert change_point([False] * 10 + [True] * 5) == 10
+    assert change_point([False, True] * 8) is None
+    assert change_point([False] * 4) is None
+
+
+def test_classification_and_suggestions(tmp_path):
+    history_dir = tmp_path / "history"
+    versions_dir = tmp_path / "versions"
+    write_ignore_file(versions_dir, "v1.4.0", ["ignored::fixed", "ignored::still_failing"])
+    for index in range(20):
+        write_run(
+            history_dir,
+            index,
+            "v1.4.0",
+            "release:2025.1",
+            {
+                "ok::always": "pass",
+                "ok::skipped": "skip",
+                "sometimes::fails": "fail" if index % 4 == 1 else "pass",
+                "now::broken": "fail" if index >= 14 else "pass",
+                "ignored::fixed": "ignored" if index < 10 else "pass",
+                "ignored::still_failing": "ignored",
+            },
+        )
+
+    report = analyze(load_history(history_dir), ["v1.4.0"], versions_dir)["v1.4.0"]
+
+    assert report["runs"] == 20
+    assert report["stable_tests"] == 1
+    assert report["tests"]["sometimes::fails"]["status"] == FLAKY
+    assert report["tests"]["now::broken"]["status"] == NEWLY_BROKEN
+    assert report["tests"]["now::broken"]["evidence"]["change_point"]["since"]["path"] == (
+        "run0014/rust_results_v1.4.0.xml"
+    )
+    assert report["tests"]["ignored::fixed"]["status"] == STABLE
+    assert {
+        suggestion["test"]: suggestion["reason"]
+        for suggestion in report["suggestions"]["add"]
+    } == {"sometimes::fails": FLAKY, "now::broken": NEWLY_BROKEN}
+    assert [suggestion["test"] for suggestion in report["suggestions"]["remove"]] == [
+        "ignored::fixed"
+    ]
+    assert report["suggestions"]["remove"][0]["evidence"]["consecutive_passes"] == 10
+
+
+def test_failures_on_one_scylla_version_suggest_version_ignore(tmp_path):
+    history_dir = tmp_path / "history"
+    versions_dir = tmp_path / "versions"
+    for index in range(12):
+        scylla_version = "release:2025.1" if index % 2 else "release:2025.2"
+        outcome = "fail" if scylla_version == "release:2025.1" and index % 3 else "pass"
+        write_run(history_dir, index, "v1.5.0", scylla_version, {"types::vector": outcome})
+
+    report = analyze(load_history(history_dir), ["v1.5.0"], versions_dir)["v1.5.0"]
+
+    (suggestion,) = report["suggestions"]["add"]
+    assert suggestion["version_ignore"] == "2025\\.1"
+
+    write_ignore_file(versions_dir, "v1.5.0", [], {"2025\\.1": ["types::vector"]})
+    report = analyze(load_history(history_dir), ["v1.5.0"], versions_dir)["v1.5.0"]
+    assert report["suggestions"] == {"add": [], "remove": []}
+
+
+def test_history_index_only_parses_new_files(tmp_path, monkeypatch):
+    history_dir = tmp_path / "history"
+    write_run(history_dir, 0, "v1.4.0", "release:2025.1", {"a": "pass"})
+    assert len(load_history(history_dir)) == 1
+
+    parsed = []
+    original = flaky.parse_run
+    monkeypatch.setattr(flaky, "parse_run", lambda path: parsed.append(path) or original(path))
+    write_run(history_dir, 1, "v1.4.0", "release:2025.1", {"a": "fail"})
+
+    runs = load_history(history_dir)
+    assert [run["failed"] for run in runs] == [[], ["a"]]
+    assert [path.parent.name for path in parsed] == ["run0001"]
+
+
+def test_only_result_files_of_the_run_are_archived(tmp_path):
+    write_run(tmp_path, 0, "v1.4.0", "release:2025.1", {"a": "pass"})
+    write_run(tmp_path, 1, "v1.3.0", "release:2025.1", {"a": "fail"})
+    results_dir = tmp_path / "test_results"
+    (tmp_path / "run0000").rename(results_dir)
+    # Left in the reused folder by an earlier invocation.
+    for stale in (tmp_path / "run0001").iterdir():
+        stale.rename(results_dir / stale.name)
+
+    archived = archive_run(
+        results_dir,
+        tmp_path / "history",
+        ["rust_results_v1.4.0.xml", "metadata_rust_results_v1.4.0.json"],
+    )
+
+    assert sorted(path.name for path in archived.iterdir()) == [
+        "metadata_rust_results_v1.4.0.json",
+        "rust_results_v1.4.0.xml",
+    ]
+    assert [run["tag"] for run in load_history(tmp_path / "history")] == ["v1.4.0"]
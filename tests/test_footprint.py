@@ -0,0 +1,60 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from footprint import ProcessSampler, _socket_inodes, compare_versions, sockets_per_node, summarize
+
+
+def test_connections_are_counted_per_remote_node():
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+        clients = [socket.create_connection(("127.0.0.1", port)) for _ in range(3)]
+        try:
+            _, inodes = _socket_inodes(os.getpid())
+            per_node = sockets_per_node(os.getpid(), inodes, ports=[port])
+        finally:
+            for client in clients:
+                client.close()
+
+    assert per_node == {"127.0.0.1": 3}
+
+
+def test_sampler_reports_peak_and_steady_state():
+    sampler = ProcessSampler(os.getpid(), interval=0.01).start()
+    ballast = [bytearray(1024 * 1024) for _ in range(20)]
+    time.sleep(0.2)
+    samples = sampler.stop()
+    del ballast
+
+    summary = summarize(samples + [dict(samples[-1], rss_bytes=10**12)])
+
+    assert len(samples) > 3
+    assert samples[0]["threads"] >= 2
+    assert summary["rss_bytes"]["peak"] == 10**12
+    assert summary["rss_bytes"]["steady"] < 10**12
+    comparison = compare_versions({"v1.8.0": summary, "v1.7.0": None})
+    assert list(comparison["threads"]) == ["v1.8.0"]
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnhandledThreadExceptionWarning")
+def test_sampler_stops_on_exited_process():
+    process = subprocess.Popen(["true"])
+    status = Path(f"/proc/{process.pid}/status")
+    # Not waited for yet, the process stays a zombie without VmRSS.
+    while "State:\tZ" not in status.read_text():
+        time.sleep(0.01)
+    try:
+        sampler = ProcessSampler(process.pid, interval=0.01).start()
+        time.sleep(0.05)
+        assert sampler.stop() == []
+    finally:
+        process.wait()
@@ -0,0 +1,157 @@
+import sys
+from pathlib import Path
+
+import yaml
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from ignore_rules import REGEX, IgnoreIndex, IgnoreRule, IgnoreRules, load_rules
+from processjunit import ProcessJUnit
+
+
+def write_yaml(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(yaml.safe_dump(content))
+
+
+def make_versions(tmp_path):
+    versions_dir = tmp_path / "versions"
+    write_yaml(
+        versions_dir / "ignore.yaml",
+        {
+            "rules": [
+                {
+                    "regex": r"load_balancing::tablets::.*",
+                    "scylla": "<2025.1",
+                    "reason": "tablets are not enabled",
+                }
+            ]
+        },
+    )
+    write_yaml(
+        versions_dir / "scylla" / "v1.2.0" / "ignore.yaml",
+        {
+            "tests": {
+                "ignore": ["session::exact_name"],
+                "version_ignore": {r"2024\.2\..*": ["types::vector"]},
+                "rules": [
+                    {"glob": "history::*", "inherit": True},
+                    {"glob": "metadata::*"},
+                ],
+            }
+        },
+    )
+    write_yaml(
+        versions_dir / "scylla" / "v1.4.0" / "ignore.yaml",
+        {"tests": {"rules": [{"exact": "retries::speculative", "driver": ">=1.3,<1.5"}]}},
+    )
+    return versions_dir
+
+
+def matched_rule(rules, driver_version, scylla_version, test_name):
+    rule = rules.index(driver_version, scylla_version).match(test_name)
+    return rule.rule_id if rule else None
+
+
+def test_rules_are_scoped_by_versions(tmp_path):
+    rules = IgnoreRules.load(make_versions(tmp_path))
+
+    assert matched_rule(rules, "v1.2.0", "release:2025.1", "session::exact_name") == (
+        "scylla/v1.2.0/ignore.yaml:ignore[0]"
+    )
+    assert matched_rule(rules, "v1.3.0", "release:2025.1", "session::exact_name") is None
+
+    assert matched_rule(rules, "v1.2.0", "2024.2.5", "types::vector") is not None
+    assert matched_rule(rules, "v1.2.0", "2025.1.0", "types::vector") is None
+
+    # Inherited by newer tags only
+    assert matched_rule(rules, "v1.8.0", "2025.1.0", "history::tracing") == (
+        "scylla/v1.2.0/ignore.yaml:rules[0]"
+    )
+    assert matched_rule(rules, "v1.1.0", "2025.1.0", "history::tracing") is None
+    assert matched_rule(rules, "v1.3.0", "2025.1.0", "metadata::schema") is None
+
+    assert matched_rule(rules, "v1.3.1", "2025.1.0", "retries::speculative") is not None
+    assert matched_rule(rules, "v1.5.0", "2025.1.0", "retries::speculative") is None
+
+    assert matched_rule(rules, "v1.8.0", "release:2024.2", "load_balancing::tablets::lwt") == (
+        "ignore.yaml:rules[0]"
+    )
+    assert matched_rule(rules, "v1.8.0", "release:2025.1", "load_balancing::tablets::lwt") is None
+
+
+def test_rules_are_reloaded_only_when_files_change(tmp_path):
+    versions_dir = make_versions(tmp_path)
+    rules = load_rules(versions_dir)
+    assert load_rules(versions_dir) is rules
+
+    write_yaml(versions_dir / "scylla" / "v1.8.0" / "ignore.yaml", {"tests": {"ignore": ["a"]}})
+    assert load_rules(versions_dir) is not rules
+
+
+def test_repository_ignore_files_are_valid():
+    assert IgnoreRules.load(REPO_ROOT / "versions").rules
+
+
+def test_junit_report_names_matching_rules(tmp_path):
+    rules = IgnoreRules.load(make_versions(tmp_path))
+    junit = tmp_path / "junit.xml"
+    junit.write_text(
+        "<testsuites tests='3' failures='2' errors='0' time='1.0'>"
+        "<testsuite name='scylla' tests='3' failures='2' errors='0' time='1.0'>"
+        "<testcase name='history::tracing' classname='scylla'><failure/></testcase>"
+        "<testcase name='session::other' classname='scylla'><failure/></testcase>"
+        "<testcase name='session::exact_name' classname='scylla'/>"
+        "</testsuite></testsuites>"
+    )
+
+    report = ProcessJUnit(junit, "v1.2.0", rules.index("v1.2.0", "release:2025.1"))
+    report.process()
+
+    assert report.ignored_failures == {
+        "history::tracing": "scylla/v1.2.0/ignore.yaml:rules[0]"
+    }
+    assert report.unmatched_rules == ["scylla/v1.2.0/ignore.yaml:rules[1]"]
+    assert report.summary["testsuite_summary"]["failures"] == 1
+    assert report.summary["testsuite_summary"]["ignored_on_failure"] == 1
+
+
+def test_regex_rules_with_groups_are_matched_separately():
+    index = IgnoreIndex(
+        [
+            IgnoreRule("first", r"(?P<kind>session)::a", kind=REGEX),
+            IgnoreRule("second", r"(?P<kind>history)::b", kind=REGEX),
+            IgnoreRule("repeated", r"(a+)::\1", kind=REGEX),
+            IgnoreRule("plain", r"types::.*", kind=REGEX),
+        ]
+    )
+
+    assert index.match("session::a").rule_id == "first"
+    assert index.match("history::b").rule_id == "second"
+    assert index.match("aa::aa").rule_id == "repeated"
+    assert index.match("aa::a") is None
+    assert index.match("types::vector").rule_id == "plain"
+
+
+def test_duplicate_rules_are_all_matched(tmp_path):
+    index = IgnoreIndex(
+        [
+            IgnoreRule("first", "session::exact_name"),
+            IgnoreRule("second", "session::exact_name"),
+        ]
+    )
+    junit = tmp_path / "junit.xml"
+    junit.write_text(
+        "<testsuites tests='1' failures='1' errors='0' time='1.0'>"
+        "<testsuite name='scylla' tests='1' failures='1' errors='0' time='1.0'>"
+        "<testcase name='session::exact_name' classname='scylla'><failure/></testcase>"
+        "</testsuite></testsuites>"
+    )
+
+    report = ProcessJUnit(junit, "v1.2.0", index)
+    report.process()
+
+    assert report.ignored_failures == {"session::exact_name": "first"}
+    assert report.unmatched_rules == []
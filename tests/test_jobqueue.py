@@ -0,0 +1,87 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+import jobqueue
+from jobqueue import DONE, FAILED, JobQueue, expand_matrix, merge_results, work
+
+
+def fake_execute(job, work_dir):
+    if job["driver_version"] == "v0.0.1":
+        raise RuntimeError("cannot checkout")
+    (work_dir / "test_results").mkdir(parents=True, exist_ok=True)
+    (work_dir / "test_results" / f"shard{job['shard']}.xml").write_text("<testsuites/>")
+    time.sleep(0.05)
+    stats = {"time": 1.25, "tests": 10, "errors": 0, "failures": job["shard"] - 1, "skipped": 0, "ignored_on_failure": 0}
+    return {"summary": {"testsuite_summary": stats, "scylla": dict(stats)}, "is_failed": job["shard"] > 1}
+
+
+def run_worker(queue_path, worker, shared):
+    work(Path(queue_path), worker, fake_execute, lease_seconds=30, poll_interval=0.05, shared=shared)
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_jobs_are_distributed_between_worker_processes_and_merged(tmp_path, shared):
+    queue_path = tmp_path / "queue.sqlite"
+    queue = JobQueue(queue_path, shared=shared)
+    queue.enqueue(expand_matrix(["v1.8.0", "v1.7.0", "v0.0.1"], ["release:2025.1"], ["rust"], shards=2))
+    queue.enqueue(expand_matrix(["v1.8.0"], ["release:2025.1"], ["rust"], shards=2))
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=run_worker, args=(str(queue_path), f"worker{i}", shared)) for i in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    jobs = queue.jobs()
+    assert len(jobs) == 6
+    assert queue.is_drained()
+    assert sorted(job["state"] for job in jobs) == [DONE] * 4 + [FAILED] * 2
+    assert all(job["attempts"] == 1 for job in jobs)
+    assert len(list((queue.artifacts_dir).glob("*/test_results/*.xml"))) == 4
+
+    results, status = merge_results(jobs)
+    assert status == 1
+    assert results["v1.8.0"]["rust"]["testsuite_summary"]["tests"] == 20
+    assert results["v1.8.0"]["rust"]["testsuite_summary"]["failures"] == 1
+    # Shards run in parallel, the cell takes as long as its longest shard.
+    assert results["v1.8.0"]["rust"]["time"] == "0:00:01.250"
+    assert results["v1.8.0"]["rust"]["testsuite_summary"]["total_time"] == 2.5
+    assert "cannot checkout" in "".join(results["v0.0.1"]["exception"])
+
+
+def test_expired_lease_is_handed_out_again(tmp_path):
+    queue = JobQueue(tmp_path / "queue.sqlite", max_attempts=2)
+    queue.enqueue(expand_matrix(["v1.8.0"], ["release:2025.1"], ["rust"]))
+
+    first = queue.claim("dead-worker", lease_seconds=-1)
+    second = queue.claim("live-worker", lease_seconds=60)
+
+    assert first["id"] == second["id"]
+    assert not queue.finish(first["id"], "dead-worker", DONE, {})
+    assert queue.finish(second["id"], "live-worker", DONE, {"summary": {}})
+    assert json.loads(queue.jobs()[0]["result"]) == {"summary": {}}
+
+
+def test_stale_lock_of_shared_queue_is_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobqueue, "STALE_LOCK_SECONDS", 1)
+    queue = JobQueue(tmp_path / "queue.sqlite", shared=True)
+    lock = tmp_path / "queue.sqlite.lock"
+    lock.write_text("dead-host 1\n")
+    os.utime(lock, (time.time() - 10, time.time() - 10))
+
+    queue.enqueue(expand_matrix(["v1.8.0"], ["release:2025.1"], ["rust"]))
+
+    assert not lock.exists()
+    assert len(queue.jobs()) == 1
@@ -0,0 +1,63 @@
+import subprocess
+import sys
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from patched_refs import REF_NAMESPACE, patched_ref
+
+
+def git(repo, *args):
+    return subprocess.check_output(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@localhost", *args],
+        cwd=repo,
+        text=True,
+    ).strip()
+
+
+def make_repo(tmp_path):
+    repo = tmp_path / "driver"
+    repo.mkdir()
+    git(repo, "init", "-q")
+    (repo / "lib.rs").write_text("fn main() {\n    old();\n}\n")
+    git(repo, "add", "lib.rs")
+    git(repo, "commit", "-q", "-m", "initial")
+    git(repo, "tag", "v1.0.0")
+    return repo
+
+
+def write_patch(path, old, new):
+    path.write_text(
+        "--- a/lib.rs\n+++ b/lib.rs\n@@ -1,3 +1,3 @@\n fn main() {\n"
+        f"-    {old}();\n+    {new}();\n }}\n"
+    )
+    return path
+
+
+def test_patched_tree_is_committed_once_without_touching_worktree(tmp_path):
+    repo = make_repo(tmp_path)
+    patch = write_patch(tmp_path / "fix.patch", "old", "new")
+
+    ref = patched_ref("v1.0.0", [patch], cwd=repo)
+
+    assert ref.startswith(f"{REF_NAMESPACE}/v1.0.0/")
+    assert "new();" in git(repo, "show", f"{ref}:lib.rs")
+    assert "old();" in (repo / "lib.rs").read_text()
+    assert git(repo, "status", "--porcelain") == ""
+
+    commit = git(repo, "rev-parse", ref)
+    (tmp_path / "fix.patch").touch()
+    assert patched_ref("v1.0.0", [patch], cwd=repo) == ref
+    assert git(repo, "rev-parse", ref) == commit
+
+
+def test_changed_patch_set_replaces_the_ref(tmp_path):
+    repo = make_repo(tmp_path)
+    first = patched_ref("v1.0.0", [write_patch(tmp_path / "a.patch", "old", "new")], cwd=repo)
+    second = patched_ref("v1.0.0", [write_patch(tmp_path / "a.patch", "old", "other")], cwd=repo)
+
+    assert first != second
+    assert git(repo, "for-each-ref", "--format=%(refname)", REF_NAMESPACE) == second
+    assert patched_ref("v1.0.0", [], cwd=repo) == "v1.0.0"
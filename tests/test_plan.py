@@ -0,0 +1,60 @@
+import json
+import sys
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from plan import build_plan, junit_duration
+
+
+def write_versions(versions_dir):
+    version_folder = versions_dir / "scylla" / "v1.1.0"
+    version_folder.mkdir(parents=True)
+    (version_folder / "ignore.yaml").write_text("tests:\n  ignore:\n    - session::test_a\n")
+    (version_folder / "02-second.patch").write_text("")
+    (version_folder / "01-first.patch").write_text("")
+
+
+def test_plan_from_earlier_results(tmp_path):
+    versions_dir = tmp_path / "versions"
+    write_versions(versions_dir)
+    results_dir = tmp_path / "test_results"
+    results_dir.mkdir()
+    (results_dir / "rust_results_v1.1.0.xml").write_text(
+        '<?xml version="1.0"?>\n<testsuites name="matrix" tests="2" time="600.5">'
+        '<testsuite name="a"/></testsuites>'
+    )
+    stats_dir = tmp_path / "build_stats"
+    stats_dir.mkdir()
+    (stats_dir / "v1.1.0.jsonl").write_text(json.dumps({"wall_time_s": 100.0}) + "\n")
+
+    plan = build_plan(
+        ["v1.1.0", "v1.0.0"],
+        ["rust"],
+        "2025.1.0",
+        results_dir=results_dir,
+        versions_dir=versions_dir,
+        stats_dir=stats_dir,
+        topology="3",
+    )
+
+    first, second = plan["versions"]
+    assert first["patches"] == ["01-first.patch", "02-second.patch"]
+    assert first["ignore_rules"] == ["scylla/v1.1.0/ignore.yaml:ignore[0]"]
+    assert (first["test_duration_s"], first["build_duration_s"]) == (600.5, 100.0)
+    assert second == dict(
+        tag="v1.0.0", patches=[], ignore_rules=[], test_duration_s=None, build_duration_s=None
+    )
+    # The version without results is expected to take as long as the others.
+    assert plan["expected_duration_s"] == 2 * 700.5
+    assert plan["topology"] == "3"
+    json.dumps(plan)
+
+
+def test_junit_duration_of_broken_file(tmp_path):
+    junit = tmp_path / "junit.xml"
+    junit.write_text("<testsuites")
+    assert junit_duration(junit) is None
+    assert junit_duration(tmp_path / "missing.xml") is None
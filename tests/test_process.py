@@ -0,0 +1,66 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from process import ProcessError, ProcessTimeout, run_command, run_commands_concurrently
+
+
+def test_output_is_streamed_to_log_file_and_bounded_tail(tmp_path):
+    log_file = tmp_path / "logs" / "phase.log"
+
+    result = run_command(
+        ["bash", "-c", "for i in $(seq 1 100); do echo out$i; done; echo err >&2; exit 3"],
+        log_file=log_file,
+        tail_lines=5,
+    )
+
+    assert result.returncode == 3
+    assert len(result.tail) == 5
+    assert "[stderr] err" in result.tail
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 101
+    assert lines[0] == "out1"
+    with pytest.raises(ProcessError, match="exit code 3"):
+        result.check()
+
+
+def test_timeout_terminates_the_whole_process_group():
+    start = time.monotonic()
+    result = run_command(
+        ["bash", "-c", "sleep 30 & trap '' TERM; sleep 30"],
+        timeout=0.5,
+        kill_grace=0.5,
+    )
+
+    assert result.timed_out
+    assert time.monotonic() - start < 10
+    with pytest.raises(ProcessTimeout):
+        result.check()
+
+
+def test_output_held_by_daemonized_children_is_detached():
+    start = time.monotonic()
+    result = run_command(
+        ["bash", "-c", "echo started; sleep 30 & exit 0"],
+        drain_timeout=0.5,
+    )
+
+    assert result.returncode == 0
+    assert result.tail == ["started"]
+    assert time.monotonic() - start < 10
+
+
+def test_independent_commands_run_concurrently():
+    start = time.monotonic()
+    results = run_commands_concurrently(
+        dict(args=["sleep", "0.5"]) for _ in range(4)
+    )
+
+    assert [result.returncode for result in results] == [0] * 4
+    assert time.monotonic() - start < 1.5
@@ -0,0 +1,123 @@
+import json
+import socketserver
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from email_sender import split_smtp_server
+from reporting import IncrementalReport
+
+
+class SMTPStandIn(socketserver.StreamRequestHandler):
+    """Accepts mail without authentication and keeps the messages in memory."""
+
+    messages = []
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 stand-in")
+        while line := self.rfile.readline().decode():
+            command = line.strip().upper()
+            if command.startswith("DATA"):
+                self.reply("354 go ahead")
+                data = []
+                while (line := self.rfile.readline().decode()) != ".\r\n":
+                    data.append(line)
+                self.messages.append("".join(data))
+                self.reply("250 queued")
+            elif command.startswith("QUIT"):
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server():
+    SMTPStandIn.messages = []
+    with socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPStandIn) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield f"127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+
+
+def summary(failures):
+    return {"testsuite_summary": {"tests": 2, "failures": failures, "errors": 0}}
+
+
+def test_results_are_written_after_every_cell(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKSPACE", str(tmp_path))
+    reporter = IncrementalReport(tmp_path / "test_results", cells_total=2)
+
+    results = {"v1.1.0": {"rust": summary(0)}}
+    reporter.cell_finished("v1.1.0", "rust", False, results, 0)
+    report = json.loads(reporter.results_file.read_text())
+    assert report["progress"] == {"done": 1, "total": 2, "complete": False}
+    assert report["results"] == results
+
+    results["v1.0.0"] = {"rust": summary(1)}
+    reporter.cell_finished("v1.0.0", "rust", True, results, 1)
+    reporter.finish(results, 1)
+    report = json.loads(reporter.results_file.read_text())
+    assert report["status"] == "FAILED"
+    assert report["progress"]["complete"]
+    assert report["first_failure"]["driver_version"] == "v1.0.0"
+
+
+def test_partial_report_has_the_first_failure(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKSPACE", str(tmp_path))
+    reporter = IncrementalReport(tmp_path, cells_total=3)
+
+    reporter.cell_finished("v1.1.0", "rust", False, {"v1.1.0": {"rust": summary(0)}}, 0)
+    assert json.loads(reporter.results_file.read_text())["first_failure"] is None
+    reporter.cell_finished("v1.0.0", "rust", True, {"v1.0.0": {"rust": summary(1)}}, 1)
+
+    report = json.loads(reporter.results_file.read_text())
+    assert report["first_failure"]["driver_version"] == "v1.0.0"
+    assert not report["progress"]["complete"]
+
+
+@pytest.mark.parametrize("address", ["localhost", "localhost:", ":25", "localhost:smtp", "host:70000"])
+def test_smtp_server_must_have_host_and_port(address):
+    with pytest.raises(ValueError):
+        split_smtp_server(address)
+    assert split_smtp_server("relay.example.com:2525") == ("relay.example.com", 2525)
+
+
+def test_report_is_rendered(tmp_path, monkeypatch):
+    pytest.importorskip("jinja2")
+    monkeypatch.setenv("WORKSPACE", str(tmp_path))
+    reporter = IncrementalReport(tmp_path, cells_total=2)
+    reporter.cell_finished("v1.1.0", "rust", False, {"v1.1.0": {"rust": summary(0)}}, 0)
+    assert "1 of 2 matrix cells finished" in reporter.report_file.read_text()
+
+
+def test_first_failure_is_notified_once(tmp_path, monkeypatch, smtp_server):
+    monkeypatch.setenv("WORKSPACE", str(tmp_path))
+    reporter = IncrementalReport(
+        tmp_path,
+        cells_total=3,
+        recipients=["dev@localhost"],
+        notify_first_failure=True,
+        smtp_server=smtp_server,
+    )
+    results = {"v1.1.0": {"rust": summary(0)}}
+    reporter.cell_finished("v1.1.0", "rust", False, results, 0)
+    assert not SMTPStandIn.messages
+
+    results["v1.0.0"] = {"exception": ["Traceback"]}
+    reporter.cell_finished("v1.0.0", "rust", True, results, 1)
+    results["v0.15.0"] = {"rust": summary(2)}
+    reporter.cell_finished("v0.15.0", "rust", True, results, 1)
+
+    assert len(SMTPStandIn.messages) == 1
+    assert "driver v1.0.0 (rust)" in SMTPStandIn.messages[0]
+    assert "2 of 3 matrix cells are finished" in SMTPStandIn.messages[0]
@@ -0,0 +1,87 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import yaml
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from selection import MAPPING_FILE, file_expression, select_tests
+
+
+PACKAGES = {"scylla": "scylla", "scylla-cql": "scylla-cql"}
+MAPPING = {
+    "full": ["Cargo.lock"],
+    "unaffected": ["*.md"],
+    "paths": {"scylla/src/policies/retry/*": "test(/retr/)"},
+    "smoke": ["test(/^session::/)"],
+}
+
+
+def git(repo, *args):
+    subprocess.check_call(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@localhost", *args],
+        cwd=repo,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def write(repo, path, content):
+    (repo / path).parent.mkdir(parents=True, exist_ok=True)
+    (repo / path).write_text(content)
+
+
+def test_changed_files_map_to_expressions():
+    assert file_expression("Cargo.lock", MAPPING, PACKAGES) == "all()"
+    assert file_expression("README.md", MAPPING, PACKAGES) is None
+    assert file_expression("scylla/src/policies/retry/default.rs", MAPPING, PACKAGES) == (
+        "(test(/retr/))"
+    )
+    assert file_expression("scylla-cql/src/frame/mod.rs", MAPPING, PACKAGES) == (
+        "rdeps(scylla-cql)"
+    )
+    assert file_expression(
+        "scylla/tests/integration/load_balancing/tablets.rs", MAPPING, PACKAGES
+    ) == "binary_id(scylla::integration) & test(/^load_balancing::tablets::/)"
+    assert file_expression("scylla/tests/integration/main.rs", MAPPING, PACKAGES) == (
+        "binary_id(scylla::integration)"
+    )
+    assert file_expression("scripts/release.sh", MAPPING, PACKAGES) is None
+
+
+def test_maintained_mapping_is_valid():
+    mapping = yaml.safe_load(MAPPING_FILE.read_text())
+    assert mapping["smoke"]
+    assert all(isinstance(expression, str) for expression in mapping["paths"].values())
+
+
+def test_select_tests_between_refs(tmp_path):
+    repo = tmp_path / "driver"
+    repo.mkdir()
+    mapping_file = tmp_path / "mapping.yaml"
+    mapping_file.write_text(yaml.safe_dump(MAPPING))
+    git(repo, "init", "-q")
+    write(repo, "Cargo.toml", '[workspace]\nmembers = ["scylla", "scylla-cql"]\n')
+    write(repo, "scylla/Cargo.toml", '[package]\nname = "scylla"\n')
+    write(repo, "scylla-cql/Cargo.toml", '[package]\nname = "scylla-cql"\n')
+    write(repo, "scylla-cql/src/lib.rs", "")
+    write(repo, "README.md", "")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "initial")
+    git(repo, "tag", "v1.0.0")
+
+    write(repo, "scylla-cql/src/lib.rs", "// changed")
+    write(repo, "README.md", "changed")
+    git(repo, "commit", "-q", "-am", "change")
+
+    selection = select_tests("v1.0.0", "HEAD", mapping_file, cwd=repo)
+    assert selection.partial
+    assert selection.filter_expr == "(rdeps(scylla-cql)) | (test(/^session::/))"
+    assert selection.as_dict()["reasons"] == {"rdeps(scylla-cql)": ["scylla-cql/src/lib.rs"]}
+
+    write(repo, "Cargo.lock", "")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "lock")
+    assert not select_tests("v1.0.0", "HEAD", mapping_file, cwd=repo).partial
@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from common import scylla_uri_per_node
+from topology import Topology
+
+
+def test_uri_mapping_is_unique_for_large_clusters():
+    nodes_ips = {f"node{i}": f"127.0.1.{i}" for i in range(1, 13)}
+
+    env = dict(item.split("=") for item in scylla_uri_per_node(nodes_ips).split())
+
+    assert len(env) == 12
+    assert env["SCYLLA_URI"] == "127.0.1.1:9042"
+    assert env["SCYLLA_URI2"] == "127.0.1.2:9042"
+    assert env["SCYLLA_URI11"] == "127.0.1.11:9042"
+
+
+def test_multi_dc_topology_with_racks_and_smp():
+    topology = Topology.parse("dc1:2+1,3;smp=2;smp.node4=4")
+
+    assert topology.node_count == 6
+    assert topology.dc_node_counts() == [3, 3]
+    assert topology.nodes()[2] == ("node3", "dc1", "rack2")
+    assert topology.nodes()[3] == ("node4", "dc2", "rack1")
+    assert topology.smp_for("node1") == 2
+    assert topology.smp_for("node4") == 4
+    assert topology.as_dict()["datacenters"] == {
+        "dc1": {"rack1": 2, "rack2": 1},
+        "dc2": {"rack1": 3},
+    }
+    assert Topology.parse(str(topology)).as_dict() == topology.as_dict()
+
+
+@pytest.mark.parametrize("spec", ["", "0", "3,x", "dc2:3", "3;smp=a", "3;smp.node7=2"])
+def test_invalid_topology_is_rejected(spec):
+    with pytest.raises(ValueError):
+        Topology.parse(spec)
@@ -0,0 +1,105 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+class Topology:
+    """Layout of the test cluster: nodes per datacenter and rack, plus Scylla SMP.
+
+    The textual form used on the command line is::
+
+        <dc>[,<dc>...][;smp=<n>][;smp.<node>=<n>...]
+
+    where every ``<dc>`` is ``[dcN:]<nodes in rack1>[+<nodes in rack2>...]``.
+    Datacenters are named ``dc1``, ``dc2``... by ccm in the order they are given,
+    racks are named ``rack1``, ``rack2``... and nodes are numbered across the
+    whole cluster, e.g. ``2+1,3;smp=2;smp.node4=4`` is a 6 nodes cluster with
+    dc1 split into two racks and node4 (first node of dc2) running 4 shards.
+    """
+
+    def __init__(
+        self,
+        racks_per_dc: List[List[int]],
+        smp: Optional[int] = None,
+        node_smp: Optional[Dict[str, int]] = None,
+    ) -> None:
+        if not racks_per_dc or any(
+            not racks or any(count < 1 for count in racks) for racks in racks_per_dc
+        ):
+            raise ValueError(f"Invalid topology layout: {racks_per_dc}")
+        self.racks_per_dc = racks_per_dc
+        self.smp = smp
+        self.node_smp = node_smp or {}
+        unknown_nodes = set(self.node_smp) - {name for name, _, _ in self.nodes()}
+        if unknown_nodes:
+            raise ValueError(f"SMP set for nodes not in topology: {sorted(unknown_nodes)}")
+
+    @classmethod
+    def uniform(cls, nodes: int) -> "Topology":
+        return cls([[nodes]])
+
+    @classmethod
+    def parse(cls, spec: str) -> "Topology":
+        layout, *options = [part.strip() for part in spec.split(";")]
+        racks_per_dc = []
+        for index, dc_spec in enumerate(layout.split(","), start=1):
+            name, _, racks = dc_spec.strip().rpartition(":")
+            if name and name != f"dc{index}":
+                raise ValueError(
+                    f"Datacenter #{index} must be named 'dc{index}' (ccm naming), got '{name}'"
+                )
+            if not re.fullmatch(r"\d+(\+\d+)*", racks):
+                raise ValueError(f"Invalid datacenter spec '{dc_spec}' in topology '{spec}'")
+            racks_per_dc.append([int(count) for count in racks.split("+")])
+
+        smp = None
+        node_smp = {}
+        for option in options:
+            if match := re.fullmatch(r"smp=(\d+)", option):
+                smp = int(match.group(1))
+            elif match := re.fullmatch(r"smp\.(node\d+)=(\d+)", option):
+                node_smp[match.group(1)] = int(match.group(2))
+            else:
+                raise ValueError(f"Unknown topology option '{option}' in '{spec}'")
+        return cls(racks_per_dc, smp=smp, node_smp=node_smp)
+
+    @property
+    def node_count(self) -> int:
+        return sum(self.dc_node_counts())
+
+    def dc_node_counts(self) -> List[int]:
+        return [sum(racks) for racks in self.racks_per_dc]
+
+    def nodes(self) -> List[Tuple[str, str, str]]:
+        """(node name, datacenter, rack) for every node, in ccm numbering order."""
+        result = []
+        for dc_index, racks in enumerate(self.racks_per_dc, start=1):
+            for rack_index, count in enumerate(racks, start=1):
+                for _ in range(count):
+                    result.append(
+                        (f"node{len(result) + 1}", f"dc{dc_index}", f"rack{rack_index}")
+                    )
+        return result
+
+    def smp_for(self, node_name: str) -> Optional[int]:
+        return self.node_smp.get(node_name, self.smp)
+
+    def as_dict(self) -> Dict:
+        return {
+            "spec": str(self),
+            "nodes": self.node_count,
+            "datacenters": {
+                f"dc{dc_index}": {
+                    f"rack{rack_index}": count
+                    for rack_index, count in enumerate(racks, start=1)
+                }
+                for dc_index, racks in enumerate(self.racks_per_dc, start=1)
+            },
+            "smp": {name: self.smp_for(name) for name, _, _ in self.nodes()},
+        }
+
+    def __str__(self) -> str:
+        parts = [",".join("+".join(map(str, racks)) for racks in self.racks_per_dc)]
+        if self.smp is not None:
+            parts.append(f"smp={self.smp}")
+        parts.extend(f"smp.{name}={smp}" for name, smp in sorted(self.node_smp.items()))
+        return ";".join(parts)
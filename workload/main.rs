@@ -0,0 +1,390 @@
+//! Fixed driver workload used by the matrix `bench` and `profile` modes.
+//!
+//! The matrix builds this file against the checked out driver tree, so it has
+//! to stick to the API shared by all tested driver versions.
+//!
+//! Every measured run prints one JSON line to stdout.
+
+use std::env;
+use std::error::Error;
+use std::future::Future;
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::Arc;
+use std::time::{Duration, Instant};
+
+use futures::StreamExt;
+use scylla::client::session::Session;
+use scylla::client::session_builder::SessionBuilder;
+use scylla::statement::batch::Batch;
+
+const KEYSPACE: &str = "matrix_workload";
+const PAYLOAD_SIZE: usize = 100;
+const BATCH_SIZE: u64 = 10;
+const SCAN_PAGE_SIZE: i32 = 100;
+
+struct Options {
+    uri: String,
+    mode: String,
+    ops: u64,
+    iterations: u32,
+    concurrency: Vec<usize>,
+    duration: Duration,
+    partitions: u64,
+    replication_factor: u32,
+}
+
+fn parse_options() -> Options {
+    let mut options = Options {
+        uri: env::var("SCYLLA_URI").unwrap_or_else(|_| "127.0.0.1:9042".to_string()),
+        mode: "bench".to_string(),
+        ops: 20_000,
+        iterations: 5,
+        concurrency: vec![1, 16, 128],
+        duration: Duration::from_secs(60),
+        partitions: 1_000,
+        replication_factor: 3,
+    };
+    let args: Vec<String> = env::args().skip(1).collect();
+    for pair in args.chunks(2) {
+        let value = pair
+            .get(1)
+            .unwrap_or_else(|| panic!("Missing value of option {}", pair[0]));
+        match pair[0].as_str() {
+            "--uri" => options.uri = value.clone(),
+            "--mode" => options.mode = value.clone(),
+            "--ops" => options.ops = value.parse().expect("Invalid --ops"),
+            "--iterations" => options.iterations = value.parse().expect("Invalid --iterations"),
+            "--concurrency" => {
+                options.concurrency = value
+                    .split(',')
+                    .map(|level| level.parse().expect("Invalid --concurrency"))
+                    .collect()
+            }
+            "--duration-secs" => {
+                options.duration =
+                    Duration::from_secs(value.parse().expect("Invalid --duration-secs"))
+            }
+            "--partitions" => options.partitions = value.parse().expect("Invalid --partitions"),
+            "--replication-factor" => {
+                options.replication_factor = value.parse().expect("Invalid --replication-factor")
+            }
+            other => panic!("Unknown option {other}"),
+        }
+    }
+    options
+}
+
+/// Sub-buckets per power of two of the latency histogram (~3% precision).
+const SUB_BUCKET_BITS: u32 = 5;
+const SUB_BUCKETS: u64 = 1 << SUB_BUCKET_BITS;
+const BUCKETS: usize = ((64 - SUB_BUCKET_BITS + 1) as u64 * SUB_BUCKETS) as usize;
+
+/// Fixed-size HDR-style latency histogram (microseconds), so a workload running
+/// until a deadline takes the same memory however many operations it does.
+struct Histogram {
+    counts: Vec<u64>,
+    total: u64,
+    max: u64,
+}
+
+impl Histogram {
+    fn new() -> Self {
+        Histogram {
+            counts: vec![0; BUCKETS],
+            total: 0,
+            max: 0,
+        }
+    }
+
+    fn index(micros: u64) -> usize {
+        if micros < SUB_BUCKETS {
+            return micros as usize;
+        }
+        let shift = 63 - micros.leading_zeros() - SUB_BUCKET_BITS;
+        ((shift as u64 + 1) * SUB_BUCKETS + (micros >> shift) - SUB_BUCKETS) as usize
+    }
+
+    fn lower_bound(index: usize) -> u64 {
+        let index = index as u64;
+        if index < SUB_BUCKETS {
+            return index;
+        }
+        (SUB_BUCKETS + index % SUB_BUCKETS) << (index / SUB_BUCKETS - 1)
+    }
+
+    fn record(&mut self, micros: u64) {
+        self.counts[Self::index(micros)] += 1;
+        self.total += 1;
+        self.max = self.max.max(micros);
+    }
+
+    fn merge(&mut self, other: &Histogram) {
+        for (count, other_count) in self.counts.iter_mut().zip(&other.counts) {
+            *count += other_count;
+        }
+        self.total += other.total;
+        self.max = self.max.max(other.max);
+    }
+
+    fn percentile(&self, p: f64) -> u64 {
+        if self.total == 0 {
+            return 0;
+        }
+        let rank = ((self.total - 1) as f64 * p).round() as u64;
+        let mut seen = 0;
+        for (index, &count) in self.counts.iter().enumerate() {
+            seen += count;
+            if seen > rank {
+                return Self::lower_bound(index).min(self.max);
+            }
+        }
+        self.max
+    }
+
+    fn json(&self) -> String {
+        let histogram = self
+            .counts
+            .iter()
+            .enumerate()
+            .filter(|(_, &count)| count > 0)
+            .map(|(index, count)| format!("[{},{count}]", Self::lower_bound(index)))
+            .collect::<Vec<_>>()
+            .join(",");
+        format!(
+            "\"latency_us\":{{\"p50\":{},\"p90\":{},\"p99\":{},\"p999\":{},\"max\":{}}},\"histogram\":[{}]",
+            self.percentile(0.5),
+            self.percentile(0.9),
+            self.percentile(0.99),
+            self.percentile(0.999),
+            self.max,
+            histogram
+        )
+    }
+}
+
+struct ScenarioResult {
+    elapsed: Duration,
+    latencies: Histogram,
+    errors: u64,
+}
+
+/// Runs `ops` operations (or until `deadline`) spread over `concurrency` tasks.
+async fn run_scenario<F, Fut>(
+    session: &Arc<Session>,
+    concurrency: usize,
+    ops: u64,
+    deadline: Option<Instant>,
+    op: F,
+) -> ScenarioResult
+where
+    F: Fn(Arc<Session>, u64) -> Fut + Send + Sync + 'static,
+    Fut: Future<Output = Result<(), String>> + Send + 'static,
+{
+    let op = Arc::new(op);
+    let counter = Arc::new(AtomicU64::new(0));
+    let start = Instant::now();
+    let mut handles = Vec::with_capacity(concurrency);
+    for _ in 0..concurrency {
+        let (op, counter, session) = (op.clone(), counter.clone(), session.clone());
+        handles.push(tokio::spawn(async move {
+            let mut latencies = Histogram::new();
+            let mut errors = 0;
+            loop {
+                let index = counter.fetch_add(1, Ordering::Relaxed);
+                if index >= ops || deadline.is_some_and(|deadline| Instant::now() >= deadline) {
+                    break;
+                }
+                let op_start = Instant::now();
+                if op(session.clone(), index).await.is_err() {
+                    errors += 1;
+                }
+                latencies.record(op_start.elapsed().as_micros() as u64);
+            }
+            (latencies, errors)
+        }));
+    }
+    let mut result = ScenarioResult {
+        elapsed: Duration::ZERO,
+        latencies: Histogram::new(),
+        errors: 0,
+    };
+    for handle in handles {
+        let (latencies, errors) = handle.await.expect("Workload task panicked");
+        result.latencies.merge(&latencies);
+        result.errors += errors;
+    }
+    result.elapsed = start.elapsed();
+    result
+}
+
+fn report(scenario: &str, concurrency: usize, iteration: u32, result: ScenarioResult) {
+    println!(
+        "{{\"scenario\":\"{}\",\"concurrency\":{},\"iteration\":{},\"ops\":{},\"errors\":{},\"duration_s\":{:.6},{}}}",
+        scenario,
+        concurrency,
+        iteration,
+        result.latencies.total,
+        result.errors,
+        result.elapsed.as_secs_f64(),
+        result.latencies.json()
+    );
+}
+
+#[tokio::main]
+async fn main() -> Result<(), Box<dyn Error>> {
+    let options = parse_options();
+    let session: Arc<Session> = Arc::new(
+        SessionBuilder::new()
+            .known_node(&options.uri)
+            .build()
+            .await?,
+    );
+
+    session
+        .query_unpaged(
+            format!(
+                "CREATE KEYSPACE IF NOT EXISTS {KEYSPACE} WITH replication = \
+                 {{'class': 'NetworkTopologyStrategy', 'replication_factor': {}}}",
+                options.replication_factor
+            ),
+            (),
+        )
+        .await?;
+    session
+        .query_unpaged(
+            format!(
+                "CREATE TABLE IF NOT EXISTS {KEYSPACE}.kv (pk bigint, ck bigint, v text, PRIMARY KEY (pk, ck))"
+            ),
+            (),
+        )
+        .await?;
+    session.await_schema_agreement().await?;
+
+    let insert = Arc::new(
+        session
+            .prepare(format!("INSERT INTO {KEYSPACE}.kv (pk, ck, v) VALUES (?, ?, ?)"))
+            .await?,
+    );
+    let select = Arc::new(
+        session
+            .prepare(format!("SELECT v FROM {KEYSPACE}.kv WHERE pk = ? AND ck = ?"))
+            .await?,
+    );
+    let mut scan = session
+        .prepare(format!("SELECT pk, ck, v FROM {KEYSPACE}.kv WHERE pk = ?"))
+        .await?;
+    scan.set_page_size(SCAN_PAGE_SIZE);
+    let scan = Arc::new(scan);
+    let mut batch = Batch::default();
+    for _ in 0..BATCH_SIZE {
+        batch.append_statement((*insert).clone());
+    }
+    let batch = Arc::new(batch);
+    let payload = Arc::new("x".repeat(PAYLOAD_SIZE));
+    let partitions = options.partitions;
+
+    let insert_op = {
+        let (insert, payload) = (insert.clone(), payload.clone());
+        move |session: Arc<Session>, index: u64| {
+            let (insert, payload) = (insert.clone(), payload.clone());
+            async move {
+                session
+                    .execute_unpaged(
+                        &insert,
+                        ((index % partitions) as i64, index as i64, payload.as_str()),
+                    )
+                    .await
+                    .map(|_| ())
+                    .map_err(|err| err.to_string())
+            }
+        }
+    };
+    let select_op = {
+        let select = select.clone();
+        move |session: Arc<Session>, index: u64| {
+            let select = select.clone();
+            async move {
+                session
+                    .execute_unpaged(&select, ((index % partitions) as i64, index as i64))
+                    .await
+                    .map(|_| ())
+                    .map_err(|err| err.to_string())
+            }
+        }
+    };
+    let scan_op = move |session: Arc<Session>, index: u64| {
+        let scan = scan.clone();
+        async move {
+            let mut rows = session
+                .execute_iter((*scan).clone(), ((index % partitions) as i64,))
+                .await
+                .map_err(|err| err.to_string())?
+                .rows_stream::<(i64, i64, String)>()
+                .map_err(|err| err.to_string())?;
+            while let Some(row) = rows.next().await {
+                row.map_err(|err| err.to_string())?;
+            }
+            Ok(())
+        }
+    };
+    let batch_op = {
+        let payload = payload.clone();
+        move |session: Arc<Session>, index: u64| {
+            let (batch, payload) = (batch.clone(), payload.clone());
+            async move {
+                let values: Vec<(i64, i64, &str)> = (0..BATCH_SIZE)
+                    .map(|offset| {
+                        (
+                            (index % partitions) as i64,
+                            (index * BATCH_SIZE + offset) as i64,
+                            payload.as_str(),
+                        )
+                    })
+                    .collect();
+                session
+                    .batch(&batch, values)
+                    .await
+                    .map(|_| ())
+                    .map_err(|err| err.to_string())
+            }
+        }
+    };
+
+    if options.mode == "session" {
+        // Steady mixed workload, used to sample the driver's resource footprint.
+        let concurrency = *options.concurrency.last().unwrap_or(&16);
+        let deadline = Some(Instant::now() + options.duration);
+        let insert_run =
+            run_scenario(&session, concurrency, u64::MAX, deadline, insert_op.clone());
+        let select_run = run_scenario(&session, concurrency, u64::MAX, deadline, select_op);
+        let (insert_result, select_result) = tokio::join!(insert_run, select_run);
+        report("session_insert", concurrency, 0, insert_result);
+        report("session_select", concurrency, 0, select_result);
+        return Ok(());
+    }
+
+    // Populate data read by the select and scan scenarios.
+    let max_concurrency = options.concurrency.iter().copied().max().unwrap_or(1);
+    run_scenario(&session, max_concurrency, options.ops, None, insert_op.clone()).await;
+
+    let fixed_concurrency = options.concurrency[options.concurrency.len() / 2];
+    for iteration in 0..options.iterations {
+        for &concurrency in &options.concurrency {
+            let result =
+                run_scenario(&session, concurrency, options.ops, None, insert_op.clone()).await;
+            report("prepared_insert", concurrency, iteration, result);
+            let result =
+                run_scenario(&session, concurrency, options.ops, None, select_op.clone()).await;
+            report("prepared_select", concurrency, iteration, result);
+        }
+        let scans = (options.ops / 100).max(1);
+        let result =
+            run_scenario(&session, fixed_concurrency, scans, None, scan_op.clone()).await;
+        report("paging_scan", fixed_concurrency, iteration, result);
+        let batches = (options.ops / BATCH_SIZE).max(1);
+        let result =
+            run_scenario(&session, fixed_concurrency, batches, None, batch_op.clone()).await;
+        report("batch", fixed_concurrency, iteration, result);
+    }
+    Ok(())
+}